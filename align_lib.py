@@ -0,0 +1,244 @@
+import os
+import math
+import time
+from collections import deque
+from clock_lib import SYSTEM_CLOCK
+
+
+class SourceClock:
+    """ Offset of one source's clock (FlexLogger value stamps, CAN hardware stamps) from the host's monotonic clock.
+
+    Every sample gives host arrival minus source stamp = offset + transport delay. The smallest of the
+    last window samples is the least delayed, so it bounds the offset tightest and follows drift. Sources
+    without stamps (Julabo replies) are placed at the middle of the request instead.
+    """
+    def __init__(self, name, window=256):
+        self.name = name
+        self.offset = None
+        self.samples = 0
+        self._offsets = deque(maxlen=window)
+
+    def to_host(self, host_time, source_time=None):
+        """ Host monotonic time of a sample that arrived at host_time """
+        self.samples += 1
+        if source_time is None:
+            return host_time
+        self._offsets.append(host_time - source_time)
+        if len(self._offsets) == self._offsets.maxlen or self.offset is None or self._offsets[-1] < self.offset:
+            self.offset = min(self._offsets)
+        return source_time + self.offset
+
+
+class StreamAligner:
+    """ Streaming as-of join of several timestamped sources onto the samples of one driver channel.
+
+    push() places each sample on the host monotonic timebase (per-source SourceClock) and buffers it.
+    Each driver sample becomes a row holding, for every channel, the newest sample at or before it,
+    or NaN if that one is older than its source's tolerance. A row is released once every source has
+    delivered a sample past it (nothing older can still arrive) or max_delay seconds after it, so rows
+    come out in order with a bounded wait. Buffers hold at most capacity samples per channel; what
+    falls out the back only costs an older as-of match.
+    """
+    def __init__(self, driver, max_delay=1.0, capacity=4096, clock=None):
+        self.driver = driver
+        self.max_delay = max_delay
+        self.capacity = capacity
+        self.clock = clock if clock is not None else SYSTEM_CLOCK
+        self.sources = {}
+        self.channels = []
+        self.dropped = 0  # driver samples lost to a full pending buffer
+        self._tolerance = {}
+        self._source_of = {}
+        self._buffers = {}
+        self._watermarks = {}
+        self._pending = deque(maxlen=capacity)
+
+    def add_source(self, name, channels, tolerance, window=256):
+        """ Register a source and the channels it delivers; tolerance is the oldest (seconds) an as-of match may be """
+        self.sources[name] = SourceClock(name, window)
+        self._tolerance[name] = tolerance
+        self._watermarks[name] = -math.inf
+        for channel in channels:
+            self._source_of[channel] = name
+            self._buffers[channel] = deque(maxlen=self.capacity)
+            self.channels.append(channel)
+
+    def push(self, source, channel, value, host_time, source_time=None):
+        """ One sample (any thread): host_time is the host monotonic time it arrived, source_time the source's own stamp """
+        t = self.sources[source].to_host(host_time, source_time)
+        buffer = self._buffers.get(channel)
+        if buffer is None:
+            return
+        if buffer and t < buffer[-1][0]:
+            t = buffer[-1][0]  # an offset update moved time back a little, keep each channel in order
+        buffer.append((t, value))
+        self._watermarks[source] = max(self._watermarks[source], t)
+        if channel == self.driver:
+            if len(self._pending) == self.capacity:
+                self.dropped += 1  # nobody pops rows, the oldest goes
+            self._pending.append(t)
+
+    def pop_rows(self, now=None):
+        """ Rows ready for release, [(host time, [value per channel])] in time order """
+        now = self.clock.monotonic() if now is None else now
+        ready = min(self._watermarks.values(), default=-math.inf)
+        rows = []
+        while self._pending:
+            t = self._pending[0]
+            if t > ready and now - t < self.max_delay:
+                break
+            self._pending.popleft()
+            rows.append((t, [self._as_of(channel, t) for channel in self.channels]))
+        return rows
+
+    def _as_of(self, channel, t):
+        buffer = self._buffers[channel]
+        # Rows come in time order: samples older than the newest one at or before t are never needed again
+        while len(buffer) > 1 and buffer[1][0] <= t:
+            buffer.popleft()
+        if not buffer or buffer[0][0] > t or t - buffer[0][0] > self._tolerance[self._source_of[channel]]:
+            return math.nan
+        return buffer[0][1]
+
+
+class AlignedLogWriter:
+    """ Appends released rows to a CSV: unix time to the microsecond, then one column per channel """
+    def __init__(self, path, channels, clock=None):
+        self.path = path
+        self.clock = clock if clock is not None else SYSTEM_CLOCK
+        self.rows = 0
+        self._unix_offset = self.clock.time() - self.clock.monotonic()
+        self._file = open(path, "a")
+        if self._file.tell() == 0:
+            self._file.write(",".join(["unix_time"] + list(channels)) + "\n")
+
+    def write(self, rows):
+        if not rows:
+            return
+        self._file.write("".join(f"{t + self._unix_offset:.6f}," + ",".join("" if math.isnan(v) else f"{v:.6g}" for v in values) + "\n"
+                                 for t, values in rows))
+        self._file.flush()
+        self.rows += len(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class AlignmentRecorder:
+    """ Feeds an aligner from the rig and writes the merged rows to an aligned CSV next to the logs.
+
+    FlexLogger values arrive through engine.read_sensor (polls and the waveform sampler, which is the
+    driver channel at waveform_sample_ms), Julabo values through the engine's own Julabo traffic: every
+    setpoint it sends (held until the next one) and, with a setpoint scheduler, the bath temperatures
+    the scheduler reads. A thread drains the CAN bus for the pump command frames the adapter echoes
+    back with their hardware timestamps and releases rows to the file.
+    """
+    def __init__(self, engine, path=None, tolerance=None, max_delay=1.0, capacity=4096):
+        self.engine = engine
+        scheduler = engine.setpoint_scheduler
+        tolerance = dict({"flexlogger": 0.5, "can": 0.5, "setpoint": math.inf,
+                          "julabo": 3 * scheduler.poll if scheduler is not None else 0}, **(tolerance or {}))
+        driver = engine.waveform_sensor() or engine.sensors[0]
+        self.aligner = StreamAligner(driver, max_delay=max_delay, capacity=capacity)
+        self.aligner.add_source("flexlogger", engine.sensors, tolerance["flexlogger"])
+        if engine.canbus_connected:
+            self.aligner.add_source("can", engine._cantroller.frame_channels(), tolerance["can"])
+        if engine.julabo_connected:
+            self.aligner.add_source("setpoint", ["JULABO SETPOINT (C)"], tolerance["setpoint"])
+            if scheduler is not None:
+                self.aligner.add_source("julabo", ["JULABO BATH (C)"], tolerance["julabo"])
+        self.path = path or os.path.join(engine.log_dir, f"{engine.get_timestamp()}_aligned.csv")
+        self.writer = AlignedLogWriter(self.path, self.aligner.channels)
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        self.engine.aligner = self.aligner
+        self._thread = self.engine.clock.thread(self._run, name="aligner")
+        self._thread.start()
+        print(f"Aligned log '{self.path}' driven by '{self.aligner.driver}'")
+
+    def stop(self):
+        self._stopped = True
+        if self._thread is not None:
+            self.engine.clock.join(self._thread)
+        self.engine.aligner = None
+        self.writer.write(self.aligner.pop_rows(now=math.inf))
+        self.writer.close()
+
+    def _run(self):
+        engine, aligner = self.engine, self.aligner
+        while not self._stopped:
+            if "can" in aligner.sources and engine.canbus_connected:
+                self._drain_can(engine._cantroller)
+            else:
+                time.sleep(0.05)
+            self.writer.write(aligner.pop_rows())
+
+    def _drain_can(self, cantroller):
+        """ Frames received within 50 ms, pump commands go to the aligner with their hardware timestamp """
+        deadline = time.monotonic() + 0.05
+        while time.monotonic() < deadline:
+            try:
+                message = cantroller.bus.recv(timeout=max(deadline - time.monotonic(), 0))
+            except Exception as e:  # adapter gone, the watchdog takes care of it
+                print(f"Warning: CAN receive failed: {e}")
+                time.sleep(0.05)
+                return
+            if message is None:
+                return
+            decoded = cantroller.decode_frame(message)
+            if decoded is not None:
+                self.aligner.push("can", decoded[0], decoded[1], time.monotonic(), message.timestamp)
+
+
+if __name__ == "__main__":
+    # Simulated rig for a few seconds: FlexLogger clock 2.5 s behind, pump on/off every 0.5 s; the aligned
+    # rows should show each pressure sample with the pump power commanded at that moment and the 40 C setpoint
+    import tempfile
+    import threading
+    from engine_lib import TestEngine
+    from sim_devices_lib import SimFlexLogger, SimCantroller, SimCanBus, SimJulabo
+
+    workdir = tempfile.mkdtemp(prefix="aligned_")
+    engine = TestEngine(journal_path=os.path.join(workdir, "checkpoint.journal"), log_dir=workdir)
+    engine._flex, engine._cantroller, engine._julabo = SimFlexLogger(6, latency=0.001), SimCantroller(), SimJulabo()
+    engine._flex.clock_offset = 2.5
+    engine._cantroller.bus = SimCanBus(echo=True)
+    engine.sensors = engine._flex.get_sensor_list()
+    engine.canbus_connected = engine.julabo_connected = True
+    engine.waveform_channel = "PRESSURE 1"
+
+    recorder = AlignmentRecorder(engine, max_delay=0.5)
+    recorder.start()
+    engine.send_julabo_setpoint(40.0)
+    sensor = engine.waveform_sensor()
+    stop = threading.Event()
+
+    def pump():
+        power = 0
+        while not stop.is_set():
+            power = 80 - power
+            engine._cantroller.set_pump_power(power)
+            for build in engine._cantroller.periodic_messages():
+                engine._cantroller.bus.send(build())
+            time.sleep(0.5)
+
+    threading.Thread(target=pump, daemon=True).start()
+    end = time.monotonic() + 3
+    polls = 0
+    while time.monotonic() < end:
+        engine.read_sensor(sensor)
+        polls += 1
+        if polls % 5 == 0:
+            engine.read_sensors()
+        time.sleep(0.02)
+    stop.set()
+    recorder.stop()
+
+    lag = recorder.aligner.sources["flexlogger"].offset + (time.time() - time.monotonic())
+    print(f"{recorder.writer.rows} rows, FlexLogger clock {lag:.3f} s behind the host (simulated 2.5 s)")
+    with open(recorder.path) as file:
+        lines = file.read().splitlines()
+    print(lines[0])
+    print("\n".join(lines[1:6] + ["..."] + lines[-3:]))
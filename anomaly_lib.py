@@ -0,0 +1,327 @@
+import copy
+import math
+import itertools
+from collections import deque
+
+# Actions a rule can request when it fires
+WARN = "warn"
+PAUSE = "pause"
+CRASH = "crash"
+ACTIONS = (WARN, PAUSE, CRASH)
+
+
+def normalize_channel(name):
+    """ Case and whitespace insensitive channel key, so 'pressure 1 psi' matches 'PRESSURE 1 PSI' """
+    return "".join(str(name).lower().split())
+
+
+class Alarm:
+    """ A rule that fired """
+    def __init__(self, rule, channel, value, t):
+        self.rule = rule
+        self.channel = channel
+        self.value = value
+        self.t = t
+
+    @property
+    def action(self):
+        return self.rule.action
+
+    def __str__(self):
+        return f"{self.rule.name}: {self.channel} = {self.value:.3f}"
+
+
+class Rule:
+    """ Base rule: evaluate() says whether one sample violates it, firing needs for_samples in a row.
+
+    A fired rule stays latched (does not fire again) until a sample no longer violates it.
+    """
+    def __init__(self, channel, action=CRASH, for_samples=1, name=None):
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown action '{action}', expected one of {ACTIONS}")
+        if for_samples < 1:
+            raise ValueError("for_samples must be at least 1")
+        self.channel = channel
+        self.action = action
+        self.for_samples = for_samples
+        self.name = name or f"{type(self).__name__}({channel})"
+        self.channels = (channel,)
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.latched = False
+
+    def evaluate(self, channel, value, t):
+        raise NotImplementedError
+
+    def update(self, channel, value, t):
+        """ Feed a sample, returns an Alarm when the rule fires """
+        if not self.evaluate(channel, value, t):
+            self.count = 0
+            self.latched = False
+            return None
+        self.count += 1
+        if self.count >= self.for_samples and not self.latched:
+            self.latched = True
+            return Alarm(self, channel, value, t)
+        return None
+
+
+class ThresholdRule(Rule):
+    """ Value below and/or above a limit """
+    def __init__(self, channel, below=None, above=None, **kwargs):
+        if below is None and above is None:
+            raise ValueError("ThresholdRule needs 'below' and/or 'above'")
+        self.below = below
+        self.above = above
+        super().__init__(channel, **kwargs)
+
+    def evaluate(self, channel, value, t):
+        return (self.below is not None and value < self.below) or (self.above is not None and value > self.above)
+
+
+class _RollingWindow:
+    """ Fixed-length window with running sum and sum of squares """
+    def __init__(self, size):
+        if size < 2:
+            raise ValueError("window must be at least 2 samples")
+        self.values = deque(maxlen=size)
+        self.total = 0.0
+        self.total_sq = 0.0
+        self._updates = 0
+
+    def push(self, value):
+        if len(self.values) == self.values.maxlen:
+            old = self.values[0]
+            self.total -= old
+            self.total_sq -= old * old
+        self.values.append(value)
+        self.total += value
+        self.total_sq += value * value
+
+        # Periodically re-sum to stop floating point drift over very long runs
+        self._updates += 1
+        if self._updates >= 100 * self.values.maxlen:
+            self.total = math.fsum(self.values)
+            self.total_sq = math.fsum(v * v for v in self.values)
+            self._updates = 0
+
+    @property
+    def full(self):
+        return len(self.values) == self.values.maxlen
+
+    @property
+    def mean(self):
+        return self.total / len(self.values)
+
+    @property
+    def std(self):
+        n = len(self.values)
+        variance = (self.total_sq - self.total * self.total / n) / (n - 1)
+        return math.sqrt(max(variance, 0.0))
+
+
+class RollingMeanRule(Rule):
+    """ Mean over the last window samples below and/or above a limit """
+    def __init__(self, channel, window, below=None, above=None, **kwargs):
+        if below is None and above is None:
+            raise ValueError("RollingMeanRule needs 'below' and/or 'above'")
+        self.window = window
+        self.below = below
+        self.above = above
+        super().__init__(channel, **kwargs)
+
+    def reset(self):
+        super().reset()
+        self._window = _RollingWindow(self.window)
+
+    def evaluate(self, channel, value, t):
+        self._window.push(value)
+        if not self._window.full:
+            return False
+        mean = self._window.mean
+        return (self.below is not None and mean < self.below) or (self.above is not None and mean > self.above)
+
+
+class RollingStdRule(Rule):
+    """ Standard deviation over the last window samples above a limit (noisy or oscillating sensor) """
+    def __init__(self, channel, window, above, **kwargs):
+        self.window = window
+        self.above = above
+        super().__init__(channel, **kwargs)
+
+    def reset(self):
+        super().reset()
+        self._window = _RollingWindow(self.window)
+
+    def evaluate(self, channel, value, t):
+        self._window.push(value)
+        return self._window.full and self._window.std > self.above
+
+
+class RateOfChangeRule(Rule):
+    """ Absolute rate of change (units per second) above a limit """
+    def __init__(self, channel, max_rate, **kwargs):
+        self.max_rate = max_rate
+        super().__init__(channel, **kwargs)
+
+    def reset(self):
+        super().reset()
+        self._last = None
+
+    def evaluate(self, channel, value, t):
+        last = self._last
+        self._last = (t, value)
+        if last is None or t <= last[0]:
+            return False
+        return abs(value - last[1]) / (t - last[0]) > self.max_rate
+
+
+class StuckRule(Rule):
+    """ Value has not moved more than tolerance for for_samples samples (frozen sensor or dead link) """
+    def __init__(self, channel, tolerance=0.0, **kwargs):
+        self.tolerance = tolerance
+        super().__init__(channel, **kwargs)
+
+    def reset(self):
+        super().reset()
+        self._reference = None
+
+    def evaluate(self, channel, value, t):
+        if self._reference is not None and abs(value - self._reference) <= self.tolerance:
+            return True
+        self._reference = value
+        return False
+
+
+class DeltaRule(Rule):
+    """ Difference between the latest values of two channels (channel - other) outside a band """
+    def __init__(self, channel, other, below=None, above=None, **kwargs):
+        if below is None and above is None:
+            raise ValueError("DeltaRule needs 'below' and/or 'above'")
+        self.other = other
+        self.below = below
+        self.above = above
+        super().__init__(channel, **kwargs)
+        self.channels = (channel, other)
+        self.name = kwargs.get("name") or f"DeltaRule({channel} - {other})"
+
+    def reset(self):
+        super().reset()
+        self._latest = [None, None]
+
+    def evaluate(self, channel, value, t):
+        self._latest[self._side[channel]] = value
+        a, b = self._latest
+        if a is None or b is None:
+            return False
+        delta = a - b
+        return (self.below is not None and delta < self.below) or (self.above is not None and delta > self.above)
+
+
+RULE_TYPES = {
+    "threshold": ThresholdRule,
+    "rolling_mean": RollingMeanRule,
+    "rolling_std": RollingStdRule,
+    "rate_of_change": RateOfChangeRule,
+    "stuck": StuckRule,
+    "delta": DeltaRule,
+}
+
+# Inlet pressure drop check: pressure1 below 30 psi for more than 100 samples crashes the test.
+# Channel names match exactly (ignoring case and spaces), so on the rig's "PRESSURE 1 PSI" a profile
+# names the channel in full, as the original "pressure1" substring check never matched it either
+DEFAULT_RULES = [
+    {"type": "threshold", "channel": "pressure1", "below": 30, "for_samples": 101, "action": CRASH, "name": "Inlet pressure drop"},
+]
+
+
+def rules_from_config(config):
+    """ Build rules from a list of dicts like DEFAULT_RULES, raises ValueError on bad entries """
+    rules = []
+    for i, entry in enumerate(config):
+        if not isinstance(entry, dict) or entry.get("type") not in RULE_TYPES:
+            raise ValueError(f"rules[{i}] needs a 'type' of {', '.join(RULE_TYPES)}")
+        kwargs = {k: v for k, v in entry.items() if k != "type"}
+        try:
+            rules.append(RULE_TYPES[entry["type"]](**kwargs))
+        except TypeError as e:
+            raise ValueError(f"rules[{i}]: {e}")
+    return rules
+
+
+class AnomalyEngine:
+    """ Evaluates every rule on each incoming sample; work per sample is O(rules on that channel).
+
+    Rule channels match the acquired channels whose normalized name equals them, resolved once
+    in bind() so process() is a dict lookup plus the rule updates. A rule matching several channels
+    gets an independent copy per channel, and every binding is printed so a rule's scope is visible.
+    """
+    def __init__(self, rules=None):
+        self.rules = rules if rules is not None else rules_from_config(DEFAULT_RULES)
+        self.bound = []  # (rule, channels) per bound rule copy
+        self._by_channel = {}
+
+    def bind(self, channels):
+        """ Resolve rule channel names against the acquired channel names and reset state """
+        self._by_channel = {}
+        self.bound = []
+        for rule in self.rules:
+            matches = [[channel for channel in channels if normalize_channel(channel) == normalize_channel(name)]
+                       for name in rule.channels]
+            if not all(matches):
+                print(f"Warning: rule '{rule.name}' has no channel named {' / '.join(rule.channels)}")
+                continue
+            for i, combination in enumerate(itertools.product(*matches)):
+                if len(set(combination)) < len(combination):
+                    continue  # both sides of a delta on one channel
+                bound = rule if i == 0 else copy.copy(rule)
+                bound.reset()
+                bound._side = {channel: side for side, channel in enumerate(combination)}
+                for channel in combination:
+                    self._by_channel.setdefault(channel, []).append(bound)
+                self.bound.append((bound, combination))
+                print(f"Rule '{rule.name}' ({rule.action}) on {' - '.join(combination)}")
+
+    def reset(self):
+        for rule, _ in self.bound:
+            rule.reset()
+
+    def process(self, channel, value, t):
+        """ Feed one sample, returns the list of alarms it triggered (usually empty) """
+        rules = self._by_channel.get(channel)
+        if not rules:
+            return []
+        alarms = []
+        for rule in rules:
+            alarm = rule.update(channel, value, t)
+            if alarm is not None:
+                alarms.append(alarm)
+        return alarms
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    channels = ["PRESSURE 1 PSI", "PRESSURE 2 PSI", "COOLANT TEMP (C)", "CHAMBER TEMP (C)"]
+    engine = AnomalyEngine(rules_from_config([
+        {"type": "threshold", "channel": "PRESSURE 1 PSI", "below": 30, "for_samples": 101, "action": CRASH, "name": "Inlet pressure drop (rig)"},
+        {"type": "rolling_std", "channel": "COOLANT TEMP (C)", "window": 60, "above": 5, "action": "warn"},
+        {"type": "rate_of_change", "channel": "CHAMBER TEMP (C)", "max_rate": 500.0, "for_samples": 3, "action": "pause"},
+        {"type": "stuck", "channel": "PRESSURE 2 PSI", "tolerance": 0.0, "for_samples": 600, "action": "warn"},
+        {"type": "delta", "channel": "PRESSURE 1 PSI", "other": "PRESSURE 2 PSI", "above": 10, "for_samples": 30, "action": "warn"},
+    ]))
+    engine.bind(channels)
+
+    samples = 200000
+    start = time.perf_counter()
+    for i in range(samples):
+        t = i * 0.01
+        for channel in channels:
+            value = 20 if (i > 150000 and "1" in channel) else 35 + random.random()
+            for alarm in engine.process(channel, value, t):
+                print(f"t={t:.2f}s {alarm.action}: {alarm}")
+    elapsed = time.perf_counter() - start
+    print(f"{elapsed / (samples * len(channels)) * 1e6:.2f} us per sample")
@@ -0,0 +1,161 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+class DeviceError(Exception):
+    """ Raised when a device call fails or times out """
+
+
+class DeviceTimeout(DeviceError):
+    """ A device call did not return within its timeout """
+
+
+class AsyncDevice:
+    """ Awaitable front of a blocking device library (pyserial, gRPC, python-can).
+
+    Every device gets its own one-thread executor, so its calls run in order and a device that
+    hangs only holds up its own calls, never the event loop or the other devices. A timed out or
+    cancelled await returns control at once; the blocking call it started still finishes on the
+    device thread before the next call of that device runs.
+    """
+    def __init__(self, name, timeout=2.0):
+        self.name = name
+        self.timeout = timeout
+        self.timeouts = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"device-{name}")
+
+    async def call(self, function, *args, timeout=None):
+        """ Run function(*args) on the device thread, raises DeviceTimeout after timeout seconds """
+        loop = asyncio.get_running_loop()
+        timeout = self.timeout if timeout is None else timeout
+        future = loop.run_in_executor(self._executor, function, *args)
+        # asyncio.wait, not wait_for: before Python 3.12 wait_for drops a cancel that arrives as the call
+        # completes, and a pause would then miss the coroutine that made the call
+        try:
+            done, _ = await asyncio.wait({future}, timeout=timeout)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        if not done:
+            future.cancel()
+            self.timeouts += 1
+            raise DeviceTimeout(f"{self.name}: {getattr(function, '__name__', function)} took longer than {timeout:.1f} s")
+        return future.result()
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class AsyncFlexLogger(AsyncDevice):
+    """ FlexLogger reads through the engine (so filtering and parsing stay in one place) """
+    def __init__(self, engine, timeout=2.0):
+        super().__init__("flexlogger", timeout)
+        self.engine = engine
+
+    async def read_sensors(self):
+        return await self.call(self.engine.read_sensors)
+
+    async def read(self, name):
+        return await self.call(self.engine.read_sensor, name)
+
+    async def check_active_project(self):
+        return await self.call(self.engine._flex.check_active_project)
+
+
+class AsyncJulabo(AsyncDevice):
+    """ Julabo serial commands; each takes at least 350 ms (safe interval plus reply) so they never run on the loop """
+    def __init__(self, julabo, timeout=5.0):
+        super().__init__("julabo", timeout)
+        self.julabo = julabo
+
+    async def set_work_temperature(self, temp):
+        return await self.call(self.julabo.set_work_temperature, temp)
+
+    async def set_power_on(self):
+        return await self.call(self.julabo.set_power_on)
+
+    async def set_power_off(self):
+        return await self.call(self.julabo.set_power_off)
+
+    async def get_version(self):
+        return await self.call(self.julabo.get_version)
+
+
+class AsyncPumps(AsyncDevice):
+    """ Cantroller without its sender threads: one coroutine per periodic pump message.
+
+    Sends are scheduled on absolute deadlines, so a late send does not push the later ones back,
+    and go through the device thread with a timeout, so a stuck bus shows up as DeviceTimeout
+    counts instead of stalling the loop.
+    """
+    def __init__(self, cantroller, period=0.2, timeout=0.5):
+        super().__init__("can", timeout)
+        self.cantroller = cantroller
+        self.period = period
+        self.errors = 0
+        self._senders = []
+
+    def set_pump_power(self, value):
+        self.cantroller.set_pump_power(value)  # the senders pick the new value up on their next message
+
+    def start(self):
+        if not self._senders:
+            self._senders = [asyncio.get_running_loop().create_task(self._send_periodic(build))
+                             for build in self.cantroller.periodic_messages()]
+
+    async def stop(self):
+        senders, self._senders = self._senders, []
+        for task in senders:
+            task.cancel()
+        await asyncio.gather(*senders, return_exceptions=True)
+
+    async def _send_periodic(self, build):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        while True:
+            try:
+                await self.call(self.cantroller.bus.send, build())
+            except DeviceTimeout as e:
+                self.errors += 1
+                print(f"Warning: {e}")
+            except Exception as e:  # CanError and friends, keep sending
+                self.errors += 1
+                print(f"Warning: CAN send failed: {e}")
+            deadline += self.period
+            now = loop.time()
+            if deadline < now:  # fell more than a period behind, skip the missed sends
+                deadline = now
+            await asyncio.sleep(deadline - now)
+
+
+def install_qt_event_loop(app, step_ms=2):
+    """ Make asyncio run on the Qt event loop of app, returns the loop.
+
+    With qasync installed its QEventLoop is used and the caller runs loop.run_forever() instead of
+    app.exec(). Without it a plain asyncio loop is stepped from a QTimer every step_ms (ready
+    callbacks and due timers), and app.exec() stays as it is; loop.is_qasync tells which.
+    """
+    try:
+        import qasync
+    except ImportError:
+        qasync = None
+    if qasync is not None:
+        loop = qasync.QEventLoop(app)
+        asyncio.set_event_loop(loop)
+        loop.is_qasync = True
+        return loop
+
+    from PySide6.QtCore import QTimer
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.is_qasync = False
+
+    def step():
+        loop.call_soon(loop.stop)
+        loop.run_forever()
+
+    timer = QTimer(app)
+    timer.timeout.connect(step)
+    timer.start(step_ms)
+    loop._qt_step_timer = timer  # keep it alive as long as the loop
+    return loop
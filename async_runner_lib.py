@@ -0,0 +1,323 @@
+import asyncio
+import concurrent.futures
+from async_devices_lib import AsyncDevice, AsyncFlexLogger, AsyncJulabo, AsyncPumps, DeviceError
+
+
+class AsyncTestRunner:
+    """ Runs a TestEngine's test as coroutines on one asyncio loop instead of the pressure-loop, waveform,
+    PausableTimer and Cantroller threads.
+
+    The engine keeps the state, profile, logging, checkpoints and listeners; only the scheduling moves
+    here. Device calls go through AsyncDevice threads with timeouts, so a slow FlexLogger read cannot
+    delay a pump edge and a Julabo command cannot stall the GUI. pause() cancels the coroutines at once:
+    an interrupted pressure cycle is not counted and runs again on resume. Pass loop to start and pause
+    from outside it (Qt slots when the loop is stepped from a QTimer).
+    """
+    def __init__(self, engine, loop=None):
+        self.engine = engine
+        self.loop = loop
+        self._closed = False
+        self.skip_poll = None  # callable, polling is skipped while it returns True (e.g. during a log replay)
+        self.flex = AsyncFlexLogger(engine)
+        self._connector = AsyncDevice("connect", timeout=30.0)  # opening ports and gRPC sessions can take a while
+        self.pumps = None
+        self.julabo = None
+        self._tasks = {}
+        self._poll_task = None
+        self._loop = None  # the loop the test runs on, for calls from other threads
+        engine.julabo_setter = self.send_julabo_setpoint
+
+    # ----- Devices -----
+
+    async def connect(self, kind, **kwargs):
+        """ Run one of the engine's blocking connect_* calls on that device's thread, returns its result """
+        connect = {"flexlogger": self.engine.connect_flexlogger, "canbus": self.engine.connect_canbus,
+                   "julabo": self.engine.connect_julabo}.get(kind)
+        if connect is None:
+            raise ValueError(f"Unknown device '{kind}'")
+        ok = await self._connector.call(lambda: connect(**kwargs))
+        self.bind_devices()
+        return ok
+
+    def bind_devices(self):
+        """ Wrap the devices the engine has connected so far """
+        engine = self.engine
+        if engine.canbus_connected and (self.pumps is None or self.pumps.cantroller is not engine._cantroller):
+            self.pumps = AsyncPumps(engine._cantroller)
+        if engine.julabo_connected and (self.julabo is None or self.julabo.julabo is not engine._julabo):
+            self.julabo = AsyncJulabo(engine._julabo)
+
+    # ----- Test control -----
+
+    @property
+    def running(self):
+        return "pressure" in self._tasks and not self._tasks["pressure"].done()
+
+    def start(self):
+        """ Start or resume the test on the running loop, raises EngineError if not ready """
+        engine = self.engine
+        engine.prepare_start()
+        self.bind_devices()
+        loop = self._loop = self.loop or asyncio.get_running_loop()
+        self._tasks = {"pressure": loop.create_task(self._pressure_loop(), name="pressure-loop"),
+                       "waveform": loop.create_task(self._waveform_loop(), name="waveform"),
+                       "fluid": loop.create_task(self._interval_timer(engine._fluid_timer, self._fluid_interval), name="fluid-timer"),
+                       "chamber": loop.create_task(self._interval_timer(engine._chamber_timer, self._chamber_interval), name="chamber-timer")}
+        engine._notify("state", active=True)
+
+    def pause(self):
+        """ Stop the pressure loop and the temperature timers now (counts and remaining times are kept) """
+        if self.running and not self.engine._test_active:
+            return  # already stopping (an alarm or a second click), cancelling again would cut the pause handling short
+        if self.running:
+            print("Pausing Test...")
+        self.engine._test_active = False
+        for task in self._tasks.values():  # also the timers when the pressure loop is already gone
+            task.cancel()
+
+    def call_threadsafe(self, function):
+        """ Run function on the runner's loop from another thread (the watchdog) and return its result """
+        future = concurrent.futures.Future()
+
+        def run():
+            try:
+                future.set_result(function())
+            except Exception as e:
+                future.set_exception(e)
+        self.loop.call_soon_threadsafe(run)
+        return future.result()
+
+    def send_julabo_setpoint(self, setpoint):
+        """ engine.julabo_setter: a setpoint from another thread (the setpoint scheduler) goes through AsyncJulabo on
+        the runner's loop, in order with the interval setpoints and with its timeout """
+        if self.julabo is None or self._loop is None:
+            raise DeviceError("julabo: not connected to the runner")
+        asyncio.run_coroutine_threadsafe(self.julabo.set_work_temperature(setpoint), self._loop).result()
+
+    async def wait(self):
+        """ Until the test finishes or is paused (cancelling the wait leaves the test running) """
+        if self._tasks:
+            await asyncio.wait(self._tasks.values())
+
+    def start_polling(self):
+        """ Acquisition tick every timer_ms on the loop (replaces the GUI QTimer or headless loop) """
+        if self._poll_task is None or self._poll_task.done():
+            self._poll_task = (self.loop or asyncio.get_running_loop()).create_task(self._poll_loop(), name="sensor-poll")
+
+    def shutdown(self):
+        """ Drop the coroutines without their pause handling, for window close after engine.shutdown()
+        has already saved the state and stopped the devices """
+        self._closed = True
+        self._release_engine()
+        for task in list(self._tasks.values()) + [self._poll_task]:
+            if task is not None:
+                task.cancel()
+        for device in (self.flex, self._connector, self.pumps, self.julabo):
+            if device is not None:
+                device.close()
+
+    async def close(self):
+        """ Cancel everything and release the device threads (the engine's shutdown() still closes the devices) """
+        self.pause()
+        await self.wait()
+        self._release_engine()
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            await asyncio.gather(self._poll_task, return_exceptions=True)
+        for device in (self.flex, self._connector, self.pumps, self.julabo):
+            if device is not None:
+                device.close()
+
+    def _release_engine(self):
+        if self.engine.julabo_setter == self.send_julabo_setpoint:
+            self.engine.julabo_setter = None
+
+    # ----- Coroutines -----
+
+    async def _poll_loop(self):
+        engine = self.engine
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        while True:
+            if engine.flexlogger_connected and not (self.skip_poll is not None and self.skip_poll()):
+                try:
+                    engine.accept_sensor_values(await self.flex.read_sensors())
+                except DeviceError as e:
+                    print(f"Warning: {e}")
+            if engine.active and engine.logging_enabled:
+                engine.update_log_file()
+            deadline = max(deadline + engine.timer_ms / 1000, loop.time())
+            await asyncio.sleep(deadline - loop.time())
+
+    async def _waveform_loop(self):
+        engine = self.engine
+        if engine.waveform_sample_ms <= 0:
+            return
+        sensor = engine.waveform_sensor()
+        if sensor is None:
+            return
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        try:
+            while engine.active:
+                if engine.stream is not None:
+                    engine.feed_stream_waveform(sensor)
+                else:
+                    try:
+                        value = await self.flex.read(sensor)
+                    except DeviceError:
+                        value = None
+                    if value is not None:
+                        engine._cycle_features.add_sample(engine.clock.monotonic(), value)
+                deadline = max(deadline + engine.waveform_sample_ms / 1000, loop.time())
+                await asyncio.sleep(deadline - loop.time())
+        finally:
+            engine._cycle_features.flush()
+
+    async def _pressure_loop(self):
+        engine = self.engine
+        pumps = self.pumps
+        try:
+            if self.julabo is not None:
+                await self.julabo.set_power_on()
+            pumps.start()
+
+            # Initial sequence to let test warm up
+            if engine.active and engine.pressure_cycle_count < engine.pressure_num_cycles:
+                pumps.set_pump_power(engine.pump_power)
+                await asyncio.sleep(engine.pump_warmup_time)
+
+            while engine.active and engine.pressure_cycle_count < engine.pressure_num_cycles:
+                engine._pump_on_edge()
+                pumps.set_pump_power(engine.pump_power)
+                await asyncio.sleep(engine.pressure_on_time)
+                engine._pump_off_edge()
+                pumps.set_pump_power(0)
+                await asyncio.sleep(engine.pressure_off_time)
+                engine.count_pressure_cycle()
+
+            if engine.pressure_cycle_count >= engine.pressure_num_cycles:
+                await asyncio.sleep(5)  # Allow time for clean log finish
+                engine._test_active = False
+                for name in ("fluid", "chamber", "waveform"):
+                    self._tasks[name].cancel()
+                await self._stop_devices()
+                engine.mark_finished()
+                return
+        except asyncio.CancelledError:
+            if self._closed:
+                raise
+        except Exception as e:  # a device call failed or timed out, the timers must not run on without pressure
+            print(f"Error: {e}, pausing the test")
+        # PAUSING BEHAVIOUR (cancelled by pause(), an alarm ended the test or a device call failed)
+        engine._test_active = False
+        for name in ("fluid", "chamber", "waveform"):
+            self._tasks[name].cancel()
+        await asyncio.gather(*(self._tasks[name] for name in ("fluid", "chamber", "waveform")), return_exceptions=True)
+        try:
+            await self._stop_devices()
+        except DeviceError as e:
+            print(f"Warning: {e}")
+        engine.write_checkpoint(sync=True)
+        print("Test Paused")
+        engine._notify("state", active=False)
+
+    async def _stop_devices(self):
+        self.pumps.set_pump_power(0)
+        await self.pumps.stop()
+        if self.julabo is not None:
+            try:
+                await self.julabo.set_power_off()
+            except DeviceError as e:
+                print(f"Warning: {e}")
+
+    async def _interval_timer(self, timer, callback):
+        """ PausableTimer as a coroutine: callback now (unless resuming), then after every interval until
+        next_interval() gives None; the timer object keeps remaining_time/paused so checkpoints and
+        apply_resume_state work unchanged """
+        clock = self.engine.clock
+        if timer.done:
+            return
+        if timer.paused:
+            timer.paused = False
+        else:
+            timer.remaining_time = 0.0
+            await callback()
+            timer.remaining_time = timer.next_interval()
+        try:
+            while timer.remaining_time is not None:
+                timer.start_time = clock.time()
+                await asyncio.sleep(timer.remaining_time)
+                timer.start_time = None
+                timer.remaining_time = 0.0
+                await callback()
+                timer.remaining_time = timer.next_interval()
+            timer.remaining_time = 0.0
+            timer.done = True  # every interval has started
+        except asyncio.CancelledError:
+            if timer.start_time is not None:
+                timer.remaining_time = max(timer.remaining_time - (clock.time() - timer.start_time), 0.0)
+            else:
+                timer.remaining_time = 0.0  # cancelled inside the callback, run it again on resume
+            timer.paused = True
+            raise
+
+    async def _fluid_interval(self):
+        engine = self.engine
+        engine.last_fluid_time = engine.clock.time()
+        if self.julabo is not None:
+            setpoint = engine.fluid_setpoint()
+            sent = engine.clock.monotonic()
+            try:
+                await self.julabo.set_work_temperature(setpoint)
+            except DeviceError as e:
+                print(f"Warning: {e}, fluid setpoint {setpoint} not sent")
+            else:
+                engine.align_julabo("setpoint", "JULABO SETPOINT (C)", setpoint, sent)
+                print(f"Set julabo temp to {setpoint}")
+        engine.count_fluid_interval()
+
+    async def _chamber_interval(self):
+        self.engine.set_chamber_temp()
+
+
+if __name__ == "__main__":
+    # A short test against the simulated devices: 2 s cycles compressed to 50 ms, one pause and resume
+    import os
+    import tempfile
+    import threading
+    from engine_lib import TestEngine
+    from sim_devices_lib import SimFlexLogger, SimCantroller, SimJulabo
+
+    async def demo():
+        workdir = tempfile.mkdtemp(prefix="async_runner_")
+        engine = TestEngine(journal_path=os.path.join(workdir, "checkpoint.journal"), log_dir=workdir)
+        engine._flex, engine._cantroller, engine._julabo = SimFlexLogger(6, latency=0.002), SimCantroller(), SimJulabo()
+        engine.sensors = engine._flex.get_sensor_list()
+        engine.flexlogger_connected = engine.canbus_connected = engine.julabo_connected = True
+        engine.timer_ms = 100
+        engine.pressure_on_time, engine.pressure_off_time, engine.pump_warmup_time = 0.04, 0.01, 0.05
+        engine.fluid_period = engine.chamber_period = 0.5 / 3600
+        engine.fluid_min_temp, engine.fluid_max_temp, engine.chamber_min_temp, engine.chamber_max_temp = 20, 80, 20, 60
+        engine.total_period = 0.002
+        engine.pressure_num_cycles = 60
+        engine.build_profile()
+
+        runner = AsyncTestRunner(engine)
+        runner.start_polling()
+        runner.start()
+        await asyncio.sleep(1.0)
+        print(f"Threads while running: {threading.active_count()}")
+        runner.pause()
+        await runner.wait()
+        paused_at = engine.pressure_cycle_count
+        runner.start()
+        await runner.wait()
+        await runner.close()
+        engine.shutdown()
+        sends = len(engine._cantroller.bus.sent)
+        print(f"Paused at cycle {paused_at}, finished {engine.pressure_cycle_count}/{engine.pressure_num_cycles}, "
+              f"fluid {engine.fluid_cycle_count}, chamber {engine.chamber_cycle_count}, {sends} CAN messages, "
+              f"setpoints {engine._julabo.setpoints}")
+
+    asyncio.run(demo())
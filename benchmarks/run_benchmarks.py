@@ -0,0 +1,271 @@
+""" Benchmarks of the rig's hot paths against simulated devices, compared with a saved baseline.
+
+    python benchmarks/run_benchmarks.py                  run everything, compare with baseline.json
+    python benchmarks/run_benchmarks.py --save-baseline  run and store the results as the new baseline
+    python benchmarks/run_benchmarks.py --only sensor_tick plot_view
+
+Exits with 1 when a metric is worse than its baseline by more than its threshold.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import threading
+import statistics
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import numpy as np
+from sim_devices_lib import SimFlexLogger, SimCanBus, SimCantroller, SimSerial
+
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+RESULTS_FILE = os.path.join(BENCH_DIR, "results.json")
+
+# Allowed slowdown relative to the baseline before a metric counts as a regression
+DEFAULT_THRESHOLD = 0.25
+# Timing metrics that jitter more run to run
+THRESHOLDS = {
+    "can_jitter_p99_ms": 1.0,
+    "can_jitter_max_ms": 1.0,
+    "pump_cycle_error_mean_ms": 0.5,
+    "pump_cycle_error_max_ms": 1.0,
+}
+
+
+class SkipBenchmark(Exception):
+    """ Raised when a benchmark cannot run here (library not installed) """
+
+
+def _timeit(function, repeat):
+    """ Per-call times in seconds """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def _engine(workdir, channel_count):
+    from engine_lib import TestEngine
+    engine = TestEngine(journal_path=os.path.join(workdir, "checkpoint.journal"), log_dir=workdir)
+    engine._flex = SimFlexLogger(channel_count)
+    engine.flexlogger_connected = True
+    engine.sensors = engine._flex.get_sensor_list()
+    engine._anomaly.bind(engine.sensors)
+    engine._test_active = True  # rules and time index run as during a test
+    return engine
+
+
+def bench_sensor_tick(workdir, quick):
+    """ Cost of one poll_sensors() (read, parse, rules, listeners) against channel count """
+    results = {}
+    for channels in (4, 16, 64):
+        engine = _engine(workdir, channels)
+        times = _timeit(engine.poll_sensors, 200 if quick else 2000)
+        results[f"sensor_tick_{channels}ch_us"] = statistics.median(times) * 1e6
+        engine._journal.close()
+    return results
+
+
+def bench_flexlogger_read(workdir, quick):
+    """ FlexLoggerInterface read path (automation call, str() of the data point, regex and timestamp parse)
+    against the sim_flexlogger_lib stand-in without latency, per read and per poll_sensors() """
+    from flexlogger_lib import FlexLoggerInterface
+    from sim_flexlogger_lib import SimApplication
+    results = {}
+    for channels in (6, 64):
+        app = SimApplication(channels=[f"PRESSURE {i} PSI" for i in range(channels)])
+        flex = FlexLoggerInterface(app=app)
+        flex.connect_to_instance()
+        times = _timeit(lambda: flex.read_sensor_sample("PRESSURE 0 PSI"), 500 if quick else 5000)
+        results[f"flexlogger_read_{channels}ch_us"] = statistics.median(times) * 1e6
+        engine = _engine(workdir, channels)
+        engine._flex = flex
+        engine.sensors = flex.get_sensor_list()
+        engine._anomaly.bind(engine.sensors)
+        times = _timeit(engine.poll_sensors, 100 if quick else 1000)
+        results[f"flexlogger_poll_{channels}ch_us"] = statistics.median(times) * 1e6
+        engine._journal.close()
+    return results
+
+
+def bench_logging(workdir, quick):
+    """ CSV row appends (TestEngine.update_log_file) and columnar cycle records """
+    from cycle_features_lib import CycleFeatureTable, CYCLE_DTYPE
+    engine = _engine(workdir, 16)
+    engine.poll_sensors()
+    engine.create_log_file("bench")
+    rows = 500 if quick else 5000
+    start = time.perf_counter()
+    for _ in range(rows):
+        engine.update_log_file()
+    csv_rate = rows / (time.perf_counter() - start)
+    engine._journal.close()
+
+    table = CycleFeatureTable(os.path.join(workdir, "bench_cycles.bin"))
+    record = np.zeros((), dtype=CYCLE_DTYPE)
+    records = 20000 if quick else 200000
+    start = time.perf_counter()
+    for i in range(records):
+        record["cycle"] = i
+        table.append(record)
+    table.close()
+    columnar_rate = records / (time.perf_counter() - start)
+    return {"csv_rows_per_s": csv_rate, "cycle_records_per_s": columnar_rate}
+
+
+def bench_can_jitter(workdir, quick):
+    """ Interval error of the Cantroller 200 ms transmit threads """
+    try:
+        from can_controller_lib import Cantroller
+    except ImportError as e:
+        raise SkipBenchmark(f"python-can not available ({e})")
+    controller = Cantroller(megatron=False)
+    controller.bus = SimCanBus()
+    controller.start()
+    time.sleep(2 if quick else 10)
+    controller.stop()
+    sends = [t for t, arbitration_id in controller.bus.sent if arbitration_id == 0x203]
+    errors = np.abs(np.diff(sends) - 0.2) * 1000
+    return {"can_jitter_p99_ms": float(np.percentile(errors, 99)), "can_jitter_max_ms": float(errors.max())}
+
+
+def bench_julabo(workdir, quick):
+    """ Round trip of JULABO.send_command over a simulated 4800 baud link (includes the 250 ms safe interval) """
+    try:
+        from julabo_lib import JULABO
+    except ImportError as e:
+        raise SkipBenchmark(f"pyserial not available ({e})")
+    julabo = object.__new__(JULABO)  # skip __init__, it opens a real port
+    julabo.port = "SIM"
+    julabo.ser = SimSerial()
+    julabo.lock = threading.Lock()
+    times = _timeit(lambda: julabo.get_temperature(), 3 if quick else 10)
+    return {"julabo_command_ms": statistics.median(times) * 1000}
+
+
+def bench_plot_view(workdir, quick):
+    """ MinMaxPyramid.view() for a full-range redraw against history length """
+    from plot_pyramid_lib import MinMaxPyramid
+    results = {}
+    sizes = (10000, 100000) if quick else (10000, 100000, 1000000)
+    for size in sizes:
+        pyramid = MinMaxPyramid()
+        start = time.perf_counter()
+        for i in range(size):
+            pyramid.append(i / 3600, 35.0 + (i % 100) * 0.01)
+        append_us = (time.perf_counter() - start) / size * 1e6
+        times = _timeit(lambda: pyramid.view(0, size / 3600, 2000), 50)
+        results[f"plot_view_{size}_us"] = statistics.median(times) * 1e6
+        results[f"plot_append_{size}_us"] = append_us
+    return results
+
+
+def bench_pump_cycle(workdir, quick):
+    """ Timing error of pump_cycle edges against the requested on/off times """
+    from engine_lib import pump_cycle
+    controller = SimCantroller()
+    on_time, off_time = 0.05, 0.02
+    for _ in range(20 if quick else 100):
+        pump_cycle(controller, 80, on_time, off_time)
+    times = np.array([t for t, value in controller.changes])
+    durations = np.diff(times)
+    expected = np.resize([on_time, off_time], len(durations))
+    errors = np.abs(durations - expected) * 1000
+    return {"pump_cycle_error_mean_ms": float(errors.mean()), "pump_cycle_error_max_ms": float(errors.max())}
+
+
+BENCHMARKS = {
+    "sensor_tick": bench_sensor_tick,
+    "flexlogger_read": bench_flexlogger_read,
+    "logging": bench_logging,
+    "can_jitter": bench_can_jitter,
+    "julabo": bench_julabo,
+    "plot_view": bench_plot_view,
+    "pump_cycle": bench_pump_cycle,
+}
+
+# Metrics where a larger number is better, all others are times
+HIGHER_IS_BETTER = ("_per_s",)
+
+
+def compare(results, baseline):
+    """ List of (metric, value, baseline value, change, regressed) for metrics present in both """
+    rows = []
+    for metric, value in results.items():
+        entry = baseline.get("metrics", {}).get(metric)
+        if entry is None:
+            continue
+        base = entry["value"]
+        threshold = entry.get("threshold", DEFAULT_THRESHOLD)
+        if base == 0:
+            continue
+        change = (value - base) / base
+        if metric.endswith(HIGHER_IS_BETTER):
+            regressed = change < -threshold
+        else:
+            regressed = change > threshold
+        rows.append((metric, value, base, change, regressed))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rig hot-path benchmarks with simulated devices")
+    parser.add_argument("--only", nargs="*", choices=list(BENCHMARKS), help="run only these benchmarks")
+    parser.add_argument("--quick", action="store_true", help="fewer iterations, for a fast check")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    args = parser.parse_args(argv)
+
+    results = {}
+    skipped = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in (args.only or BENCHMARKS):
+            print(f"Running {name}...")
+            try:
+                results.update(BENCHMARKS[name](workdir, args.quick))
+            except SkipBenchmark as e:
+                skipped[name] = str(e)
+                print(f"  skipped: {e}")
+
+    report = {"time": time.strftime("%Y-%m-%d %H:%M:%S"), "machine": platform.node(),
+              "python": platform.python_version(), "quick": args.quick, "skipped": skipped,
+              "metrics": {metric: {"value": value, "threshold": THRESHOLDS.get(metric, DEFAULT_THRESHOLD)}
+                          for metric, value in results.items()}}
+    with open(RESULTS_FILE, "w") as file:
+        json.dump(report, file, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"Baseline saved to '{args.baseline}'")
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    rows = {row[0]: row for row in compare(results, baseline)}
+
+    print(f"\n{'metric':<28} {'value':>12} {'baseline':>12} {'change':>8}")
+    regressions = 0
+    for metric, value in results.items():
+        if metric in rows:
+            _, _, base, change, regressed = rows[metric]
+            regressions += regressed
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{metric:<28} {value:>12.3f} {base:>12.3f} {change:>+7.0%}{flag}")
+        else:
+            print(f"{metric:<28} {value:>12.3f} {'-':>12} {'':>8}")
+    if regressions:
+        print(f"\n{regressions} metric(s) regressed beyond their threshold")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
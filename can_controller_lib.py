@@ -2,8 +2,12 @@ import can
 import threading
 import time
 
+# Pump command frames: arbitration id -> (channel name, data byte, scale), the inverse of the *_message encoders
+PUMP_FRAMES = {0x203: ("BCM PUMP POWER (%)", 0, 1), 0x204: ("PTN PUMP POWER (%)", 0, 1), 0x18EF01FE: ("EMP PUMP POWER (%)", 3, 0.5)}
+
+
 class Cantroller:
-    def __init__(self, megatron):
+    def __init__(self, megatron, channel=None):
         
         # Default values
         self.bcm_power = 0
@@ -18,7 +22,10 @@ class Cantroller:
 
         self.megatron = megatron
 
-        if self.megatron:
+        # Explicit channel lets several rigs share one PC, otherwise main is 0 and megatron 1
+        if channel is not None:
+            self.channel = channel
+        elif self.megatron:
             self.channel = 1
         else:
             self.channel = 0
@@ -37,31 +44,53 @@ class Cantroller:
         raw_value = int(value / scale)
         return max(min_val, min(raw_value, max_val))
 
-    def _send_bcm_command(self):
+    def bcm_message(self):
         """ Translate raw value to sendable 'message' to thermal box battery pump """
+        raw_value = self.encode_signal(self.bcm_power, 1, 0, 100)
+        data = [raw_value, 0, 0xC8, 0x01, 0, 0, 0, 0]
+        return can.Message(arbitration_id=0x203, data=data, is_extended_id=False, is_rx=False) #ID is 0x203 for BCM pump, found through .dbc file
+
+    def ptn_message(self):
+        """ Translate raw value to sendable 'message' to thermal box powertrain pump """
+        raw_value = self.encode_signal(self.ptn_power, 1, 0, 100)
+        data = [raw_value, 0, 0xC8, 0x01, 0, 0, 0, 0]
+        return can.Message(arbitration_id=0x204, data=data, is_extended_id=False, is_rx=False) #ID is 0x204 for PTN pump, found through .dbc file
+
+    def pump_message(self):
+        """ Translate raw value to sendable 'message' to emp pump """
+        raw_value = self.encode_signal(self.pump2_power, 0.5, 0, 200)
+        data = [0x05, 0, 0, raw_value, 0, 0, 0, 0]
+        return can.Message(arbitration_id=0x18EF01FE, data=data, is_extended_id=True, is_rx=False) #ID is for EMP pump (EMP pumps historically have underperformed/failed)
+
+    def frame_channels(self):
+        """ Channel names decode_frame can return for this pump box """
+        return [PUMP_FRAMES[0x203][0]] if self.megatron else [PUMP_FRAMES[0x203][0], PUMP_FRAMES[0x204][0]]
+
+    def decode_frame(self, message):
+        """ (channel name, power) of a pump command frame (e.g. our own, echoed with its hardware timestamp), None for others """
+        frame = PUMP_FRAMES.get(message.arbitration_id)
+        if frame is None:
+            return None
+        name, byte, scale = frame
+        return name, message.data[byte] * scale
+
+    def periodic_messages(self):
+        """ Builders of the messages the pumps need every 200 ms """
+        return [self.bcm_message] if self.megatron else [self.bcm_message, self.ptn_message]
+
+    def _send_bcm_command(self):
         while self.running:
-            raw_value = self.encode_signal(self.bcm_power, 1, 0, 100)
-            data = [raw_value, 0, 0xC8, 0x01, 0, 0, 0, 0]
-            message = can.Message(arbitration_id=0x203, data=data, is_extended_id=False, is_rx=False) #ID is 0x203 for BCM pump, found through .dbc file
-            self.bus.send(message)
+            self.bus.send(self.bcm_message())
             time.sleep(0.2)
 
     def _send_ptn_command(self):
-        """ Translate raw value to sendable 'message' to thermal box powertrain pump """
         while self.running:
-            raw_value = self.encode_signal(self.ptn_power, 1, 0, 100)
-            data = [raw_value, 0, 0xC8, 0x01, 0, 0, 0, 0]
-            message = can.Message(arbitration_id=0x204, data=data, is_extended_id=False, is_rx=False) #ID is 0x204 for PTN pump, found through .dbc file
-            self.bus.send(message)
+            self.bus.send(self.ptn_message())
             time.sleep(0.2)
 
     def _send_pump_command(self):
-        """ Translate raw value to sendable 'message' to emp pump """
         while self.running:
-            raw_value = self.encode_signal(self.pump2_power, 0.5, 0, 200)
-            data = [0x05, 0, 0, raw_value, 0, 0, 0, 0]
-            message = can.Message(arbitration_id=0x18EF01FE, data=data, is_extended_id=True, is_rx=False) #ID is for EMP pump (EMP pumps historically have underperformed/failed)
-            self.bus.send(message)
+            self.bus.send(self.pump_message())
             time.sleep(0.2)
 
     def start(self):
@@ -74,6 +103,12 @@ class Cantroller:
                 self.ptn_thread = threading.Thread(target=self._send_ptn_command, daemon=True)
                 self.ptn_thread.start()
 
+    def healthy(self):
+        """ False once the bus is in error state or a sender thread died (a failed send ends it) """
+        if self.running and any(t is not None and not t.is_alive() for t in (self.bcm_thread, self.ptn_thread)):
+            return False
+        return self.bus.state != can.BusState.ERROR
+
     def stop(self):
         """ Stops threads """
         self.running = False
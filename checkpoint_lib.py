@@ -0,0 +1,215 @@
+import os
+import struct
+import threading
+import time
+import zlib
+
+MAGIC = 0x32504B43  # "CKP2", changes with the record layout: journals of another format are never restored
+
+# Record flags
+FLAG_RUNNING = 0x1
+FLAG_COMPLETE = 0x2
+
+# Fixed-size little-endian record, the trailing CRC32 covers everything before it
+_BODY = struct.Struct(
+    "<IIQd"         # magic, flags, sequence, wall time
+    "QIdId"         # pressure count, fluid count, fluid remaining s, chamber count, chamber remaining s
+    "ddd"           # fluid setpoint, chamber setpoint, pump power
+    "dddddddIddB"   # total/fluid/chamber periods, fluid min/max, chamber min/max, pressure cycles, max/min psi, megatron
+    "QI"            # log file position, cycle log count
+    "128s128s"      # log file name, profile file path
+    "32s"           # SHA-256 of the profile file content (TestProfile.content_hash), zeros without a profile file
+)
+_CRC = struct.Struct("<I")
+RECORD_SIZE = _BODY.size + _CRC.size
+NAME_BYTES = 128  # room for the log file name and profile path, longer ones are not recorded
+
+
+def _name_field(text):
+    """ UTF-8 bytes of a file name for the record, empty if it does not fit (a cut path names the wrong file) """
+    encoded = text.encode("utf-8")
+    return encoded if len(encoded) <= NAME_BYTES else b""
+
+
+class CheckpointState:
+    """ Everything needed to continue a test exactly where it stopped """
+    FIELDS = ("flags", "sequence", "wall_time",
+              "pressure_cycle_count", "fluid_cycle_count", "fluid_remaining_time",
+              "chamber_cycle_count", "chamber_remaining_time",
+              "fluid_setpoint", "chamber_setpoint", "pump_power",
+              "total_period", "fluid_period", "chamber_period",
+              "fluid_min_temp", "fluid_max_temp", "chamber_min_temp", "chamber_max_temp",
+              "pressure_num_cycles", "pressure_max_psi", "pressure_min_psi", "megatron_enabled",
+              "log_position", "cycle_log_count", "log_file_name", "profile_path", "profile_hash")
+
+    def __init__(self, **values):
+        for field in self.FIELDS:
+            setattr(self, field, values.get(field, "" if field in ("log_file_name", "profile_path", "profile_hash") else 0))
+
+    def pack(self):
+        body = _BODY.pack(
+            MAGIC, int(self.flags), int(self.sequence), float(self.wall_time),
+            int(self.pressure_cycle_count), int(self.fluid_cycle_count), float(self.fluid_remaining_time),
+            int(self.chamber_cycle_count), float(self.chamber_remaining_time),
+            float(self.fluid_setpoint), float(self.chamber_setpoint), float(self.pump_power),
+            float(self.total_period), float(self.fluid_period), float(self.chamber_period),
+            float(self.fluid_min_temp), float(self.fluid_max_temp), float(self.chamber_min_temp), float(self.chamber_max_temp),
+            int(self.pressure_num_cycles), float(self.pressure_max_psi), float(self.pressure_min_psi), bool(self.megatron_enabled),
+            int(self.log_position), int(self.cycle_log_count),
+            _name_field(self.log_file_name), _name_field(self.profile_path), bytes.fromhex(self.profile_hash))
+        return body + _CRC.pack(zlib.crc32(body))
+
+    @classmethod
+    def unpack(cls, record):
+        """ Decode a record, None if it is torn or corrupt """
+        if len(record) != RECORD_SIZE:
+            return None
+        body = record[:_BODY.size]
+        if _CRC.unpack(record[_BODY.size:])[0] != zlib.crc32(body):
+            return None
+        values = _BODY.unpack(body)
+        if values[0] != MAGIC:
+            return None
+        state = cls(**dict(zip(cls.FIELDS, values[1:])))
+        state.megatron_enabled = bool(state.megatron_enabled)
+        state.log_file_name = state.log_file_name.rstrip(b"\0").decode("utf-8", "replace")
+        state.profile_path = state.profile_path.rstrip(b"\0").decode("utf-8", "replace")
+        state.profile_hash = state.profile_hash.hex() if any(state.profile_hash) else ""
+        return state
+
+    @property
+    def complete(self):
+        return bool(self.flags & FLAG_COMPLETE)
+
+
+class CheckpointJournal:
+    """ Append-only journal of fixed-size CheckpointState records.
+
+    append() only packs and buffers the record; the file is flushed and fsynced every
+    sync_every records or sync_interval seconds, so a crash loses at most that much.
+    Once the file holds compact_records records it is atomically replaced by its last one.
+    open() cuts a torn or corrupt tail off first, so new records stay aligned after a crash.
+    """
+    def __init__(self, path, sync_every=16, sync_interval=30.0, compact_records=50000):
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.compact_records = compact_records
+        self._lock = threading.Lock()
+        self._file = None
+        self._sequence = 0
+        self._records = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._long_names = set()
+        self.last_state = None
+
+    def open(self, truncate=False):
+        """ Open the journal for appending, truncate=True starts a fresh test """
+        if truncate and os.path.exists(self.path):
+            os.remove(self.path)
+        last, end = (None, 0) if truncate else _last_record(self.path)
+        if os.path.exists(self.path) and os.path.getsize(self.path) > end:
+            print(f"Warning: dropping {os.path.getsize(self.path) - end} torn or corrupt bytes at the end of '{self.path}'")
+            os.truncate(self.path, end)
+        self._sequence = last.sequence if last else 0
+        self._file = open(self.path, "ab", buffering=64 * RECORD_SIZE)
+        self._records = self._file.tell() // RECORD_SIZE
+        self._unsynced = 0
+        self.last_state = last
+
+    def append(self, state, sync=False):
+        """ Buffer a checkpoint, syncing to disk on the configured cadence (or when sync=True) """
+        with self._lock:
+            if self._file is None:
+                return
+            for name in (state.log_file_name, state.profile_path):
+                if not _name_field(name) and name and name not in self._long_names:
+                    self._long_names.add(name)
+                    print(f"Warning: '{name}' is longer than {NAME_BYTES} bytes and is not recorded in the checkpoint")
+            self._sequence += 1
+            state.sequence = self._sequence
+            state.wall_time = time.time()
+            self._file.write(state.pack())
+            self._records += 1
+            self._unsynced += 1
+            self.last_state = state
+
+            if sync or self._unsynced >= self.sync_every or time.monotonic() - self._last_sync >= self.sync_interval:
+                self._sync()
+            if self._records >= self.compact_records:
+                self._compact()
+
+    def sync(self):
+        """ Force buffered records to disk """
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _compact(self):
+        """ Replace the journal with a single record holding the latest state """
+        self._sync()
+        self._file.close()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(self.last_state.pack())
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, "ab", buffering=64 * RECORD_SIZE)
+        self._records = 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+
+def _last_record(path):
+    """ (newest intact CheckpointState, file offset just past it), (None, 0) if there is none """
+    try:
+        with open(path, "rb") as file:
+            file.seek(0, os.SEEK_END)
+            size = file.tell()
+            # A torn final write leaves a partial record, start from the last whole one
+            offset = (size // RECORD_SIZE - 1) * RECORD_SIZE
+            while offset >= 0:
+                file.seek(offset)
+                state = CheckpointState.unpack(file.read(RECORD_SIZE))
+                if state is not None:
+                    return state, offset + RECORD_SIZE
+                offset -= RECORD_SIZE
+    except OSError:
+        pass
+    return None, 0
+
+
+def recover(path):
+    """ Return the newest intact CheckpointState in a journal, None if there is none """
+    return _last_record(path)[0]
+
+
+if __name__ == "__main__":
+    journal = CheckpointJournal("example.journal")
+    journal.open(truncate=True)
+    state = CheckpointState(flags=FLAG_RUNNING, fluid_setpoint=40, pump_power=80, log_file_name="example.csv")
+
+    start = time.perf_counter()
+    cycles = 100000
+    for i in range(cycles):
+        state.pressure_cycle_count = i
+        journal.append(state)
+    elapsed = time.perf_counter() - start
+    journal.close()
+
+    print(f"{RECORD_SIZE} byte records, {elapsed / cycles * 1e6:.1f} us per checkpoint")
+    print(f"Recovered pressure cycle {recover('example.journal').pressure_cycle_count}")
+    os.remove("example.journal")
@@ -0,0 +1,204 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class SystemClock:
+    """ Real time: what the engine and timers use unless a simulation hands them a VirtualClock """
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def timer(self, interval, function):
+        """ Unstarted one-shot timer calling function after interval seconds """
+        timer = threading.Timer(interval, function)
+        timer.daemon = True
+        return timer
+
+    def thread(self, target, name=None):
+        """ Unstarted daemon thread running target """
+        return threading.Thread(target=target, name=name, daemon=True)
+
+    def join(self, thread, timeout=None):
+        thread.join(timeout)
+
+
+SYSTEM_CLOCK = SystemClock()
+
+_SLEEP = 0
+_TIMER = 1
+
+
+class _VirtualTimer:
+    """ threading.Timer look-alike that fires on the virtual clock """
+    def __init__(self, clock, interval, function):
+        self.clock = clock
+        self.interval = interval
+        self.function = function
+        self.cancelled = False
+        self.daemon = True
+
+    def start(self):
+        self.clock._schedule(self.interval, _TIMER, self)
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class _VirtualThread(threading.Thread):
+    """ Real thread whose sleeps and joins go through the virtual clock """
+    def __init__(self, clock, target, name=None):
+        super().__init__(target=target, name=name, daemon=True)
+        self.clock = clock
+
+    def start(self):
+        self.clock._register()  # before the thread runs, so time cannot move past its start
+        super().start()
+
+    def run(self):
+        try:
+            super().run()
+        finally:
+            self.clock._unregister(self)
+
+
+class VirtualClock:
+    """ Discrete-event clock: time jumps to the next pending wake-up whenever every thread it manages is waiting.
+
+    Engine threads really run, but their sleeps cost nothing, so hours of test time pass in
+    moments. Threads must be created with thread() (or call run() for the driving thread) so the
+    clock knows when all of them are blocked. Timer callbacks run when their time comes, on the
+    thread that advanced the clock.
+    """
+    def __init__(self, start=None):
+        self._now = time.time() if start is None else start
+        self._start = self._now
+        self._cond = threading.Condition()
+        self._events = []
+        self._seq = itertools.count()
+        self._participants = 0
+        self._blocked = 0
+        self._joiners = {}
+        self.events_run = 0
+
+    def time(self):
+        return self._now
+
+    def monotonic(self):
+        return self._now - self._start
+
+    def elapsed(self):
+        return self._now - self._start
+
+    def sleep(self, seconds):
+        token = [False]
+        with self._cond:
+            heapq.heappush(self._events, (self._now + max(seconds, 0.0), next(self._seq), _SLEEP, token))
+            self._blocked += 1
+            self._advance()
+            while not token[0]:
+                self._cond.wait()
+
+    def timer(self, interval, function):
+        return _VirtualTimer(self, interval, function)
+
+    def thread(self, target, name=None):
+        return _VirtualThread(self, target, name)
+
+    def join(self, thread, timeout=None):
+        """ Wait for a thread made by thread(); the caller counts as blocked meanwhile """
+        if not isinstance(thread, _VirtualThread):
+            thread.join(timeout)
+            return
+        token = [False]
+        with self._cond:
+            if getattr(thread, "_clock_done", False):
+                return
+            self._joiners.setdefault(thread, []).append(token)
+            self._blocked += 1
+            self._advance()
+            while not token[0]:
+                self._cond.wait()
+        thread.join(timeout)
+
+    def run(self, function, *args):
+        """ Run function on the calling thread as a clock participant """
+        self._register()
+        try:
+            return function(*args)
+        finally:
+            self._unregister(None)
+
+    def _register(self):
+        with self._cond:
+            self._participants += 1
+
+    def _unregister(self, thread):
+        with self._cond:
+            self._participants -= 1
+            if thread is not None:
+                thread._clock_done = True
+            for token in self._joiners.pop(thread, []):
+                token[0] = True
+                self._blocked -= 1
+            self._cond.notify_all()
+            self._advance()
+
+    def _schedule(self, delay, kind, payload):
+        with self._cond:
+            heapq.heappush(self._events, (self._now + max(delay, 0.0), next(self._seq), kind, payload))
+
+    def _advance(self):
+        """ With the lock held: while every participant waits, move time to the next event and run it """
+        while self._participants and self._blocked == self._participants and self._events:
+            when, _, kind, payload = heapq.heappop(self._events)
+            if kind == _TIMER and payload.cancelled:
+                continue
+            self._now = max(self._now, when)
+            self.events_run += 1
+            if kind == _SLEEP:
+                payload[0] = True
+                self._blocked -= 1
+                self._cond.notify_all()
+                return
+            # Timer callback runs unlocked and counts as a running participant until it returns
+            self._participants += 1
+            self._cond.release()
+            try:
+                payload.function()
+            finally:
+                self._cond.acquire()
+                self._participants -= 1
+
+
+if __name__ == "__main__":
+    # Two threads sleeping at different rates plus a repeating timer, a simulated day in well under a second
+    clock = VirtualClock(start=0.0)
+    ticks = {"fast": 0, "slow": 0, "timer": 0}
+
+    def sleeper(name, period):
+        while clock.time() < 86400:
+            clock.sleep(period)
+            ticks[name] += 1
+
+    def on_timer():
+        ticks["timer"] += 1
+        clock.timer(3600, on_timer).start()
+
+    def main():
+        clock.timer(3600, on_timer).start()
+        threads = [clock.thread(lambda: sleeper("fast", 5.27)), clock.thread(lambda: sleeper("slow", 60))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            clock.join(thread)
+
+    start = time.perf_counter()
+    clock.run(main)
+    print(f"{ticks} in {time.perf_counter() - start:.2f}s, virtual time {clock.time() / 3600:.2f} h, {clock.events_run} events")
@@ -0,0 +1,257 @@
+import math
+import threading
+from collections import deque
+import numpy as np
+
+# One record per pressure cycle (48 bytes)
+CYCLE_DTYPE = np.dtype([
+    ("cycle", "<u4"),
+    ("samples", "<u4"),
+    ("t_on", "<f8"),            # monotonic time the pump was commanded on
+    ("on_time", "<f4"),         # seconds the pump was on
+    ("peak", "<f4"),            # psi
+    ("time_to_peak", "<f4"),    # seconds from pump on
+    ("overshoot", "<f4"),       # peak above target psi
+    ("decay_time", "<f4"),      # seconds from pump off until below decay_fraction of peak, NaN if never
+    ("area", "<f4"),            # psi * s over the whole cycle
+    ("minimum", "<f4"),
+    ("_pad", "<u4"),
+])
+
+
+class CycleFeatureTable:
+    """ Compact per-cycle record table: recent records in memory, every record appended to a binary file """
+    def __init__(self, path=None, keep=1000):
+        self.path = path
+        self.recent = np.zeros(keep, dtype=CYCLE_DTYPE)
+        self.count = 0
+        self._file = open(path, "ab") if path else None
+
+    def append(self, record):
+        self.recent[self.count % self.recent.size] = record
+        self.count += 1
+        if self._file is not None:
+            self._file.write(record.tobytes())
+
+    def last(self, n=1):
+        """ The n most recent records, oldest first """
+        n = min(n, self.count, self.recent.size)
+        idx = (np.arange(self.count - n, self.count)) % self.recent.size
+        return self.recent[idx]
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def load_cycle_table(path):
+    """ Read a whole cycle feature file written by CycleFeatureTable """
+    return np.fromfile(path, dtype=CYCLE_DTYPE)
+
+
+class CycleFeatureExtractor:
+    """ Cuts the pressure stream at pump on/off edges and computes cycle features incrementally.
+
+    Only running scalars for the current cycle are kept; a cycle is finished and written to the
+    table at the next pump on edge (or flush()), so the decay after pump off is included.
+    """
+    def __init__(self, table, target_psi=35.0, decay_fraction=0.1):
+        self.table = table
+        self.target_psi = target_psi
+        self.decay_fraction = decay_fraction
+        self._lock = threading.Lock()
+        self._open = False
+
+    def _start(self, t, cycle):
+        self._open = True
+        self._cycle = cycle
+        self._t_on = t
+        self._t_off = None
+        self._samples = 0
+        self._peak = -math.inf
+        self._t_peak = t
+        self._minimum = math.inf
+        self._area = 0.0
+        self._last = None
+        self._decay_time = math.nan
+
+    def _finish(self):
+        record = np.zeros((), dtype=CYCLE_DTYPE)
+        record["cycle"] = self._cycle
+        record["samples"] = self._samples
+        record["t_on"] = self._t_on
+        record["on_time"] = (self._t_off - self._t_on) if self._t_off is not None else math.nan
+        if self._samples:
+            record["peak"] = self._peak
+            record["time_to_peak"] = self._t_peak - self._t_on
+            record["overshoot"] = self._peak - self.target_psi
+            record["minimum"] = self._minimum
+        else:
+            record["peak"] = record["time_to_peak"] = record["overshoot"] = record["minimum"] = math.nan
+        record["decay_time"] = self._decay_time
+        record["area"] = self._area
+        self.table.append(record)
+        self._open = False
+        return record
+
+    def pump_on(self, t, cycle):
+        """ Rising edge: close the previous cycle and start cycle number cycle """
+        with self._lock:
+            if self._open:
+                self._finish()
+            self._start(t, cycle)
+
+    def pump_off(self, t):
+        """ Falling edge of the current cycle """
+        with self._lock:
+            if self._open and self._t_off is None:
+                self._t_off = t
+
+    def add_sample(self, t, psi):
+        """ Feed one pressure sample, ignored outside a cycle """
+        with self._lock:
+            if not self._open:
+                return
+            self._samples += 1
+            if psi > self._peak:
+                self._peak = psi
+                self._t_peak = t
+            if psi < self._minimum:
+                self._minimum = psi
+            if self._last is not None:
+                last_t, last_psi = self._last
+                self._area += 0.5 * (psi + last_psi) * (t - last_t)
+            self._last = (t, psi)
+
+            if self._t_off is not None and math.isnan(self._decay_time) and psi <= self.decay_fraction * self._peak:
+                self._decay_time = t - self._t_off
+
+    def add_block(self, t, psi):
+        """ Feed arrays of samples (times in order) at once, same result as add_sample for each """
+        t = np.asarray(t, dtype=np.float64)
+        psi = np.asarray(psi, dtype=np.float64)
+        with self._lock:
+            if not self._open or not len(t):
+                return
+            self._samples += len(t)
+            peaks = np.maximum.accumulate(psi)
+            np.maximum(peaks, self._peak, out=peaks)  # running peak including the earlier blocks
+            i = int(np.argmax(psi))
+            if psi[i] > self._peak:
+                self._peak = float(psi[i])
+                self._t_peak = float(t[i])
+            self._minimum = min(self._minimum, float(psi.min()))
+            if self._last is not None:
+                self._area += 0.5 * (psi[0] + self._last[1]) * (t[0] - self._last[0])
+            self._area += float(np.sum(0.5 * (psi[1:] + psi[:-1]) * np.diff(t)))
+            self._last = (float(t[-1]), float(psi[-1]))
+
+            if self._t_off is not None and math.isnan(self._decay_time):
+                below = np.flatnonzero((t >= self._t_off) & (psi <= self.decay_fraction * peaks))
+                if len(below):
+                    self._decay_time = float(t[below[0]]) - self._t_off
+
+    def flush(self):
+        """ Finish the open cycle (end of test or pause) """
+        with self._lock:
+            if self._open:
+                self._finish()
+        self.table.flush()
+
+
+class LateSampleFeed:
+    """ Feeds an extractor from a source whose samples arrive after the pump edges (FlexLogger's log file).
+
+    Edges are held back until samples past them have arrived, then applied in time order between the
+    samples, so every sample lands in the cycle it was measured in. Edges more than max_lag seconds
+    older than the newest one are applied without waiting (the samples stopped coming) and samples
+    from before them are dropped. Same interface as the extractor.
+    """
+    def __init__(self, extractor, max_lag=30.0):
+        self.extractor = extractor
+        self.table = extractor.table
+        self.max_lag = max_lag
+        self.expired = 0  # edges applied without their samples
+        self._edges = deque()  # (t, cycle or None for pump off), oldest first
+        self._applied_until = -np.inf  # time of the last edge applied without its samples
+        self._lock = threading.Lock()
+
+    def pump_on(self, t, cycle):
+        self._add_edge((t, cycle))
+
+    def pump_off(self, t):
+        self._add_edge((t, None))
+
+    def _add_edge(self, edge):
+        with self._lock:
+            self._edges.append(edge)
+            while self._edges[0][0] < edge[0] - self.max_lag:
+                expired = self._edges.popleft()
+                self._apply(expired)
+                self._applied_until = expired[0]
+                self.expired += 1
+
+    def _apply(self, edge):
+        t, cycle = edge
+        if cycle is None:
+            self.extractor.pump_off(t)
+        else:
+            self.extractor.pump_on(t, cycle)
+
+    def add_sample(self, t, psi):
+        self.add_block([t], [psi])
+
+    def add_block(self, t, psi):
+        t = np.asarray(t, dtype=np.float64)
+        psi = np.asarray(psi, dtype=np.float64)
+        with self._lock:
+            if len(t) and t[0] < self._applied_until:  # their cycle was closed without them
+                keep = t >= self._applied_until
+                t, psi = t[keep], psi[keep]
+            if not len(t):
+                return
+            start = 0
+            while self._edges and self._edges[0][0] <= t[-1]:
+                edge = self._edges.popleft()
+                end = int(np.searchsorted(t, edge[0], side="left"))
+                self.extractor.add_block(t[start:end], psi[start:end])
+                self._apply(edge)
+                start = max(start, end)
+            self.extractor.add_block(t[start:], psi[start:])
+
+    def flush(self):
+        """ Apply the edges still waiting for samples and finish the open cycle """
+        with self._lock:
+            edges, self._edges = self._edges, deque()
+            for edge in edges:
+                self._apply(edge)
+        self.extractor.flush()
+
+
+if __name__ == "__main__":
+    import time
+
+    # Synthetic first order pump response: 4 s on, 1.27 s off, sampled at 100 Hz
+    table = CycleFeatureTable()
+    extractor = CycleFeatureExtractor(table, target_psi=35)
+    dt = 0.01
+    t = 0.0
+    psi = 0.0
+    start = time.perf_counter()
+    for cycle in range(1, 201):
+        extractor.pump_on(t, cycle)
+        for on in (True, False):
+            if not on:
+                extractor.pump_off(t)
+            for _ in range(int((4 if on else 1.27) / dt)):
+                psi += ((37 if on else 0) - psi) * dt / 0.3
+                extractor.add_sample(t, psi)
+                t += dt
+    extractor.flush()
+    print(f"{table.count} cycles in {time.perf_counter() - start:.2f}s")
+    print(table.last(3)[["cycle", "peak", "time_to_peak", "overshoot", "decay_time", "area"]])
@@ -0,0 +1,877 @@
+import os
+import csv
+import time
+from datetime import datetime
+from timer_lib import PausableTimer
+from profile_lib import RAMP, compile_profile, square_wave
+from profile_file_lib import DEFAULT_PROFILE, TestProfileError, load_test_profile, load_schedule
+from checkpoint_lib import CheckpointJournal, CheckpointState, FLAG_RUNNING, FLAG_COMPLETE, NAME_BYTES, recover
+from anomaly_lib import AnomalyEngine, rules_from_config, normalize_channel, WARN, CRASH
+from cycle_features_lib import CycleFeatureExtractor, CycleFeatureTable, LateSampleFeed
+from metrics_lib import METRICS
+from clock_lib import SYSTEM_CLOCK
+
+# Device libraries (flexlogger/gRPC, python-can, pyserial) are imported in the connect_* methods,
+# not here, so the window opens without paying for backends that are only needed once CONNECT is pressed
+
+# Start a new log file after this many pressure cycles
+LOG_ROTATE_CYCLES = 16394
+
+
+class EngineError(Exception):
+    """ Raised when the engine cannot do what was asked (device not connected, no profile, bad entries) """
+
+
+def pump_cycle(cantroller, power, on_time, off_time, on_edge=None, off_edge=None, sleep=time.sleep):
+    """ One pressure cycle: pump on at power % for on_time seconds, then off for off_time seconds """
+    if on_edge:
+        on_edge()
+    cantroller.set_pump_power(power)
+    sleep(on_time)
+
+    if off_edge:
+        off_edge()
+    cantroller.set_pump_power(0)
+    sleep(off_time)
+
+
+class TestEngine:
+    """ GUI-free cyclic pressure test: devices, profile, timers, pressure loop, logging and checkpoints.
+
+    Front ends (PumpControlApp, headless.py) set the parameters, call the methods below and
+    subscribe with add_listener(callback); callbacks get (event, data) where event is one of
+    "counts", "sensors", "profile", "alarm", "state" or "finished". Callbacks may run on the
+    test, timer or caller thread.
+    """
+    def __init__(self, journal_path="checkpoint.journal", log_dir="", clock=None):
+        # Time source for every sleep, timer and thread, a VirtualClock in simulations
+        self.clock = clock if clock is not None else SYSTEM_CLOCK
+
+        # Declare enables
+        self._test_active = False
+        self.profile_generated = False
+        self.logging_enabled = True
+        self.test_case_enabled = False
+        self.resume_cycle_enabled = False
+        self.initial_start = False
+        self.megatron_enabled = False #bool for pump box (second level)
+
+        # Declare connections
+        self.flexlogger_connected = False
+        self.canbus_connected = False
+        self.julabo_connected = False
+        self.sensors = []
+
+        # Declare constants
+        self.timer_ms = 1000
+        self.log_file_name = ""
+        self.log_dir = log_dir #directory for log, crash and cycle feature files
+        self.journal_path = journal_path
+
+        # Declare variables
+        self.total_period = 0.0
+        self.fluid_period = 0.0
+        self.fluid_num_cycles = 0
+        self.fluid_min_temp = 0
+        self.fluid_max_temp = 0
+        self.chamber_period = 0.0
+        self.chamber_num_cycles = 0
+        self.chamber_min_temp = 0
+        self.chamber_max_temp = 0
+        self.pressure_num_cycles = 0
+        self.pressure_min_psi = 0
+        self.pressure_max_psi = 0
+        self.pressure_cycle_count = 0
+        self.fluid_cycle_count = 0
+        self.chamber_cycle_count = 0
+        self.fluid_remaining_time = 0
+        self.chamber_remaining_time = 0
+        self.cycle_log_count = 0
+        self.log_file_position = 0
+        self.sample_counter = 0 #timer ticks while the test is active, x-axis of the live data
+        self.latest_values = {}
+        self.read_errors = 0 #FlexLogger reads that raised, the watchdog treats new ones as a failed heartbeat
+        self.aligner = None #align_lib.StreamAligner fed with every timestamped FlexLogger read
+        self.setpoint_scheduler = None #thermal_lib.SetpointScheduler: plans the Julabo setpoints from a fitted bath model
+        self.julabo_setter = None #callable(setpoint) replacing the direct Julabo call, the asyncio runner's goes through AsyncJulabo
+        self.stream = None #tdms_lib.TdmsSource: polls take its latest values and the cycle features every sample, no FlexLogger reads
+        self.pump_power = 80
+        self.pump_warmup_time = 2 #seconds
+        self.pressure_on_time = 4 #seconds
+        self.pressure_off_time = 1.27 #seconds
+        self.COM_port = 'COM6'
+        self.can_channel = None #None picks the default channel for main/megatron
+        self.sensor_filter = [] #only use FlexLogger channels matching these names, empty uses all
+        self.flexlogger_app = None #FlexLogger automation Application, None for the real one (sim_flexlogger_lib.SimApplication off the rig)
+        self.test_profile = None #loaded profile file, overrides the entered values
+        self.fluid_profile = None
+        self.chamber_profile = None
+        self.last_fluid_time = None
+        self.last_chamber_time = None
+
+        self._anomaly = AnomalyEngine() #streaming safety rules, default is the inlet pressure drop check
+        self.waveform_channel = "pressure1" #sensor sampled at high rate for per-cycle features
+        self.waveform_sample_ms = 20 #0 disables waveform sampling
+        self._cycle_features = None
+        self._journal = CheckpointJournal(self.journal_path)
+
+        self.listeners = []
+        self.instrument()
+
+    @property
+    def active(self):
+        return self._test_active
+
+    def add_listener(self, callback):
+        """ Subscribe to engine events, callback(event, data) """
+        self.listeners.append(callback)
+
+    def _notify(self, event, **data):
+        for callback in list(self.listeners):
+            callback(event, data)
+
+    def _notify_counts(self):
+        self._notify("counts", pressure=self.pressure_cycle_count, pressure_total=self.pressure_num_cycles,
+                     fluid=self.fluid_cycle_count, fluid_total=self.fluid_num_cycles,
+                     chamber=self.chamber_cycle_count, chamber_total=self.chamber_num_cycles)
+
+    # ----- Devices -----
+
+    def connect_flexlogger(self):
+        """ Connect to the running FlexLogger project and read its enabled channels """
+        print("Connecting FlexLogger...")
+        from flexlogger_lib import FlexLoggerInterface, FlexLoggerError
+        try:
+            self._flex = FlexLoggerInterface(app=self.flexlogger_app)
+        except FlexLoggerError as e:
+            print(f"Error: {e}")
+            self.flexlogger_connected = False
+            return False
+        self.flexlogger_connected = self._flex.connect_to_instance()
+
+        if self.flexlogger_connected:
+            print("Connected to FlexLogger successfully!")
+            self.sensors = self._channel_list()
+            if not self.sensors:
+                print("Error: FlexLogger project has no enabled channels")
+                self.flexlogger_connected = False
+            self._anomaly.bind(self.sensors)
+            self.instrument()
+        else:
+            print("Error: No running FlexLogger detected.  If FlexLogger is running, this might mean the automation server is not enabled.  To turn on the automation server, see the General tab of the Preferences in FlexLogger")
+        return self.flexlogger_connected
+
+    def _channel_list(self):
+        """ Enabled FlexLogger channels that pass sensor_filter """
+        sensors = self._flex.get_sensor_list()
+        if self.sensor_filter:
+            patterns = [normalize_channel(p) for p in self.sensor_filter]
+            sensors = [s for s in sensors if any(p in normalize_channel(s) for p in patterns)]
+        return sensors
+
+    def connect_canbus(self, megatron=False):
+        """ Connect the main or megatron (pump box second level) CAN channel """
+        name = "MEGATRON" if megatron else "MAIN"
+        print(f"Connecting {name} CANBUS...")
+        from can_controller_lib import Cantroller
+        self._cantroller = Cantroller(megatron=megatron, channel=self.can_channel)
+        self.canbus_connected = self._cantroller.connect_to_instance()
+
+        if self.canbus_connected:
+            print(f"Connected to {name} CANBUS successfully!")
+            self.instrument()
+            if megatron:
+                self.julabo_connected = False
+                self.megatron_enabled = True
+                print("Megatron (Pump Box Second Level) mode activated")
+        else:
+            print("Error: CANBUS did not respond")
+        return self.canbus_connected
+
+    def connect_julabo(self):
+        """ Open the Julabo serial port and verify communication """
+        print("Connecting Julabo...")
+        import serial
+        from julabo_lib import JULABO
+        try:
+            self._julabo = JULABO(self.COM_port, baud=4800) #change based on COM port
+
+            # Test if communication works
+            response = self._julabo.get_version()
+            if response:
+                print(f"Connected to Julabo Version: {response}")
+                self.julabo_connected = True
+                self.instrument()
+            else:
+                print("Error: Julabo did not respond. Check COM port.")
+                self.julabo_connected = False
+
+        except serial.SerialException:
+            print("Error: Could not open COM. Check COM port.")
+            self.julabo_connected = False
+        return self.julabo_connected
+
+    def reconnect_flexlogger(self):
+        """ Reattach after an outage, on the same automation session while it still answers. Fails while
+        the project's channels differ from before, the log columns would no longer match """
+        print("Reconnecting FlexLogger...")
+        sensors = self.sensors
+        try:
+            connected = self._flex.connect_to_instance()  # fresh project and channel spec handles
+            if connected:
+                self.sensors = self._channel_list()
+        except Exception as e:  # the session went with the FlexLogger process (gRPC error)
+            print(f"Warning: FlexLogger session lost ({e}), starting a new one")
+            connected = self.connect_flexlogger()
+
+        if connected and self.sensors != sensors:
+            print("Error: FlexLogger channels changed during the outage, reconnect manually")
+            connected = False
+        self.sensors = sensors
+        self._anomaly.bind(sensors)
+        self.flexlogger_connected = connected
+        if connected:
+            self.instrument()
+        return connected
+
+    def reconnect_canbus(self):
+        """ Reopen the bus on the same Cantroller (channel and pump powers are kept) """
+        print("Reconnecting CANBUS...")
+        self._cantroller.stop()
+        try:
+            self._cantroller.bus.shutdown()
+        except Exception as e:  # the adapter may already be gone
+            print(f"Warning: closing the CAN bus failed: {e}")
+        self.canbus_connected = self._cantroller.connect_to_instance()
+        if self.canbus_connected:
+            self.instrument()
+        return self.canbus_connected
+
+    def reconnect_julabo(self):
+        """ Reopen the same serial port and check the unit answers, a new port handle only if reopening fails """
+        print("Reconnecting Julabo...")
+        try:
+            self._julabo.reopen()
+        except OSError as e:  # SerialException
+            print(f"Warning: reopening {self.COM_port} failed ({e}), opening a new port handle")
+            return self.connect_julabo()
+        self.julabo_connected = bool(self._julabo.get_version())
+        if self.julabo_connected:
+            self.instrument()
+        return self.julabo_connected
+
+    def instrument(self):
+        """ Time the hot paths (sensor reads, Julabo commands, CAN sends, CSV appends) into METRICS.
+        Does nothing unless metrics are enabled, safe to call again after connecting more devices """
+        METRICS.instrument(self, "poll_sensors", "sensor_tick")
+        METRICS.instrument(self, "update_log_file", "csv_append")
+        METRICS.instrument(getattr(self, "_flex", None), "read_sensor_sample", "flexlogger_read")
+        METRICS.instrument(getattr(self, "_julabo", None), "send_command", "julabo_command")
+        METRICS.instrument(getattr(getattr(self, "_cantroller", None), "bus", None), "send", "can_send")
+
+    def check_connections(self):
+        """ True while the FlexLogger project is still open """
+        return self.flexlogger_connected and self._flex.check_active_project()
+
+    # ----- Profile -----
+
+    def test_case(self):
+        """ Load the default cyclic pressure profile (profiles/cyclic_pressure_648h.json) """
+        self.test_profile = load_test_profile(DEFAULT_PROFILE)
+        self.test_profile.apply_to(self)
+        if self.megatron_enabled:
+            self.fluid_period = self.chamber_period
+            self.fluid_min_temp = self.chamber_min_temp
+            self.fluid_max_temp = self.chamber_max_temp
+
+    def load_profile(self, path):
+        """ Load a JSON/TOML profile file and compile (or fetch the cached) schedule, raises TestProfileError """
+        profile = load_test_profile(path)
+        load_schedule(profile) # Compile now so building the profile is instant
+        self.test_profile = profile
+        self.test_profile.apply_to(self)
+        print(f"Loaded test profile '{profile.name}' from {path}")
+        return profile
+
+    def compile_cycle_profile(self, cycle_period, cycle_min, cycle_max):
+        """ Compile a max/min square wave over the total test period, None on bad entries """
+        try:
+            return compile_profile(square_wave(cycle_period, cycle_min, cycle_max, self.total_period))
+        except ValueError:
+            print("Entry Error")
+            return None
+
+    def build_profile(self, new_journal=True, new_log=True):
+        """ Compile and reset the test profile, raises EngineError on bad entries """
+        print("Generating Profile...")
+
+        # Test Case Profile
+        if self.test_case_enabled:
+            try:
+                self.test_case()
+            except TestProfileError as e:
+                raise EngineError(str(e))
+
+        # Megatron
+        if self.megatron_enabled:
+            self.fluid_period = self.chamber_period
+
+        # Compile temperature profiles (profile files use their cached schedule)
+        if self.test_profile is not None:
+            schedule = load_schedule(self.test_profile)
+            self.chamber_profile = schedule.profiles["chamber"]
+            self.fluid_profile = self.chamber_profile if self.megatron_enabled else schedule.profiles["fluid"]
+        else:
+            self.fluid_profile = self.compile_cycle_profile(self.fluid_period, self.fluid_min_temp, self.fluid_max_temp)
+            self.chamber_profile = self.compile_cycle_profile(self.chamber_period, self.chamber_min_temp, self.chamber_max_temp)
+        if self.fluid_profile is None or self.chamber_profile is None:
+            self.profile_generated = False
+            raise EngineError("Cycle periods must be positive and max temp above min temp!")
+        if (self.fluid_profile.kinds == RAMP).any():  # megatron runs the Julabo on the chamber profile
+            self.profile_generated = False
+            raise EngineError("Ramps are not supported on the fluid (Julabo) profile yet, use steps")
+
+        # Enable bool
+        self.profile_generated = True
+        self.initial_start = True
+
+        # Deactivate and reset test
+        self._test_active = False
+        self.pressure_cycle_count = 0
+        self.cycle_log_count = 0
+        self.sample_counter = 0
+        self.fluid_remaining_time = self.fluid_profile.interval_duration(0)
+        self.chamber_remaining_time = self.chamber_profile.interval_duration(0)
+
+        # Resuming test
+        if not self.resume_cycle_enabled:
+            self.fluid_cycle_count = 0
+            self.chamber_cycle_count = 0
+
+        # Safety rules from the profile file (or the default pressure drop check)
+        if self.test_profile is not None:
+            self._anomaly = AnomalyEngine(rules_from_config(self.test_profile.rules_config()))
+        else:
+            self._anomaly = AnomalyEngine()
+        self._anomaly.bind(self.sensors)
+
+        # Temperature timers fire at the compiled interval boundaries (square waves and segment profiles alike)
+        self._fluid_timer = PausableTimer(self.next_fluid_interval, self.set_julabo_temp, self.clock)
+        self._chamber_timer = PausableTimer(self.next_chamber_interval, self.set_chamber_temp, self.clock)
+
+        # Intervals that start within the test; the timers stop after the last one
+        self.fluid_num_cycles = max(self.fluid_profile.intervals_before(self.total_period * 3600), 1)
+        self.chamber_num_cycles = max(self.chamber_profile.intervals_before(self.total_period * 3600), 1)
+
+        # LOGGING
+        if self.logging_enabled and new_log:
+            self.create_log_file(self.log_file_name)
+
+        # Per-cycle waveform feature table is (re)opened on the next start
+        if self._cycle_features is not None:
+            self._cycle_features.table.close()
+            self._cycle_features = None
+
+        # Start a fresh checkpoint journal for the new test
+        if new_journal:
+            self._journal.close()
+            self._journal.open(truncate=True)
+            self.write_checkpoint(sync=True)
+
+        self._notify("profile", fluid=self.fluid_profile, chamber=self.chamber_profile, total_period=self.total_period)
+        self._notify_counts()
+
+    def apply_resume_state(self, pressure_count, fluid_count, fluid_remaining, chamber_count, chamber_remaining):
+        """ Set cycle counts and timer remaining times so the next start resumes from them """
+        if not self.profile_generated:
+            raise EngineError("Profile not generated! Generate profile first.")
+        self.pressure_cycle_count = pressure_count
+
+        self.fluid_cycle_count = fluid_count
+        self._fluid_timer.remaining_time = fluid_remaining #set fluid timer remaining time
+        self.fluid_remaining_time = fluid_remaining
+        self._fluid_timer.paused = True #set to paused to simulate resuming
+        self._fluid_timer.done = fluid_count >= self.fluid_num_cycles #every fluid interval already started
+
+        self.chamber_cycle_count = chamber_count
+        self._chamber_timer.remaining_time = chamber_remaining #set chamber timer remaining time
+        self.chamber_remaining_time = chamber_remaining
+        self._chamber_timer.paused = True #set to paused to simulate resuming
+        self._chamber_timer.done = chamber_count >= self.chamber_num_cycles
+
+        self.sample_counter = self.fluid_profile.elapsed_at(self.fluid_cycle_count, self.fluid_remaining_time)
+        self.resume_cycle_enabled = True
+        self._notify_counts()
+
+    # ----- Checkpoints -----
+
+    def pending_checkpoint(self):
+        """ Newest checkpoint of an unfinished test, None if there is nothing to restore """
+        state = recover(self.journal_path)
+        if state is None or state.complete:
+            return None
+        return state
+
+    def restore_checkpoint(self, state):
+        """ Rebuild the profile and counters exactly as recorded in a checkpoint """
+        print(f"Restoring test from checkpoint #{state.sequence}")
+        self.test_profile = None
+        if state.profile_hash:
+            self.test_profile = self._checkpoint_profile(state)
+            self.test_profile.apply_to(self)
+
+        self.total_period = state.total_period
+        self.fluid_period = state.fluid_period
+        self.fluid_min_temp = state.fluid_min_temp
+        self.fluid_max_temp = state.fluid_max_temp
+        self.chamber_period = state.chamber_period
+        self.chamber_min_temp = state.chamber_min_temp
+        self.chamber_max_temp = state.chamber_max_temp
+        self.pressure_num_cycles = state.pressure_num_cycles
+        self.pressure_max_psi = state.pressure_max_psi
+        self.pressure_min_psi = state.pressure_min_psi
+        self.pump_power = state.pump_power
+        self.megatron_enabled = state.megatron_enabled
+        self.test_case_enabled = False
+
+        # Continue the same log file when it survived, otherwise start a new one
+        resume_log = bool(state.log_file_name) and os.path.exists(state.log_file_name)
+        self.build_profile(new_journal=False, new_log=not resume_log)
+        if resume_log:
+            self.curr_filename = state.log_file_name
+            self.log_input_name = os.path.basename(state.log_file_name).split("_", 2)[-1]
+            self.cycle_log_count = state.cycle_log_count
+            self.log_file_position = os.path.getsize(state.log_file_name)
+            if self.log_file_position < state.log_position:
+                print(f"Warning: log file '{state.log_file_name}' is shorter than checkpointed, rows were lost")
+
+        self.apply_resume_state(state.pressure_cycle_count, state.fluid_cycle_count, state.fluid_remaining_time,
+                                state.chamber_cycle_count, state.chamber_remaining_time)
+        self._journal.open()
+        self.write_checkpoint(sync=True)
+
+    def _checkpoint_profile(self, state):
+        """ The profile file a checkpoint was written with, raises EngineError if it is gone or changed:
+        the recorded counts would index a different schedule """
+        if not state.profile_path:
+            raise EngineError(f"The checkpoint does not record its profile file (path longer than {NAME_BYTES} bytes)")
+        if not os.path.exists(state.profile_path):
+            raise EngineError(f"Profile file '{state.profile_path}' of the checkpointed test no longer exists")
+        try:
+            profile = load_test_profile(state.profile_path)
+        except TestProfileError as e:
+            raise EngineError(f"Could not reload profile '{state.profile_path}': {e}")
+        if profile.content_hash() != state.profile_hash:
+            raise EngineError(f"Profile file '{state.profile_path}' was edited since the checkpoint, restore its content to resume")
+        return profile
+
+    def interval_length(self, profile, count):
+        """ Seconds of the fluid/chamber interval in progress after count setpoints (the first one before the start) """
+        return profile.interval_duration(max(count - 1, 0))
+
+    def next_fluid_interval(self):
+        """ Seconds until the next fluid setpoint, None once every fluid interval of the test has started """
+        if self.fluid_cycle_count >= self.fluid_num_cycles:
+            return None
+        return self.interval_length(self.fluid_profile, self.fluid_cycle_count)
+
+    def next_chamber_interval(self):
+        """ Seconds until the next chamber interval, None once every chamber interval of the test has started """
+        if self.chamber_cycle_count >= self.chamber_num_cycles:
+            return None
+        return self.interval_length(self.chamber_profile, self.chamber_cycle_count)
+
+    def _remaining_time(self, timer, profile, count, last_time):
+        """ Seconds left in the current fluid/chamber interval """
+        length = self.interval_length(profile, count)
+        if self._test_active and last_time is not None:
+            return max(length - (self.clock.time() - last_time), 0.0)
+        return getattr(timer, "remaining_time", length)
+
+    def write_checkpoint(self, flags=FLAG_RUNNING, sync=False):
+        """ Append the current test state to the checkpoint journal """
+        if not self.profile_generated:
+            return
+        state = CheckpointState(
+            flags=flags,
+            pressure_cycle_count=self.pressure_cycle_count,
+            fluid_cycle_count=self.fluid_cycle_count,
+            fluid_remaining_time=self._remaining_time(self._fluid_timer, self.fluid_profile, self.fluid_cycle_count, self.last_fluid_time),
+            chamber_cycle_count=self.chamber_cycle_count,
+            chamber_remaining_time=self._remaining_time(self._chamber_timer, self.chamber_profile, self.chamber_cycle_count, self.last_chamber_time),
+            fluid_setpoint=self.fluid_profile.interval_value(max(self.fluid_cycle_count - 1, 0)),
+            chamber_setpoint=self.chamber_profile.interval_value(max(self.chamber_cycle_count - 1, 0)),
+            pump_power=self.pump_power,
+            total_period=self.total_period,
+            fluid_period=self.fluid_period,
+            chamber_period=self.chamber_period,
+            fluid_min_temp=self.fluid_min_temp,
+            fluid_max_temp=self.fluid_max_temp,
+            chamber_min_temp=self.chamber_min_temp,
+            chamber_max_temp=self.chamber_max_temp,
+            pressure_num_cycles=self.pressure_num_cycles,
+            pressure_max_psi=self.pressure_max_psi,
+            pressure_min_psi=self.pressure_min_psi,
+            megatron_enabled=self.megatron_enabled,
+            log_position=self.log_file_position,
+            cycle_log_count=self.cycle_log_count,
+            log_file_name=getattr(self, "curr_filename", "") if self.logging_enabled else "",
+            profile_path=os.path.abspath(self.test_profile.path) if self.test_profile is not None and self.test_profile.path else "",
+            profile_hash=self.test_profile.content_hash() if self.test_profile is not None and self.test_profile.path else "")
+        self._journal.append(state, sync=sync)
+
+    # ----- Sensors -----
+
+    def poll_sensors(self):
+        """ Read every sensor once; while a test runs also advance the time index and run the safety rules """
+        values = self.read_sensors()
+        self.accept_sensor_values(values)
+        return values
+
+    def read_sensors(self):
+        """ One blocking FlexLogger read of every sensor, {name: float} of the valid ones """
+        if self.stream is not None:
+            latest = self.stream.poll()
+            if latest:
+                return {sen: latest[sen] for sen in self.sensors if sen in latest}
+            if self.stream.arrived is not None:  # the log stream went stale, read over the automation API instead
+                self.read_errors += 1
+        values = {}
+        for sen in self.sensors:
+            try:
+                new_value = self.read_sensor(sen)  # Read latest sensor value
+            except Exception as e:  # gRPC/FlexLogger error, the rest of this poll would fail the same way
+                self.read_errors += 1
+                print(f"Warning: reading {sen} failed: {e}")
+                break
+            try:
+                values[sen] = float(new_value)  # Ensure it's a valid float
+            except (TypeError, ValueError):
+                print(f"Warning: Non-numeric value received for {sen}: {new_value}")
+        return values
+
+    def read_sensor(self, name):
+        """ One FlexLogger read; with an aligner also hands it the value with FlexLogger's timestamp """
+        if self.aligner is None:
+            return self._flex.read_sensor_val(name)
+        sent = self.clock.monotonic()
+        value, stamp = self._flex.read_sensor_sample(name)
+        if value is not None:
+            self.aligner.push("flexlogger", name, value, (sent + self.clock.monotonic()) / 2, stamp)
+        return value
+
+    def accept_sensor_values(self, values):
+        """ Pass one acquisition on; while a test runs it gets the next time index and the safety rules """
+        time_index = None
+        if self._test_active:
+            time_index = self.sample_counter * (self.timer_ms / 3600000)  # X-axis value in hours
+            self.sample_counter += 1
+        spans = self.stream.take_spans() if self.stream is not None else None
+        self.feed_sensor_values(values, time_index, self.clock.monotonic(), spans)
+
+    def feed_sensor_values(self, values, time_index, now, spans=None):
+        """ Hand one acquisition to the safety rules and listeners, from poll_sensors or a log replay.
+        time_index (hours) is None outside a test, then the rules are skipped. spans {name: (min, max)}
+        of the samples since the last acquisition come with a full-rate stream """
+        if time_index is not None:
+            for sen, value in values.items():
+                # Safety rules (inlet pressure drop etc.), evaluated on every sample
+                for alarm in self._anomaly.process(sen, value, now):
+                    self.handle_alarm(alarm)
+
+        self.latest_values.update(values)
+        self._notify("sensors", values=values, time_index=time_index, spans=spans)
+
+    def tick(self):
+        """ One acquisition period: poll the sensors and, while the test runs, log a row """
+        if self.flexlogger_connected:
+            self.poll_sensors()
+        if self._test_active and self.logging_enabled:
+            self.update_log_file()
+
+    def handle_alarm(self, alarm):
+        """ Act on a fired safety rule: warn, pause, or pause and write a crash file """
+        print(f"Alarm ({alarm.action}) {alarm}")
+        if alarm.action != WARN and self._test_active:
+            # Stopping the loop makes run_test_profile stop the pumps and pause the timers
+            self._test_active = False
+            if alarm.action == CRASH:
+                print("Test crashed")
+                self.create_crash_file()
+            self.write_checkpoint(sync=True)
+            self._notify("state", active=False)
+        self._notify("alarm", alarm=alarm)
+
+    # ----- Files -----
+
+    def get_timestamp(self):
+        """ Return the current timestamp as a filename-safe formatted string """
+        return datetime.fromtimestamp(self.clock.time()).strftime("%Y-%m-%d_%H-%M-%S")  # Replace colons with dashes
+
+    def create_crash_file(self):
+        """ Create a file with status of test on crash as a backup """
+        # Get crash timestamp and float(time)
+        crash_timestamp = self.get_timestamp()
+        crash_time = self.clock.time()
+
+        # Create crash file
+        self.crash_filename = os.path.join(self.log_dir, crash_timestamp + "_Crash")
+        with open(self.crash_filename, mode='w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(["pressure_cycle_count", "fluid_cycle_count", "fluid_cycle_remaining_seconds", "chamber_cycle_count", "chamber_cycle_remaining_seconds"])
+
+        # Fill crash file with remaining status
+        fluid_length = self.interval_length(self.fluid_profile, self.fluid_cycle_count)
+        chamber_length = self.interval_length(self.chamber_profile, self.chamber_cycle_count)
+        data = [self.pressure_cycle_count] + [self.fluid_cycle_count] + [fluid_length - (crash_time - self.last_fluid_time)] + [self.chamber_cycle_count] + [chamber_length - (crash_time - self.last_chamber_time)]
+        with open(self.crash_filename, mode='a', newline='') as file:  # Use 'a' (append mode)
+            writer = csv.writer(file)
+            writer.writerow(data)  # Write row with timestamp + sensor values
+
+        print(f"Crash file '{self.crash_filename}' created successfully.")
+
+    def create_log_file(self, name=""):
+        """ Creates a CSV file with a timestamped header including sensor names """
+        self.log_input_name = name
+        self.curr_filename = os.path.join(self.log_dir, self.get_timestamp() + "_" + self.log_input_name)
+        with open(self.curr_filename, mode='w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(["timestamp"] + ["pressure_cycle_count"] + self.sensors)  # Write header row once
+            self.log_file_position = file.tell()
+        print(f"Log file '{self.curr_filename}' created successfully.")
+
+    def update_log_file(self):
+        """ Updates CSV file with values """
+        curr_data = [self.get_timestamp()] + [self.pressure_cycle_count] # Start with timestamp as first element
+
+        # Append the latest value of each sensor
+        for sen in self.sensors:
+            if sen in self.latest_values:
+                curr_data.append(self.latest_values[sen])
+
+        with open(self.curr_filename, mode='a', newline='') as file:  # Use 'a' (append mode)
+            writer = csv.writer(file)
+            writer.writerow(curr_data)  # Write row with timestamp + sensor values
+            self.log_file_position = file.tell()
+
+    # ----- Test control -----
+
+    def start(self):
+        """ Start or resume the test loop in a separate thread, raises EngineError if not ready """
+        self.prepare_start()
+        self.waveform_thread = self.clock.thread(self.sample_pressure_waveform, name="waveform")
+        self.waveform_thread.start()
+
+        # Run pressure profile
+        self.test_thread = self.clock.thread(self.run_test_profile, name="pressure-loop")
+        self.test_thread.start()
+        self._notify("state", active=True)
+
+    def prepare_start(self):
+        """ Check the devices and profile and mark the test active, raises EngineError if not ready """
+        if not self.flexlogger_connected:
+            raise EngineError("FlexLogger not connected!")
+        if not self.canbus_connected:
+            raise EngineError("CANBUS not connected!")
+        if not self.julabo_connected and not self.megatron_enabled:
+            raise EngineError("JULABO not connected!")
+        if not self.profile_generated:
+            raise EngineError("Profile not generated!")
+
+        print("Starting Test")
+        # Activate test bool
+        self._test_active = True
+
+        # Time
+        if self.initial_start:
+            self.last_fluid_time = self.clock.time() - (self.interval_length(self.fluid_profile, self.fluid_cycle_count) - self.fluid_remaining_time)
+            self.last_chamber_time = self.clock.time() - (self.interval_length(self.chamber_profile, self.chamber_cycle_count) - self.chamber_remaining_time)
+            self.initial_start = False
+
+        # Per-cycle pressure waveform features, sampled next to the pressure loop
+        if self._cycle_features is None:
+            table_path = self.curr_filename + "_cycles.bin" if self.logging_enabled else None
+            self._cycle_features = CycleFeatureExtractor(CycleFeatureTable(table_path), target_psi=self.pressure_max_psi)
+            if self.stream is not None:  # samples come from the log file, after the pump edges
+                self._cycle_features = LateSampleFeed(self._cycle_features)
+
+    def pause(self):
+        """ Stop the pressure loop and pause the temperature timers (counts are kept) """
+        # Disable test bool
+        self._test_active = False
+        self._fluid_timer.pause()
+        self._chamber_timer.pause()
+        print("Pausing Test...")
+        # Stops the pressure profile (does not reset pressure_cycle_count)
+        if hasattr(self, "test_thread") and self.test_thread.is_alive():
+            self.clock.join(self.test_thread)  # Ensure the test thread stops cleanly
+        print("Test Paused")
+        self._notify("state", active=False)
+
+    def sample_pressure_waveform(self):
+        """ Sample the waveform pressure sensor at high rate into the cycle feature extractor """
+        if self.waveform_sample_ms <= 0:
+            return  # disabled, cycle records then only carry the pump edge times
+        sensor = self.waveform_sensor()
+        if sensor is None:
+            return
+
+        period = self.waveform_sample_ms / 1000
+        next_time = self.clock.monotonic()
+        while self._test_active:
+            if self.stream is not None:
+                self.feed_stream_waveform(sensor)
+            else:
+                value = self.read_sensor(sensor)
+                if value is not None:
+                    self._cycle_features.add_sample(self.clock.monotonic(), value)
+            next_time += period
+            self.clock.sleep(max(next_time - self.clock.monotonic(), 0))
+        self._cycle_features.flush()
+
+    def feed_stream_waveform(self, sensor):
+        """ Every sample of sensor the stream got since the last call into the cycle features """
+        for times, values in self.stream.take_blocks(sensor):
+            self._cycle_features.add_block(times, values)
+
+    def waveform_sensor(self):
+        """ FlexLogger channel sampled for the cycle features, None (with a warning) if there is none """
+        key = normalize_channel(self.waveform_channel)
+        sensor = next((sen for sen in self.sensors if key in normalize_channel(sen)), None)
+        if sensor is None:
+            print(f"Warning: no '{self.waveform_channel}' sensor, cycle features disabled")
+        return sensor
+
+    def _pump_on_edge(self):
+        self._cycle_features.pump_on(self.clock.monotonic(), self.pressure_cycle_count + 1)
+
+    def _pump_off_edge(self):
+        self._cycle_features.pump_off(self.clock.monotonic())
+
+    def run_test_profile(self):
+        """ Runs the test loop, cycling pumps on and off while test is active """
+        self._cantroller.start()
+        if self.julabo_connected:
+            self._julabo.set_power_on()
+        self._fluid_timer.start()
+        self._chamber_timer.start()
+
+        # Initial sequence to let test warm up
+        if self._test_active and self.pressure_cycle_count < self.pressure_num_cycles:
+            self._cantroller.set_pump_power(self.pump_power)
+            self.clock.sleep(self.pump_warmup_time)
+
+        while self._test_active and self.pressure_cycle_count < self.pressure_num_cycles:
+            pump_cycle(self._cantroller, self.pump_power, self.pressure_on_time, self.pressure_off_time,
+                       self._pump_on_edge, self._pump_off_edge, self.clock.sleep)
+
+            self.count_pressure_cycle()
+
+        # PAUSING BEHAVIOUR
+        if self.pressure_cycle_count < self.pressure_num_cycles:
+            self._cantroller.stop()
+            self._fluid_timer.pause()
+            self._chamber_timer.pause()
+            self.write_checkpoint(sync=True)
+            if self.julabo_connected:
+                self._julabo.set_power_off()
+        # PUMP PROFILE FINISHED
+        else:
+            self.clock.sleep(5) # Allow time for clean log finish
+            self._test_active = False
+            self.stop()
+            self.mark_finished()
+
+    def count_pressure_cycle(self):
+        """ Book a completed pressure cycle: count, rotate the log file, checkpoint, notify """
+        self.pressure_cycle_count += 1
+        self.cycle_log_count += 1
+        print(f"Cycle Log #: {self.cycle_log_count}")
+
+        if self.cycle_log_count > LOG_ROTATE_CYCLES:
+            self.create_log_file(self.log_input_name)
+            self.cycle_log_count = 0
+
+        self.write_checkpoint()
+        self._notify_counts()
+
+    def mark_finished(self):
+        """ Record the end of the profile once the devices are stopped """
+        self.write_checkpoint(flags=FLAG_COMPLETE, sync=True)
+        print("Pressure Profile Finished! Congratulations, you finally made it!")
+        self._notify("finished")
+
+    def set_julabo_temp(self):
+        """ Change the Julabo setpoint to the current fluid interval (called at end of timer) """
+        self.last_fluid_time = self.clock.time()
+        if self.julabo_connected:
+            setpoint = self.fluid_setpoint()
+            self.send_julabo_setpoint(setpoint)
+            print(f"Set julabo temp to {setpoint}")
+        self.count_fluid_interval()
+
+    def send_julabo_setpoint(self, setpoint):
+        """ Send a Julabo setpoint (through julabo_setter if set); with an aligner also hands it the setpoint """
+        sent = self.clock.monotonic()
+        if self.julabo_setter is not None:
+            self.julabo_setter(setpoint)
+        else:
+            self._julabo.set_work_temperature(setpoint)
+        self.align_julabo("setpoint", "JULABO SETPOINT (C)", setpoint, sent)
+
+    def read_bath_temperature(self):
+        """ One Julabo bath temperature read; with an aligner also hands it the value """
+        sent = self.clock.monotonic()
+        value = float(self._julabo.get_temperature())
+        self.align_julabo("julabo", "JULABO BATH (C)", value, sent)
+        return value
+
+    def align_julabo(self, source, channel, value, sent):
+        """ Julabo replies carry no timestamp, the aligner places them at the middle of the request sent at monotonic time sent """
+        aligner = self.aligner
+        if aligner is not None and source in aligner.sources:
+            aligner.push(source, channel, value, (sent + self.clock.monotonic()) / 2)
+
+    def fluid_setpoint(self):
+        """ Julabo setpoint that starts the current fluid interval: the profile value, or the scheduler's boost toward it """
+        setpoint = self.fluid_profile.interval_value(self.fluid_cycle_count)
+        if self.setpoint_scheduler is not None:
+            return self.setpoint_scheduler.start_interval(self.fluid_cycle_count, setpoint)
+        return setpoint
+
+    def count_fluid_interval(self):
+        """ Book a fluid interval whose setpoint was sent """
+        self.fluid_cycle_count+=1
+        self.write_checkpoint()
+        self._notify_counts()
+
+    def set_chamber_temp(self):
+        """ Filler for logging chamber cycle status """
+        self.last_chamber_time = self.clock.time()
+        self.chamber_cycle_count+=1
+        self.write_checkpoint()
+        self._notify_counts()
+
+    def stop(self):
+        """ Stop moving components of test """
+        if self.julabo_connected:
+            self._fluid_timer.stop()
+            self._julabo.set_power_off()
+        if self.canbus_connected:
+            self._cantroller.stop()
+        self._chamber_timer.stop()
+
+    def shutdown(self):
+        """ Save state and release every device (window close, Ctrl+C) """
+        if self._test_active:
+            self.create_crash_file()
+            self.write_checkpoint(sync=True)
+            self.stop()
+        self._journal.close()
+        if self._cycle_features is not None:
+            self._cycle_features.flush()
+            self._cycle_features.table.close()
+        if self.julabo_connected:
+            self._julabo.close()
+        if self.canbus_connected:
+            self._cantroller.shutdown()
@@ -1,10 +1,35 @@
 import sys
 import re
-from flexlogger.automation import Application, FlexLoggerError
+from datetime import datetime, timezone, timedelta
+try:
+    from flexlogger.automation import Application, FlexLoggerError
+except ImportError:  # off the rig: FlexLoggerInterface(app=sim_flexlogger_lib.SimApplication()) still works
+    Application = None
+    from sim_flexlogger_lib import FlexLoggerError
+
+# str() of a channel value: ...", <value>, datetime.datetime(<year>, <month>, ..., tzinfo=...))
+VALUE_PATTERN = re.compile(r'",\s*([\d.e-]+),\s*datetime\.datetime\(([^)]*)\)')
+
+
+def parse_value_time(fields):
+    """ Unix time of the datetime.datetime(...) arguments of a channel value; naive times are local """
+    parts = [p.strip() for p in fields.split(",")]
+    numbers = [int(p) for p in parts if p.isdigit()]
+    stamp = datetime(*numbers[:7])
+    if "timezone.utc" in fields:
+        stamp = stamp.replace(tzinfo=timezone.utc)
+    else:
+        offset = re.search(r"timedelta\((?:days=(-?\d+))?,?\s*(?:seconds=(\d+))?", fields)
+        if offset and (offset.group(1) or offset.group(2)):
+            stamp = stamp.replace(tzinfo=timezone(timedelta(days=int(offset.group(1) or 0), seconds=int(offset.group(2) or 0))))
+    return stamp.timestamp()
 
 class FlexLoggerInterface:
-    def __init__(self):
-        self.app = Application()
+    def __init__(self, app=None):
+        """ app: automation Application to use, None starts the real one """
+        if app is None and Application is None:
+            raise FlexLoggerError("niflexlogger-automation not installed, pass app=sim_flexlogger_lib.SimApplication() to run without FlexLogger")
+        self.app = app if app is not None else Application()
         self.project = None
         self.chan_spec = None
 
@@ -42,17 +67,21 @@ class FlexLoggerInterface:
 
     def read_sensor_val(self, name):
         """Read the value of a specified sensor."""
+        return self.read_sensor_sample(name)[0]
+
+    def read_sensor_sample(self, name):
+        """Read (value, unix time FlexLogger stamped it with) of a specified sensor, (None, None) on failure."""
         if not self.chan_spec:
             print("Error: Channel specification not initialized. Call connect_to_instance() first.")
-            return None
+            return None, None
 
         chan_val = self.chan_spec.get_channel_value(name)
-        match = re.search(r'",\s*([\d.e-]+),\s*datetime\.datetime', str(chan_val))
+        match = VALUE_PATTERN.search(str(chan_val))
         if match:
-            return float(match.group(1))
+            return float(match.group(1)), parse_value_time(match.group(2))
         else:
             print(f"Error: Could not parse value for sensor '{name}'.")
-            return None
+            return None, None
 
     def disable_sensor(self, name):
         """Disable a sensor by name."""
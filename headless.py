@@ -0,0 +1,262 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+from engine_lib import TestEngine, EngineError
+from profile_file_lib import DEFAULT_PROFILE, TestProfileError
+from metrics_lib import METRICS
+from watchdog_lib import Watchdog
+
+
+def print_event(event, data):
+    """ Console front end for engine events """
+    if event == "counts":
+        print(f"Pressure {data['pressure']}/{data['pressure_total']}  "
+              f"Fluid {data['fluid']}/{data['fluid_total']}  "
+              f"Chamber {data['chamber']}/{data['chamber_total']}")
+    elif event == "alarm":
+        print(f"ALARM ({data['alarm'].action}): {data['alarm']}")
+    elif event == "finished":
+        print("Test finished")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run a manifold durability test without the GUI")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, help="JSON/TOML test profile file")
+    parser.add_argument("--megatron", action="store_true", help="use the megatron (pump box second level) CAN channel, no Julabo")
+    parser.add_argument("--com-port", default="COM6", help="Julabo serial port")
+    parser.add_argument("--can-channel", type=int, default=None, help="Vector CAN channel (default 0 main, 1 megatron)")
+    parser.add_argument("--channels", nargs="*", default=[], help="only use FlexLogger channels matching these names")
+    parser.add_argument("--log-name", default="", help="suffix for the CSV log file name")
+    parser.add_argument("--log-dir", default="", help="directory for log, crash and cycle files")
+    parser.add_argument("--journal", default="checkpoint.journal", help="checkpoint journal path")
+    parser.add_argument("--no-log", action="store_true", help="disable CSV logging")
+    parser.add_argument("--sample-ring", default="", help="also publish every sensor poll to a shared-memory ring of this name")
+    parser.add_argument("--ring-log", default="", help="with --sample-ring: a separate process writes the ring to this CSV")
+    parser.add_argument("--telemetry-port", type=int, default=0, help="stream live data to local clients on this TCP port (telemetry_lib.py client)")
+    parser.add_argument("--metrics-port", type=int, default=0, help="enable latency metrics and serve them in Prometheus format on this port")
+    parser.add_argument("--metrics-file", default="", help="enable latency metrics and append a JSON snapshot to this file every minute")
+    parser.add_argument("--tdms", nargs="?", const="", default=None, help="take sensor values at full rate from the TDMS log FlexLogger writes "
+                        "in this file or folder (no path: the project's log folder) instead of reading every channel over the automation API")
+    parser.add_argument("--aligned-log", action="store_true", help="also write FlexLogger, CAN pump commands and Julabo readings merged onto one timebase (<timestamp>_aligned.csv)")
+    parser.add_argument("--soak-file", default="", help="record process resources (RSS, threads, handles) to this CSV and flag steady growth")
+    parser.add_argument("--soak-interval", type=float, default=60.0, help="seconds between soak samples")
+    parser.add_argument("--soak-trace-frames", type=int, default=0, help="also trace allocations with tracemalloc, keeping this many frames per site (slows the process, 0 disables)")
+    parser.add_argument("--watchdog-interval", type=float, default=10.0, help="seconds between device heartbeats, outages pause and resume the test (0 disables)")
+    parser.add_argument("--setpoint-scheduler", choices=("control", "monitor"), default=None,
+                        help="plan the Julabo setpoints from a bath model fitted during the test (monitor: only report the time at temperature)")
+    parser.add_argument("--fluid-soak", type=float, default=None, metavar="HOURS", help="time at temperature each fluid interval needs, lets the scheduler start transitions early")
+    parser.add_argument("--temp-band", type=float, default=0.5, help="degrees C from the target that count as at temperature")
+    parser.add_argument("--boost-limits", type=float, nargs=2, default=None, metavar=("LOW", "HIGH"),
+                        help="Julabo setpoints the scheduler may boost to (default: the fluid profile's own range)")
+    parser.add_argument("--asyncio", action="store_true", help="run the pressure loop, timers and polling as coroutines on one event loop")
+    parser.add_argument("--resume", action="store_true", help="restore the unfinished test from the checkpoint journal")
+    return parser.parse_args(argv)
+
+
+def build_engine(args):
+    """ Connect every device and prepare the profile (fresh or restored), raises EngineError """
+    if args.metrics_port or args.metrics_file:
+        METRICS.enable()
+    engine = TestEngine(journal_path=args.journal, log_dir=args.log_dir)
+    engine.add_listener(print_event)
+    engine.COM_port = args.com_port
+    engine.can_channel = args.can_channel
+    engine.sensor_filter = args.channels
+    engine.log_file_name = args.log_name
+    engine.logging_enabled = not args.no_log
+
+    if not engine.connect_flexlogger():
+        raise EngineError("Could not connect to FlexLogger!")
+    if not engine.connect_canbus(megatron=args.megatron):
+        raise EngineError("Could not connect to CANBUS!")
+    if not args.megatron and not engine.connect_julabo():
+        raise EngineError("Could not connect to julabo!")
+
+    state = engine.pending_checkpoint() if args.resume else None
+    if args.resume and state is None:
+        print("No unfinished test in the checkpoint journal, starting a new one")
+    if state is not None:
+        engine.restore_checkpoint(state)
+    else:
+        try:
+            engine.load_profile(args.profile)
+        except TestProfileError as e:
+            raise EngineError(str(e))
+        engine.build_profile()
+    return engine
+
+
+def run(engine, watchdog_interval=0, on_tick=None):
+    """ Drive the engine's acquisition tick at timer_ms until the test ends or Ctrl+C; on_tick() is called
+    after every tick and pauses the test when it returns True (a supervisor's pause command) """
+    watchdog = None
+    if watchdog_interval:
+        watchdog = Watchdog(engine, interval=watchdog_interval)
+        watchdog.start()
+    try:
+        engine.start()
+        period = engine.timer_ms / 1000
+        next_tick = time.monotonic()
+        while engine.active or (watchdog is not None and watchdog.holding):
+            engine.tick()
+            if on_tick is not None and on_tick():
+                print("Pause requested, pausing test")
+                if watchdog is not None:
+                    watchdog.cancel_resume()
+                engine.pause()
+                break
+            next_tick += period
+            time.sleep(max(next_tick - time.monotonic(), 0))
+        if engine.test_thread.is_alive():
+            engine.test_thread.join()
+    except KeyboardInterrupt:
+        print("Interrupted, pausing test")
+        if watchdog is not None:
+            watchdog.cancel_resume()
+        engine.pause()
+    finally:
+        if watchdog is not None:
+            watchdog.stop()
+            print(watchdog.summary())
+        engine.shutdown()
+
+
+async def run_async(engine, watchdog_interval=0, on_tick=None):
+    """ Like run(), with the test as coroutines of an AsyncTestRunner """
+    from async_runner_lib import AsyncTestRunner
+    runner = AsyncTestRunner(engine, asyncio.get_running_loop())
+    watchdog = None
+    if watchdog_interval:
+        watchdog = Watchdog(engine, interval=watchdog_interval, pause=lambda: runner.call_threadsafe(runner.pause),
+                            resume=lambda: runner.call_threadsafe(runner.start))
+        watchdog.start()
+
+    async def check_commands():
+        while not on_tick():
+            await asyncio.sleep(engine.timer_ms / 1000)
+        print("Pause requested, pausing test")
+        if watchdog is not None:
+            watchdog.cancel_resume()
+        runner.pause()
+
+    commands = asyncio.get_running_loop().create_task(check_commands()) if on_tick is not None else None
+    try:
+        runner.start_polling()
+        runner.start()
+        await runner.wait()
+        while watchdog is not None and watchdog.holding:  # device outage, wait for the watchdog to resume
+            await asyncio.sleep(1)
+            await runner.wait()
+    except asyncio.CancelledError:  # Ctrl+C
+        print("Interrupted, pausing test")
+        if watchdog is not None:
+            watchdog.cancel_resume()
+        runner.pause()
+        await runner.wait()
+    finally:
+        if commands is not None:
+            commands.cancel()
+        if watchdog is not None:
+            watchdog.stop()
+            print(watchdog.summary())
+        await runner.close()
+        engine.shutdown()
+
+
+def start_outputs(engine, args):
+    """ Optional live data streams, outputs and helpers (TDMS stream, shared-memory ring, telemetry, metrics,
+    setpoint scheduler, soak), returns their close functions """
+    closers = []
+    if args.tdms is not None:
+        from tdms_lib import TdmsSource, log_directory
+        path = args.tdms or log_directory(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Cyclic Pressure Testing"))
+        sensor = engine.waveform_sensor()
+        engine.stream = TdmsSource(path, waveform_channels=[sensor] if sensor else [])
+        engine.stream.start()
+        closers.append(engine.stream.stop)
+    if args.sample_ring:
+        # Logger/analytics/GUI processes attach with SampleRing.attach(name) and read it zero-copy
+        from sample_ring_lib import SampleRing, ring_listener
+        ring = SampleRing.create(args.sample_ring, engine.sensors)
+        engine.add_listener(ring_listener(ring))
+        print(f"Publishing samples to shared memory ring '{ring.name}'")
+        if args.ring_log:
+            from sample_ring_lib import RingRecorder
+            recorder = RingRecorder(ring.name, args.ring_log)
+            recorder.start()
+            closers.append(recorder.stop)  # drains the ring before it is removed
+        closers.append(ring.close)
+    if args.telemetry_port:
+        from telemetry_lib import TelemetryServer
+        telemetry = TelemetryServer(port=args.telemetry_port)
+        try:
+            telemetry.start()
+            engine.add_listener(telemetry.listener)
+            closers.append(telemetry.close)
+        except OSError as e:
+            print(f"Warning: telemetry disabled, could not listen on port {args.telemetry_port}: {e}")
+    if args.metrics_file:
+        from metrics_lib import MetricsFileWriter
+        writer = MetricsFileWriter(METRICS, args.metrics_file)
+        writer.start()
+        closers.append(writer.stop)
+    if args.metrics_port:
+        from metrics_lib import MetricsServer
+        try:
+            server = MetricsServer(METRICS, port=args.metrics_port)
+            server.start()
+            closers.append(server.stop)
+        except OSError as e:
+            print(f"Warning: metrics endpoint disabled, could not listen on port {args.metrics_port}: {e}")
+    if args.setpoint_scheduler and engine.julabo_connected:
+        from thermal_lib import SetpointScheduler
+        scheduler = SetpointScheduler(engine, band=args.temp_band, soak=args.fluid_soak * 3600 if args.fluid_soak else None,
+                                      limits=args.boost_limits, control=args.setpoint_scheduler == "control")
+        engine.setpoint_scheduler = scheduler
+        scheduler.start()
+
+        def close_scheduler():
+            scheduler.stop()
+            print(scheduler.summary())
+        closers.append(close_scheduler)
+    if args.aligned_log:
+        from align_lib import AlignmentRecorder
+        recorder = AlignmentRecorder(engine)
+        recorder.start()
+        closers.append(recorder.stop)
+    if args.soak_file:
+        from soak_lib import SoakMonitor
+        soak = SoakMonitor(args.soak_file, interval=args.soak_interval, trace_frames=args.soak_trace_frames)
+        soak.start()
+
+        def close_soak():
+            soak.stop()
+            print(soak.summary())
+        closers.append(close_soak)
+    return closers
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        rig = build_engine(args)
+    except EngineError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    closers = start_outputs(rig, args)
+    try:
+        if args.asyncio:
+            try:
+                asyncio.run(run_async(rig, args.watchdog_interval))
+            except KeyboardInterrupt:
+                pass  # already paused and saved by run_async
+        else:
+            run(rig, args.watchdog_interval)
+    except EngineError as e:
+        print(f"Error: {e}")
+    finally:
+        for close in closers:
+            close()
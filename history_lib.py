@@ -0,0 +1,393 @@
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from anomaly_lib import normalize_channel
+from cycle_features_lib import load_cycle_table
+from replay_lib import LogReplayError, LOG_TIME_FORMAT, read_log_chunks, read_log_header
+
+DEFAULT_DB = "rig_history.sqlite"
+# Channel whose per-cycle extremes are kept when a run has no waveform (_cycles.bin) file
+CYCLE_CHANNEL = "pressure1"
+# Files the engine writes next to a log: <timestamp>_<log name>, its _cycles.bin, <timestamp>_Crash,
+# and the align_lib recording <timestamp>_aligned.csv (not a log, never ingested)
+TIMESTAMPED = re.compile(r"\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}_")
+ALIGNED_SUFFIX = "_aligned.csv"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tests (
+    test_id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,          -- first log file name, e.g. 2025-03-01_08-00-00_M1234
+    label TEXT NOT NULL,                -- log name entered for the test (manifold id)
+    started REAL, ended REAL,           -- unix time of the first and last log row
+    first_cycle INTEGER, last_cycle INTEGER,
+    rows INTEGER,
+    channels TEXT,                      -- JSON list
+    crashes INTEGER DEFAULT 0, crash_cycle INTEGER,
+    files TEXT,                         -- JSON {path: size}, a changed set re-ingests the test
+    ingested REAL
+);
+CREATE INDEX IF NOT EXISTS tests_started ON tests(started);
+CREATE INDEX IF NOT EXISTS tests_label ON tests(label);
+
+CREATE TABLE IF NOT EXISTS channels (
+    channel_id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL
+);
+
+-- One row per pressure cycle: waveform features from _cycles.bin, extremes of the log rows otherwise
+CREATE TABLE IF NOT EXISTS cycles (
+    test_id INTEGER NOT NULL,
+    cycle INTEGER NOT NULL,
+    t REAL,                             -- unix time the cycle started
+    peak REAL, minimum REAL, mean REAL,
+    on_time REAL, time_to_peak REAL, overshoot REAL, decay_time REAL, area REAL,
+    samples INTEGER, log_rows INTEGER,
+    PRIMARY KEY (test_id, cycle)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cycles_cycle ON cycles(cycle, test_id);
+
+-- Every channel downsampled to one row per minute
+CREATE TABLE IF NOT EXISTS minutes (
+    test_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    t INTEGER NOT NULL,                 -- unix time of the start of the minute
+    cycle INTEGER,                      -- last pressure cycle count in the minute
+    mean REAL, min REAL, max REAL, n INTEGER,
+    PRIMARY KEY (test_id, channel_id, t)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS minutes_time ON minutes(t);
+"""
+
+
+def _log_label(path):
+    """ Name entered for the test: what follows the timestamp in the log file name """
+    parts = os.path.basename(path).split("_", 2)
+    return parts[2] if len(parts) > 2 else ""
+
+
+def _group_boundaries(keys):
+    """ Start indexes of the runs of equal values in a sorted key array """
+    return np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+
+
+def scan_log(path, chunk_rows=20000):
+    """ Aggregate one log file: per-minute stats of every channel and per-cycle extremes of CYCLE_CHANNEL.
+    Runs in a worker process, only the aggregates come back """
+    sensors = read_log_header(path)
+    keys = [normalize_channel(s) for s in sensors]
+    key = normalize_channel(CYCLE_CHANNEL)
+    cycle_col = next((i for i, k in enumerate(keys) if key in k), next((i for i, k in enumerate(keys) if "psi" in k), None))
+
+    minutes = {}  # minute -> [sum[], min[], max[], n, last cycle]
+    cycles = {}   # cycle -> [t, max, min, sum, n]
+    rows = 0
+    first = last = None
+    for chunk in read_log_chunks(path, chunk_rows):
+        t = np.array([row[0] for row in chunk])
+        cycle = np.array([row[1] for row in chunk], dtype=np.int64)
+        values = np.array([row[2] for row in chunk], dtype=np.float64).reshape(len(chunk), len(sensors))
+        rows += len(chunk)
+        first = first or (t[0], int(cycle[0]))
+        last = (t[-1], int(cycle[-1]))
+
+        minute = (t // 60).astype(np.int64) * 60
+        starts = _group_boundaries(minute)
+        sums = np.add.reduceat(values, starts)
+        mins = np.minimum.reduceat(values, starts)
+        maxs = np.maximum.reduceat(values, starts)
+        counts = np.diff(np.r_[starts, len(chunk)])
+        ends = np.r_[starts[1:], len(chunk)] - 1
+        for i, m in enumerate(minute[starts]):
+            entry = minutes.get(m)
+            if entry is None:  # a minute can straddle two chunks
+                minutes[m] = [sums[i], mins[i], maxs[i], counts[i], cycle[ends[i]]]
+            else:
+                entry[0] = entry[0] + sums[i]
+                entry[1] = np.minimum(entry[1], mins[i])
+                entry[2] = np.maximum(entry[2], maxs[i])
+                entry[3] += counts[i]
+                entry[4] = cycle[ends[i]]
+
+        if cycle_col is not None:
+            psi = values[:, cycle_col]
+            starts = _group_boundaries(cycle)
+            for c, t0, high, low, total, n in zip(cycle[starts], t[starts], np.maximum.reduceat(psi, starts),
+                                                  np.minimum.reduceat(psi, starts), np.add.reduceat(psi, starts),
+                                                  np.diff(np.r_[starts, len(chunk)])):
+                entry = cycles.get(c)
+                if entry is None:
+                    cycles[c] = [t0, high, low, total, n]
+                else:
+                    entry[1] = max(entry[1], high)
+                    entry[2] = min(entry[2], low)
+                    entry[3] += total
+                    entry[4] += n
+
+    return {"path": path, "sensors": sensors, "rows": rows, "first": first, "last": last,
+            "minutes": minutes, "cycles": cycles, "size": os.path.getsize(path)}
+
+
+def scan_cycle_table(path):
+    """ Waveform features of one _cycles.bin file """
+    return {"path": path, "records": load_cycle_table(path), "size": os.path.getsize(path)}
+
+
+def read_crash_file(path):
+    """ (unix time, pressure cycle count) of a _Crash file, None if unreadable """
+    try:
+        crash_time = datetime.strptime(os.path.basename(path)[:19], LOG_TIME_FORMAT).timestamp()
+        with open(path) as file:
+            file.readline()
+            return crash_time, int(file.readline().split(",")[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def find_test_files(paths):
+    """ Log, _cycles.bin and _Crash files under the given files/directories, by the names the engine gives them """
+    logs, tables, crashes = [], [], []
+    for path in paths:
+        path = os.path.abspath(path)
+        names = [os.path.join(path, name) for name in os.listdir(path)] if os.path.isdir(path) else [path]
+        for name in names:
+            base = os.path.basename(name)
+            if not TIMESTAMPED.match(base) or not os.path.isfile(name):
+                continue
+            if base.endswith("_cycles.bin"):
+                tables.append(name)
+            elif base.endswith("_Crash") and base.count("_") == 2:
+                crashes.append(name)
+            elif not base.endswith(ALIGNED_SUFFIX):
+                logs.append(name)
+    return sorted(logs), sorted(tables), sorted(crashes)
+
+
+def group_tests(scans):
+    """ Chain rotated log files into tests: same log name, cycle count carrying on from the previous file """
+    tests = []
+    for scan in sorted(scans, key=lambda s: os.path.basename(s["path"])):
+        if not scan["rows"]:
+            continue
+        previous = tests[-1][-1] if tests else None
+        if (previous is not None and _log_label(previous["path"]) == _log_label(scan["path"])
+                and previous["sensors"] == scan["sensors"] and scan["first"][1] >= previous["last"][1]):
+            tests[-1].append(scan)
+        else:
+            tests.append([scan])
+    return tests
+
+
+class HistoryStore:
+    """ SQLite store of finished tests: metadata, per-cycle aggregates and per-minute channel data.
+
+    Files are parsed in parallel worker processes; SQLite takes one writer, so the aggregates are
+    inserted from this process in one transaction per test.
+    """
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def _channel_ids(self, names):
+        self.db.executemany("INSERT OR IGNORE INTO channels(name) VALUES (?)", [(n,) for n in names])
+        ids = dict(self.db.execute("SELECT name, channel_id FROM channels"))
+        return [ids[n] for n in names]
+
+    def _files_to_scan(self, logs, tables):
+        """ Log and table files that are new or changed since they were ingested, plus the files of any
+        ingested test that a new file may continue """
+        stored = {}  # path -> (size, files of its test)
+        for (files,) in self.db.execute("SELECT files FROM tests"):
+            files = json.loads(files)
+            for path, size in files.items():
+                stored[path] = (size, files)
+        scan = set()
+        for i, path in enumerate(logs):
+            table = path + "_cycles.bin"
+            changed = [p for p in (path, table) if (p == path or p in tables) and stored.get(p, (None,))[0] != os.path.getsize(p)]
+            if not changed:
+                continue
+            # Rescan whole tests, a changed file can regroup them
+            scan.add(path)
+            for p in changed + ([logs[i - 1]] if i and _log_label(logs[i - 1]) == _log_label(path) else []):
+                if p in stored:
+                    scan.update(stored[p][1])
+        return [p for p in logs if p in scan], [p for p in tables if p[:-len("_cycles.bin")] in scan]
+
+    def ingest(self, paths, workers=None, min_age=300.0, replace=False):
+        """ Load every finished test found in paths; files already ingested with the same size are not
+        read again, files modified in the last min_age seconds mean the test is still running.
+        Returns the names of the tests written """
+        logs, tables, crashes = find_test_files(paths)
+        if not replace:
+            logs, tables = self._files_to_scan(logs, tables)
+        if not logs:
+            print("No new or changed log files")
+            return []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            log_jobs = [pool.submit(scan_log, path) for path in logs]
+            table_jobs = [pool.submit(scan_cycle_table, path) for path in tables]
+            scans = []
+            for path, job in zip(logs, log_jobs):
+                try:
+                    scans.append(job.result())
+                except (OSError, LogReplayError) as e:
+                    print(f"Warning: skipping '{path}': {e}")
+            waveforms = {path[:-len("_cycles.bin")]: job.result() for path, job in zip(tables, table_jobs)}
+        crash_points = [point for point in map(read_crash_file, crashes) if point is not None]
+
+        known = dict(self.db.execute("SELECT name, files FROM tests"))
+        written = []
+        now = time.time()
+        for group in group_tests(scans):
+            name = os.path.basename(group[0]["path"])
+            files = {s["path"]: s["size"] for s in group}
+            files.update({w["path"]: w["size"] for w in (waveforms.get(s["path"]) for s in group) if w})
+            if any(now - os.path.getmtime(path) < min_age for path in files):
+                print(f"Skipping '{name}', still being written")
+                continue
+            if name in known and not replace and json.loads(known[name]) == files:
+                continue
+            self._write_test(name, group, [waveforms[s["path"]] for s in group if s["path"] in waveforms], crash_points, files)
+            written.append(name)
+            print(f"Ingested '{name}': {sum(s['rows'] for s in group)} rows, {group[-1]['last'][1]} cycles")
+        return written
+
+    def _write_test(self, name, group, waveforms, crash_points, files):
+        started, first_cycle = group[0]["first"]
+        ended, last_cycle = group[-1]["last"]
+        sensors = group[0]["sensors"]
+        crashes = [(t, c) for t, c in crash_points if started <= t <= ended + 3600]
+
+        with self.db:
+            self.db.execute("DELETE FROM cycles WHERE test_id = (SELECT test_id FROM tests WHERE name = ?)", (name,))
+            self.db.execute("DELETE FROM minutes WHERE test_id = (SELECT test_id FROM tests WHERE name = ?)", (name,))
+            self.db.execute("DELETE FROM tests WHERE name = ?", (name,))
+            test_id = self.db.execute(
+                "INSERT INTO tests(name, label, started, ended, first_cycle, last_cycle, rows, channels, crashes,"
+                " crash_cycle, files, ingested) VALUES (?,?,?,?,?,?,?,?,?,?,?,?)",
+                (name, _log_label(group[0]["path"]), started, ended, first_cycle, last_cycle,
+                 sum(s["rows"] for s in group), json.dumps(sensors), len(crashes),
+                 crashes[-1][1] if crashes else None, json.dumps(files), time.time())).lastrowid
+
+            channel_ids = self._channel_ids(sensors)
+            minute_rows = []
+            for scan in group:
+                for m, (sums, mins, maxs, n, cycle) in scan["minutes"].items():
+                    for i, channel_id in enumerate(channel_ids):
+                        minute_rows.append((test_id, channel_id, int(m), int(cycle), float(sums[i] / n),
+                                            float(mins[i]), float(maxs[i]), int(n)))
+            # Rotation can split a minute over two files, the later part wins
+            self.db.executemany("INSERT OR REPLACE INTO minutes VALUES (?,?,?,?,?,?,?,?)", minute_rows)
+
+            cycles = {}
+            for scan in group:
+                for c, (t0, high, low, total, n) in scan["cycles"].items():
+                    cycles[int(c)] = [float(t0), float(high), float(low), float(total / n),
+                                      None, None, None, None, None, None, int(n)]
+            # Cycle start times from the log rows, interpolated for cycles that fell between rows
+            known = np.array(sorted(cycles))
+            times = np.array([cycles[c][0] for c in known])
+            for table in waveforms:
+                records = table["records"]
+                for record in records:  # a resumed run can repeat the interrupted cycle, the later record wins
+                    c = int(record["cycle"])
+                    entry = cycles.get(c)
+                    if entry is None:
+                        t0 = float(np.interp(c, known, times)) if len(known) else None
+                        entry = cycles[c] = [t0, None, None, None, None, None, None, None, None, None, 0]
+                    if record["samples"]:  # without waveform samples the log extremes stay
+                        entry[1] = float(record["peak"])
+                        entry[2] = float(record["minimum"])
+                    entry[4:10] = [float(record[f]) for f in ("on_time", "time_to_peak", "overshoot", "decay_time", "area")] + [int(record["samples"])]
+            self.db.executemany("INSERT INTO cycles VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)",
+                                [(test_id, c) + tuple(entry) for c, entry in cycles.items()])
+
+    # ----- Queries -----
+
+    def tests(self, last=None):
+        """ (name, label, started, last_cycle, crashes) newest first """
+        sql = "SELECT name, label, started, last_cycle, crashes FROM tests ORDER BY started DESC"
+        return self.db.execute(sql + (" LIMIT ?" if last else ""), (last,) if last else ()).fetchall()
+
+    def cycle_across_tests(self, cycle, column="peak", last=20):
+        """ (test name, label, value) of one cycle's column in the last tests that reached it """
+        if column not in ("peak", "minimum", "mean", "on_time", "time_to_peak", "overshoot", "decay_time", "area"):
+            raise ValueError(f"Unknown cycle column '{column}'")
+        return self.db.execute(
+            f"SELECT t.name, t.label, c.{column} FROM (SELECT test_id, name, label, started FROM tests"
+            " WHERE last_cycle >= ? ORDER BY started DESC LIMIT ?) t JOIN cycles c ON c.test_id = t.test_id AND c.cycle = ?"
+            " ORDER BY t.started DESC", (cycle, last, cycle)).fetchall()
+
+    def channel_minutes(self, name, channel, start=None, end=None):
+        """ (minute, cycle, mean, min, max) of one channel of a test, channel matched like the safety rules """
+        test = self.db.execute("SELECT test_id, channels FROM tests WHERE name = ?", (name,)).fetchone()
+        if test is None:
+            raise ValueError(f"No test '{name}'")
+        key = normalize_channel(channel)
+        matches = [c for c in json.loads(test[1]) if key in normalize_channel(c)]
+        if not matches:
+            raise ValueError(f"Test '{name}' has no channel '{channel}'")
+        return self.db.execute(
+            "SELECT m.t, m.cycle, m.mean, m.min, m.max FROM minutes m JOIN channels c USING (channel_id)"
+            " WHERE m.test_id = ? AND c.name = ? AND m.t BETWEEN ? AND ? ORDER BY m.t",
+            (test[0], matches[0], start if start is not None else 0, end if end is not None else 2**62)).fetchall()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cross-test history: ingest finished test logs into SQLite and query them")
+    parser.add_argument("--db", default=DEFAULT_DB)
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest = commands.add_parser("ingest", help="load log, _cycles.bin and _Crash files from files or directories")
+    ingest.add_argument("paths", nargs="+")
+    ingest.add_argument("--workers", type=int, default=None)
+    ingest.add_argument("--min-age", type=float, default=300.0, help="seconds since the last write before a test counts as finished")
+    ingest.add_argument("--replace", action="store_true", help="re-ingest tests even if their files are unchanged")
+    listing = commands.add_parser("tests", help="list tests, newest first")
+    listing.add_argument("--last", type=int, default=None)
+    cycle = commands.add_parser("cycle", help="one cycle's value across the last tests")
+    cycle.add_argument("cycle", type=int)
+    cycle.add_argument("--column", default="peak")
+    cycle.add_argument("--last", type=int, default=20)
+    minutes = commands.add_parser("minutes", help="per-minute data of one channel of a test")
+    minutes.add_argument("test")
+    minutes.add_argument("channel")
+    args = parser.parse_args(argv)
+
+    store = HistoryStore(args.db)
+    start = time.perf_counter()
+    try:
+        if args.command == "ingest":
+            store.ingest(args.paths, args.workers, args.min_age, args.replace)
+        elif args.command == "tests":
+            for name, label, started, last_cycle, crashes in store.tests(args.last):
+                print(f"{name:<40} {label:<16} {datetime.fromtimestamp(started):%Y-%m-%d %H:%M} {last_cycle:>8} cycles  {crashes} crashes")
+        elif args.command == "cycle":
+            for name, label, value in store.cycle_across_tests(args.cycle, args.column, args.last):
+                print(f"{name:<40} {label:<16} {value if value is not None else float('nan'):10.3f}")
+        elif args.command == "minutes":
+            for t, cycle_count, mean, low, high in store.channel_minutes(args.test, args.channel):
+                print(f"{datetime.fromtimestamp(t):%Y-%m-%d %H:%M} {cycle_count:>8} {mean:10.3f} {low:10.3f} {high:10.3f}")
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        store.close()
+    print(f"({(time.perf_counter() - start) * 1000:.1f} ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+import os
+import sys
+import time
+import importlib.abc
+
+REPORT_FILE = "import_profile.txt"
+
+
+class _TimedLoader(importlib.abc.Loader):
+    """ Wraps a module loader and records how long executing the module takes """
+    def __init__(self, loader, profiler, name):
+        self.loader = loader
+        self.profiler = profiler
+        self.name = name
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        self.profiler._enter(self.name)
+        try:
+            self.loader.exec_module(module)
+        finally:
+            self.profiler._exit(self.name)
+
+    def __getattr__(self, attr):
+        # get_resource_reader, is_package, ... go straight to the real loader
+        return getattr(self.loader, attr)
+
+
+class ImportProfiler(importlib.abc.MetaPathFinder):
+    """ Records cumulative and self time of every module imported while installed.
+
+    Enable with the --profile-imports argument or RIG_PROFILE_IMPORTS=1; the report lists the
+    slowest imports so startup regressions (a heavy device library at module level) stand out.
+    """
+    def __init__(self):
+        self.cumulative = {}
+        self.self_time = {}
+        self._stack = []
+        self._finding = False
+
+    @classmethod
+    def from_env(cls, argv=None):
+        """ Install and return a profiler if requested on the command line or environment, else None """
+        argv = sys.argv if argv is None else argv
+        if "--profile-imports" in argv:
+            argv.remove("--profile-imports")
+        elif os.environ.get("RIG_PROFILE_IMPORTS") != "1":
+            return None
+        profiler = cls()
+        profiler.install()
+        return profiler
+
+    def install(self):
+        sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path, target=None):
+        if self._finding:
+            return None
+        # Let the remaining finders locate the module, then wrap its loader
+        self._finding = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._finding = False
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(spec.loader, self, fullname)
+        return spec
+
+    def _enter(self, name):
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def _exit(self, name):
+        name, start, children = self._stack.pop()
+        elapsed = time.perf_counter() - start
+        self.cumulative[name] = self.cumulative.get(name, 0.0) + elapsed
+        self.self_time[name] = self.self_time.get(name, 0.0) + elapsed - children
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    def report(self, top=25):
+        """ Text table of the slowest imports """
+        total = sum(t for name, t in self.cumulative.items() if "." not in name and name in self.self_time)
+        lines = [f"{len(self.cumulative)} modules imported, top-level total {total * 1000:.0f} ms",
+                 f"{'cumulative ms':>14} {'self ms':>9}  module"]
+        for name in sorted(self.cumulative, key=self.cumulative.get, reverse=True)[:top]:
+            lines.append(f"{self.cumulative[name] * 1000:14.1f} {self.self_time[name] * 1000:9.1f}  {name}")
+        return "\n".join(lines)
+
+    def write_report(self, path=REPORT_FILE, header=""):
+        with open(path, "w") as file:
+            if header:
+                file.write(header + "\n")
+            file.write(self.report() + "\n")
+        print(f"Import profile written to '{path}'")
+
+
+if __name__ == "__main__":
+    # Profile importing a module given on the command line, e.g. python import_profile_lib.py main
+    target = sys.argv[1] if len(sys.argv) > 1 else "engine_lib"
+    profiler = ImportProfiler()
+    profiler.install()
+    start = time.perf_counter()
+    __import__(target)
+    profiler.uninstall()
+    print(f"import {target}: {(time.perf_counter() - start) * 1000:.0f} ms")
+    print(profiler.report())
@@ -3,6 +3,7 @@ import logging
 import serial
 import time
 import re
+import threading
 
 # Set the minimum safe time interval between sent commands that is required according to the user manual
 SAFE_TIME_INTERVAL = 0.25
@@ -28,6 +29,15 @@ class JULABO():
 		time.sleep(0.1) # Wait 100 ms after opening the port before sending commands
 		self.ser.flushOutput() # Flush the output buffer of the serial port before sending any new commands
 		self.ser.flushInput() # Flush the input buffer of the serial port before sending any new commands
+		self.lock = threading.Lock() # one command/response at a time (test loop, timers and watchdog share the unit)
+
+	def reopen(self):
+		"""Close and reopen the serial port after a glitch, keeping this object. Raises SerialException."""
+		self.ser.close()
+		self.ser.open()
+		time.sleep(0.1)
+		self.ser.flushOutput()
+		self.ser.flushInput()
 
 	def close(self):
 		"""The function closes and releases the serial port connection attached to the unit.
@@ -41,6 +51,10 @@ class JULABO():
 		if command == '':
 			return ''
 
+		with self.lock:
+			return self._send_command(command)
+
+	def _send_command(self, command):
 		time.sleep(SAFE_TIME_INTERVAL)
 		
 		# Flush input buffer before sending a new command
@@ -1,44 +1,71 @@
-import sys
+import time
+LAUNCH_TIME = time.perf_counter()
 import os
-import serial
-import csv
+import sys
+from import_profile_lib import ImportProfiler
+IMPORT_PROFILER = ImportProfiler.from_env()
 import pyqtgraph as pg
-import numpy as np
-import time
-import threading
-from PySide6.QtCore import Qt, QTimer
+from PySide6.QtCore import Qt, QTimer, QObject
 from PySide6.QtWidgets import (QApplication, QGroupBox, QPushButton, QDialog, QMessageBox,
                                QMainWindow, QLabel, QVBoxLayout,QCheckBox, QLineEdit,
-                               QHBoxLayout, QWidget, QDoubleSpinBox, QGridLayout)
-from flexlogger_lib import FlexLoggerInterface
-from can_controller_lib import Cantroller
-from julabo_lib import JULABO
-from timer_lib import PausableTimer
+                               QHBoxLayout, QWidget, QDoubleSpinBox, QGridLayout, QFileDialog, QInputDialog)
+from engine_lib import TestEngine, EngineError
+from plot_pyramid_lib import MinMaxPyramid
+from profile_file_lib import PROFILE_DIR, TestProfileError
+from anomaly_lib import WARN
+from update_bus_lib import UpdateBus
+
+# Replay speed choices, log seconds per second (None is as fast as the GUI keeps up)
+REPLAY_SPEEDS = {"1x": 1, "10x": 10, "100x": 100, "1000x": 1000, "max": None}
 
 
 class PumpControlApp(QMainWindow):
-    def __init__(self):
+    """Qt front end for a TestEngine: widgets, plots and dialogs only, the test itself runs in the engine
+    (or, with an AsyncTestRunner, as coroutines on the Qt-integrated asyncio loop)"""
+    def __init__(self, engine=None, runner=None):
         super().__init__()
 
+        self.engine = engine if engine is not None else TestEngine()
+        self.runner = runner
+        self.bus = UpdateBus()
+        self.engine.add_listener(self.on_engine_event)
+        from metrics_lib import METRICS
+        METRICS.instrument(self, "refresh_curves", "curve_update")
         self.initialize()
-                                                     
-    def test_case(self):
-        self.total_period = 648
-        self.chamber_period = 13.5
-        self.chamber_min_temp = -20
-        self.chamber_max_temp = 60
-        if not self.megatron_enabled:
-            self.fluid_period = 12 
-            self.fluid_min_temp = -20
-            self.fluid_max_temp = 40
-        else:
-            self.fluid_period = self.chamber_period
-            self.fluid_min_temp = self.chamber_min_temp
-            self.fluid_max_temp = self.chamber_max_temp
-        self.pressure_num_cycles = 444000
-        self.pressure_max_psi = 35
-        self.pressure_min_psi = 0
 
+        # Soak diagnostics (--soak or RIG_SOAK=1): resource time series next to the logs
+        self.soak = None
+        if "--soak" in sys.argv or os.environ.get("RIG_SOAK") == "1":
+            from soak_lib import SoakMonitor
+            self._qt_objects = len(self.findChildren(QObject)) #counted here on the GUI thread, the monitor thread only reads it
+            self.soak = SoakMonitor.from_env(path=os.path.join(self.engine.log_dir, f"soak_{self.engine.get_timestamp()}.csv"),
+                                             qt_counter=lambda: self._qt_objects)
+        if self.soak is not None:
+            self.qt_count_timer = QTimer(self)
+            self.qt_count_timer.timeout.connect(self.count_qt_objects)
+            self.qt_count_timer.start(int(self.soak.interval * 1000))
+            self.soak.start()
+
+        # Device heartbeats, outages pause the test and reconnect in the background (RIG_WATCHDOG_INTERVAL=0 disables)
+        self.watchdog = None
+        interval = float(os.environ.get("RIG_WATCHDOG_INTERVAL", 10))
+        if interval > 0:
+            from watchdog_lib import Watchdog
+            if self.runner is None:
+                self.watchdog = Watchdog(self.engine, interval=interval)
+            else:
+                self.watchdog = Watchdog(self.engine, interval=interval, pause=lambda: self.runner.call_threadsafe(self.runner.pause),
+                                         resume=lambda: self.runner.call_threadsafe(self.runner.start))
+            self.watchdog.start()
+
+        # Julabo setpoints planned from a fitted bath model (RIG_SETPOINT_SCHEDULER=control or monitor, RIG_FLUID_SOAK hours)
+        mode = os.environ.get("RIG_SETPOINT_SCHEDULER", "")
+        if mode in ("control", "monitor"):
+            from thermal_lib import SetpointScheduler
+            soak = float(os.environ.get("RIG_FLUID_SOAK", 0)) * 3600 or None
+            self.engine.setpoint_scheduler = SetpointScheduler(self.engine, soak=soak, control=mode == "control")
+            self.engine.setpoint_scheduler.start()
+                                                     
     def create_test_widget(self):
         self.test_case_checkbox = QCheckBox("enable cyclic profile")
         self.test_case_checkbox.setChecked(False)
@@ -47,80 +74,68 @@ class PumpControlApp(QMainWindow):
     def initialize(self):
         self.setWindowTitle("Manifold Durability Cyclic Pressure Test")
         self.setGeometry(100, 100, 800, 200)
-        
-        # Declare enables
-        self._test_active = False
-        self.profile_generated = False
-        self.logging_enabled = True
-        self.test_case_enabled = False
-        self.resume_cycle_enabled = False
-        self.initial_start = False
-        self.megatron_enabled = False #bool for pump box (second level)
-
-        # Declare connections
-        self.flexlogger_connected = False
-        self.canbus_connected = False
-        self.julabo_connected = False
 
         # Declare constants
-        self.timer_ms = 1000
+        self.timer_ms = self.engine.timer_ms
+        self.frame_ms = 50 #GUI repaint period, engine updates in between are coalesced
         self.plot_width_1 = 3 #line thickness
         self.plot_width_2 = 10 #line thickness
-        self.log_file_name = ""
+        self.plot_max_points = 2000 #points drawn per curve at any zoom level
+        self.replay_max_backlog = 20000 #queued sensor events before an unlimited replay waits for the GUI
 
         # Declare variables 
-        self.total_period = 0.0
-        self.fluid_period = 0.0
-        self.fluid_num_cycles = 0
-        self.fluid_min_temp = 0
-        self.fluid_max_temp = 0
-        self.chamber_period = 0.0
-        self.chamber_num_cycles = 0
-        self.chamber_min_temp = 0
-        self.chamber_max_temp = 0
-        self.pressure_num_cycles = 0
-        self.pressure_min_psi = 0
-        self.pressure_max_psi = 0
-        self.fluid_remaining_time = 0
-        self.chamber_remaining_time = 0
-        self.cycle_log_count = 0
         self.curr_psi_array = []
-        self.pump_power = 80
-        self.COM_port = 'COM6'
+        self._bus_version = 0
+        self._bus_dropped = 0 #sensor frames the update bus dropped, already reported
+        self._label_text = {}
 
         self.initialize_widgets()
         self.initialize_layouts()  
         
         # Initialize continuous updating timer
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update_sensor_values)
-        self.timer.start(self.timer_ms)  
+        if self.runner is None:
+            self.timer = QTimer(self)
+            self.timer.timeout.connect(self.update_sensor_values)
+            self.timer.start(self.timer_ms)  
+        else:  # polled by a coroutine, FlexLogger reads then never block the window
+            self.runner.skip_poll = lambda: self._replay is not None and self._replay.running
+            self.runner.start_polling()
+
+        # Repaint timer, the only place engine updates touch widgets
+        self.frame_timer = QTimer(self)
+        self.frame_timer.timeout.connect(self.apply_updates)
+        self.frame_timer.start(self.frame_ms)
+
+        # Offer to restore an interrupted test once the window is up
+        QTimer.singleShot(0, self.offer_checkpoint_restore)
 
     def initialize_widgets(self):
         """Initialize widgets"""
 
         # Column 1 widgets
         self._test_param_title = self.create_title_label("TEST PARAMETERS")
+        self._parameter_inputs = {} # engine attribute name: spin box
         self.create_total_test_box()
         self.create_fluid_cycle_box()
         self.create_chamber_cycle_box()
         self.create_pressure_cycle_box()
         self._generate_profile_button = self.create_button("GENERATE PROFILE", self.generate_profile)
+        self._load_profile_button = self.create_button("LOAD PROFILE FILE", self.load_profile_file)
 
         # Column 2 widgets
         self._main_title = self.create_title_label("AUTOMATED MANIFOLD TESTING")
 
         self._flexlogger_button = self.create_button("CONNECT FLEXLOGGER", self.connect_flexlogger)
-        self._flexlogger_conn_status = self.create_connection_status_label(self.flexlogger_connected)
+        self._flexlogger_conn_status = self.create_connection_status_label(self.engine.flexlogger_connected)
 
         self._canbus_main_button = self.create_button("CONNECT MAIN CANBUS", self.connect_main_canbus)
-        self._canbus_main_conn_status = self.create_connection_status_label(self.canbus_connected)
+        self._canbus_main_conn_status = self.create_connection_status_label(self.engine.canbus_connected)
 
         self._canbus_mega_button = self.create_button("CONNECT MEGATRON CANBUS", self.connect_mega_canbus)
-        self._canbus_mega_conn_status = self.create_connection_status_label(self.canbus_connected)
+        self._canbus_mega_conn_status = self.create_connection_status_label(self.engine.canbus_connected)
 
         self._julabo_button = self.create_button("CONNECT JULABO", self.connect_julabo)       
-        self._julabo_conn_status = self.create_connection_status_label(self.julabo_connected) 
+        self._julabo_conn_status = self.create_connection_status_label(self.engine.julabo_connected) 
 
         self._graph_1 = self.create_graph("Temperature Cycles", "Hour", "Temperature (C)")
         self._graph_2 = self.create_graph("Pressure", "Hour", "Pressure(PSI)")
@@ -133,12 +148,14 @@ class PumpControlApp(QMainWindow):
         self.create_logging_widgets()
         self.create_test_widget()
         self._resume_cycle_button = self.create_button("RESUME FROM CYCLES", self.resume_cycle_entry)
-
-        # Widget depending on connection
-        if self.flexlogger_connected:
-            self._sensors_list = self.create_sensor_box(self._flex.get_sensor_list())
-        else: 
-            self._sensors_list = self.create_sensor_box(None)
+        self._diagnostics_button = self.create_button("DIAGNOSTICS", self.show_diagnostics)
+        self._diagnostics_dialog = None
+        self._replay_button = self.create_button("REPLAY LOG", self.replay_log)
+        self._replay = None
+
+        # Live sensor table, refilled on every connect
+        self._sensors_list = self.create_sensor_box()
+        self.set_sensors(self.engine.sensors if self.engine.flexlogger_connected else [])
     
     def initialize_layouts(self):
         # Column 1 Layout
@@ -150,8 +167,10 @@ class PumpControlApp(QMainWindow):
         self.col1_layout.addWidget(self._chamber_cycle_box)
         self.col1_layout.addWidget(self._pressure_cycle_box)
         self.col1_layout.addWidget(self.file_name_input)
+        self.col1_layout.addWidget(self._load_profile_button)
         self.col1_layout.addWidget(self._generate_profile_button)
         self.col1_layout.addWidget(self._resume_cycle_button)
+        self.col1_layout.addWidget(self._replay_button)
         
         # Column 2 Layout
         self.col2_layout = QVBoxLayout()
@@ -171,6 +190,7 @@ class PumpControlApp(QMainWindow):
         self.button_layout = QGridLayout()
         self.button_layout.addWidget(self._start_resume_button, 1, 0)
         self.button_layout.addWidget(self._pause_stop_button, 1, 1)
+        self.button_layout.addWidget(self._diagnostics_button, 1, 2)
         self.col2_layout.addLayout(self.button_layout)
 
         # Column 3 Layout
@@ -230,7 +250,7 @@ class PumpControlApp(QMainWindow):
         total_input = QDoubleSpinBox(self) 
         total_input.setSingleStep(0.25)    
         total_input.setMaximum(9999.99)
-        total_input.valueChanged.connect(lambda value: self.update_variable("total_period", value))
+        self.bind_parameter(total_input, "total_period")
         layout.addWidget(total_input, 1, 0)
         layout.addWidget(QLabel("hours"), 1, 1)
 
@@ -245,7 +265,7 @@ class PumpControlApp(QMainWindow):
         cycle_input = QDoubleSpinBox(self)
         cycle_input.setSingleStep(0.25)
         cycle_input.setMaximum(9999.99)
-        cycle_input.valueChanged.connect(lambda value: self.update_variable("fluid_period", value)) # updates self.fluid_period everytime input is updated
+        self.bind_parameter(cycle_input, "fluid_period") # updates engine.fluid_period everytime input is updated
         layout.addWidget(cycle_input, 1, 0)
         layout.addWidget(QLabel("hours"), 1, 1)
 
@@ -253,7 +273,7 @@ class PumpControlApp(QMainWindow):
         min_temp = QDoubleSpinBox(self)
         min_temp.setSingleStep(1)
         min_temp.setMinimum(-100.00)
-        min_temp.valueChanged.connect(lambda value: self.update_variable("fluid_min_temp", value))  
+        self.bind_parameter(min_temp, "fluid_min_temp")  
         layout.addWidget(QLabel("min temp (°C)"), 2, 0)
         layout.addWidget(min_temp, 2, 1)
 
@@ -261,7 +281,7 @@ class PumpControlApp(QMainWindow):
         max_temp = QDoubleSpinBox(self)
         max_temp.setSingleStep(1)
         max_temp.setMinimum(-100.00)
-        max_temp.valueChanged.connect(lambda value: self.update_variable("fluid_max_temp", value))   
+        self.bind_parameter(max_temp, "fluid_max_temp")   
         layout.addWidget(QLabel("max temp (°C)"), 3, 0)
         layout.addWidget(max_temp, 3, 1)
 
@@ -276,7 +296,7 @@ class PumpControlApp(QMainWindow):
         cycle_input = QDoubleSpinBox(self)
         cycle_input.setSingleStep(0.25)
         cycle_input.setMaximum(9999.99)
-        cycle_input.valueChanged.connect(lambda value: self.update_variable("chamber_period", value))
+        self.bind_parameter(cycle_input, "chamber_period")
         layout.addWidget(cycle_input, 1, 0)
         layout.addWidget(QLabel("hours"), 1, 1)
 
@@ -284,7 +304,7 @@ class PumpControlApp(QMainWindow):
         min_temp = QDoubleSpinBox(self)
         min_temp.setSingleStep(1)   
         min_temp.setMinimum(-100.00)
-        min_temp.valueChanged.connect(lambda value: self.update_variable("chamber_min_temp", value))      
+        self.bind_parameter(min_temp, "chamber_min_temp")      
         layout.addWidget(QLabel("min temp (°C)"), 2, 0)
         layout.addWidget(min_temp, 2, 1)
 
@@ -292,7 +312,7 @@ class PumpControlApp(QMainWindow):
         max_temp = QDoubleSpinBox(self)
         max_temp.setSingleStep(1)   
         max_temp.setMinimum(-100.00)  
-        max_temp.valueChanged.connect(lambda value: self.update_variable("chamber_max_temp", value))  
+        self.bind_parameter(max_temp, "chamber_max_temp")  
         layout.addWidget(QLabel("max temp (°C)"), 3, 0)
         layout.addWidget(max_temp, 3, 1)
 
@@ -307,21 +327,21 @@ class PumpControlApp(QMainWindow):
         cycle_input = QDoubleSpinBox(self)
         cycle_input.setSingleStep(0.25)
         cycle_input.setMaximum(999999.99)
-        cycle_input.valueChanged.connect(lambda value: self.update_variable("pressure_num_cycles", value))
+        self.bind_parameter(cycle_input, "pressure_num_cycles")
         layout.addWidget(cycle_input, 2, 0)
         layout.addWidget(QLabel("cycles"), 2, 1)
 
         # Create min psi
         min_psi = QDoubleSpinBox(self)
         min_psi.setSingleStep(1)       
-        min_psi.valueChanged.connect(lambda value: self.update_variable("pressure_min_psi", value))
+        self.bind_parameter(min_psi, "pressure_min_psi")
         layout.addWidget(QLabel("min PSI"), 3, 0)
         layout.addWidget(min_psi, 3, 1)
 
         # Create max psi
         max_psi = QDoubleSpinBox(self)
         max_psi.setSingleStep(1)       
-        max_psi.valueChanged.connect(lambda value: self.update_variable("pressure_max_psi", value))
+        self.bind_parameter(max_psi, "pressure_max_psi")
         layout.addWidget(QLabel("max PSI"), 4, 0)
         layout.addWidget(max_psi, 4, 1)
 
@@ -331,9 +351,9 @@ class PumpControlApp(QMainWindow):
         self._cycle_count_box = QGroupBox("Live Cycle Count")
         layout = QGridLayout()
 
-        self.pressure_cycle_count_label = QLabel(f"Pressure Cycle Count: 0/{self.pressure_num_cycles}")
-        self.fluid_cycle_count_label = QLabel(f"Fluid Cycle Count: 0/{self.fluid_num_cycles}")
-        self.chamber_cycle_count_label = QLabel(f"Chamber Cycle Count: 0/{self.chamber_num_cycles}")
+        self.pressure_cycle_count_label = QLabel(f"Pressure Cycle Count: 0/{self.engine.pressure_num_cycles}")
+        self.fluid_cycle_count_label = QLabel(f"Fluid Cycle Count: 0/{self.engine.fluid_num_cycles}")
+        self.chamber_cycle_count_label = QLabel(f"Chamber Cycle Count: 0/{self.engine.chamber_num_cycles}")
 
         layout.addWidget(self.pressure_cycle_count_label)
         layout.addWidget(self.fluid_cycle_count_label)
@@ -373,6 +393,7 @@ class PumpControlApp(QMainWindow):
         graph.setLabel('left', y_label)
         graph.setLabel('bottom', x_label)
         graph.showGrid(x=True, y=True)
+        graph.sigXRangeChanged.connect(lambda *args: self.refresh_curves(*args)) # Re-pick level of detail on zoom/pan (looked up per call, metrics may wrap it later)
 
         return graph
     
@@ -413,26 +434,71 @@ class PumpControlApp(QMainWindow):
             return False    
     
     def update_variable(self, var_name, value):
-        """Modularly update a variable's value"""
-        setattr(self, var_name, value)
+        """Modularly update a test parameter on the engine"""
+        setattr(self.engine, var_name, value)
         #print(f"{var_name} updated: {value}") # debug statement
 
+    def bind_parameter(self, spin_box, var_name):
+        """Spin box for a test parameter: edits update the engine and drop a loaded profile file"""
+        self._parameter_inputs[var_name] = spin_box
+        spin_box.valueChanged.connect(lambda value: self.edit_parameter(var_name, value))
+
+    def edit_parameter(self, var_name, value):
+        """Entered values replace a loaded profile file, so the next GENERATE PROFILE uses what is shown"""
+        if self.engine.test_profile is not None:
+            print(f"Profile file '{self.engine.test_profile.name}' cleared, using the entered values")
+            self.engine.test_profile = None
+            self._load_profile_button.setText("LOAD PROFILE FILE")
+        self.update_variable(var_name, value)
+
+    def show_parameters(self):
+        """Put the engine's test parameters (e.g. from a profile file) into the spin boxes without editing them"""
+        for var_name, spin_box in self._parameter_inputs.items():
+            spin_box.blockSignals(True)
+            spin_box.setValue(getattr(self.engine, var_name))
+            spin_box.blockSignals(False)
+
     def update_boolean(self, var_name, state):
-        """Modularly update a boolean's state"""
-        setattr(self, var_name, state == 2)
+        """Modularly update an engine boolean's state"""
+        setattr(self.engine, var_name, state == 2)
         print(f"{var_name}: {state}")
 
+    def load_profile_file(self):
+        """Attached to load profile button, loads a JSON/TOML test profile file"""
+        path, _ = QFileDialog.getOpenFileName(self, "Open Test Profile", PROFILE_DIR, "Test profiles (*.json *.toml)")
+        if not path:
+            return
+
+        try:
+            profile = self.engine.load_profile(path)
+        except TestProfileError as e:
+            print(f"Error: {e}")
+            self.create_dialogue_ok_box("Profile Error", str(e))
+            return
+
+        self.show_parameters()
+        self._load_profile_button.setText(f"PROFILE FILE: {profile.name}")
+        self.create_dialogue_ok_box("Profile Loaded", f"Loaded '{profile.name}'. It replaces the entered values until one of them is edited. Generate profile to apply it.")
+
+    def run_connect(self, kind, done, **kwargs):
+        """(STATIC) Connect a device and call done(ok); in asyncio mode on the device thread, so the window stays responsive"""
+        if self.runner is None:
+            done(getattr(self.engine, f"connect_{kind}")(**kwargs))
+            return
+
+        def finished(task):
+            if not task.cancelled() and task.exception() is not None:
+                print(f"Error: {task.exception()}")
+            done(not task.cancelled() and task.exception() is None and bool(task.result()))
+        self.runner.loop.create_task(self.runner.connect(kind, **kwargs)).add_done_callback(finished)
+
     def connect_flexlogger(self):
         """Attached to flexlogger button, creates an instance and starts updating sensor values"""
+        self.run_connect("flexlogger", self.flexlogger_connected)
 
-        print("Connecting FlexLogger...")  
-        self._flex = FlexLoggerInterface()
-        self.flexlogger_connected = self._flex.connect_to_instance()
-        #self.timer.timeout.connect(self.check_connections)
-        
-        if self.flexlogger_connected:
+    def flexlogger_connected(self, ok):
+        if ok:
             # Create a new label
-            print("Connected to FlexLogger successfully!")
             new_flex_status = QLabel("Connected")
             # Replace label widget
             self.conn_layout.removeWidget(self._flexlogger_conn_status)
@@ -441,24 +507,16 @@ class PumpControlApp(QMainWindow):
             self.conn_layout.addWidget(self._flexlogger_conn_status, 1, 1)
 
             # Create a new sensor box with updated sensor list
-            new_sensor_box = self.create_sensor_box(self._flex.get_sensor_list())
-            # Remove old widget and replace it
-            self.col3_layout.removeWidget(self._sensors_list)
-            self._sensors_list.deleteLater()
-            self._sensors_list = new_sensor_box
-            self.col3_layout.addWidget(self._sensors_list)
+            self.set_sensors(self.engine.sensors)
         else: 
-            print("Error: No running FlexLogger detected.  If FlexLogger is running, this might mean the automation server is not enabled.  To turn on the automation server, see the General tab of the Preferences in FlexLogger")
             self.create_dialogue_ok_box("Connection Error", "Could not connect to FlexLogger!")
             
     def connect_main_canbus(self):
-        print("Connecting MAIN CANBUS...")
-        self._cantroller = Cantroller(megatron=False)
-        self.canbus_connected = self._cantroller.connect_to_instance()
+        self.run_connect("canbus", self.main_canbus_connected, megatron=False)
 
-        if self.canbus_connected:
+    def main_canbus_connected(self, ok):
+        if ok:
             # Create a new label
-            print("Connected to MAIN CANBUS successfully!")
             new_flex_status = QLabel("Connected")
             # Replace label widget
             self.conn_layout.removeWidget(self._canbus_main_conn_status)
@@ -472,17 +530,14 @@ class PumpControlApp(QMainWindow):
             except RuntimeError:
                 pass
         else:
-            print("Error: CANBUS did not respond")
             self.create_dialogue_ok_box("Connection Error", "Could not connect to CANBUS!")
 
     def connect_mega_canbus(self):
-        print("Connecting MEGATRON CANBUS...")
-        self._cantroller = Cantroller(megatron=True)
-        self.canbus_connected = self._cantroller.connect_to_instance()
+        self.run_connect("canbus", self.mega_canbus_connected, megatron=True)
 
-        if self.canbus_connected:
+    def mega_canbus_connected(self, ok):
+        if ok:
             # Create a new label
-            print("Connected to MEGATRON CANBUS successfully!")
             new_flex_status = QLabel("Connected")
             # Replace label widget
             self.conn_layout.removeWidget(self._canbus_mega_conn_status)
@@ -495,39 +550,19 @@ class PumpControlApp(QMainWindow):
                 self._canbus_main_button.deleteLater()
                 self.conn_layout.removeWidget(self._julabo_button)
                 self._julabo_button.deleteLater()
-                self.julabo_connected = False
-                self.megatron_enabled = True
-                print("Megatron (Pump Box Second Level) mode activated")
             except RuntimeError:
                 pass
         else:
-            print("Error: CANBUS did not respond")
             self.create_dialogue_ok_box("Connection Error", "Could not connect to CANBUS!")
     
     def connect_julabo(self):
         """Attempt to connect and verify communication with Julabo."""
-        print("Connecting Julabo...")
-
-        try:
-            self._julabo = JULABO(self.COM_port, baud=4800) #change based on COM port
+        self.run_connect("julabo", self.julabo_connected)
 
-            # Test if communication works
-            response = self._julabo.get_version()
-            if response:
-                print(f"Connected to Julabo Version: {response}")
-                self.julabo_connected = True
-            else:
-                print("Error: Julabo did not respond. Check COM port.")
-                self.julabo_connected = False
-
-        except serial.SerialException:
-            print("Error: Could not open COM. Check COM port.")
-            self.julabo_connected = False
-
-
-        if self.julabo_connected:
+    def julabo_connected(self, ok):
+        if ok:
             # Update UI status
-            new_status_label = QLabel("Connected" if self.julabo_connected else "Not Connected")
+            new_status_label = QLabel("Connected")
 
             self.conn_layout.removeWidget(self._julabo_conn_status)
             self._julabo_conn_status.deleteLater()
@@ -537,7 +572,7 @@ class PumpControlApp(QMainWindow):
             self.create_dialogue_ok_box("Connection Error", "Could not connect to julabo!")
 
     def check_connections(self):
-        if self._flex.check_active_project() is None:
+        if not self.engine.check_connections():
             # Create a new label
             new_flex_status = QLabel("Not connected")
             # Replace label widget
@@ -607,143 +642,146 @@ class PumpControlApp(QMainWindow):
         dialog.setLayout(layout)
 
         # Execute dialog
-        if dialog.exec() and self.profile_generated:
-            self.pressure_cycle_count = spinbox1.value()
-
-            self.fluid_cycle_count = spinbox2.value()
-            self._fluid_timer.remaining_time = spinbox3.value() #set fluid timer remaining time
-            self.fluid_remaining_time = spinbox3.value()
-            self._fluid_timer.paused = True #set to paused to simulate resuming
-            self.fluid_cycle_count_label.setText(f"Fluid Cycle Count: {self.fluid_cycle_count}/{self.fluid_num_cycles}")
-
-            self.chamber_cycle_count = spinbox4.value()
-            self._chamber_timer.remaining_time = spinbox5.value() #set chamber timer remaining time
-            self.chamber_remaining_time = spinbox5.value()
-            self._chamber_timer.paused = True #set to paused to simulate resuming
-            self.chamber_cycle_count_label.setText(f"Chamber Cycle Count: {self.chamber_cycle_count}/{self.chamber_num_cycles}")
-
-            for sen in self.sensor_data:
-                self.sensor_data[sen]["time_counter"] = (self.fluid_cycle_count - 1) * (self.fluid_period * 3600) + (self.fluid_period * 3600 - self.fluid_remaining_time)
-
-            self.resume_cycle_enabled = True
+        if dialog.exec() and self.engine.profile_generated:
+            self.engine.apply_resume_state(spinbox1.value(), spinbox2.value(), spinbox3.value(), spinbox4.value(), spinbox5.value())
+            self.engine.write_checkpoint(sync=True)
                        
         else:
             self.create_dialogue_ok_box("Error", "Profile not generated! Generate profile first.")
                        
             print("Updated cycle status")
 
-    def calculate_period(self, cycle_period, cycle_min, cycle_max):
-        """(STATIC) Create lists for x-axis and y-axis based on period, min, and max"""
-        x = []  # Start with an empty list
-        y = []  # Start with an empty list
-        if cycle_period > 0 and cycle_max > cycle_min:  # Prevent division by zero
-                indices = int(self.total_period / cycle_period) + 1
-                for i in range(indices):
-                    x.append(cycle_period * i)  # Append value to x
-                    if i % 2 == 0:
-                        y.append(cycle_max)  # Append max temp for even indices
-                    else:
-                        y.append(cycle_min)  # Append min temp for odd indices
-                
-                x.append(cycle_period * indices)
-                print("X values:", x)
-                print("Y values:", y)
-                return x, y, len(y) - 1 # This is number of cycles, a cycle being inbetween point A and B
+    def offer_checkpoint_restore(self):
+        """(STATIC) On startup, offer to restore an unfinished test from the checkpoint journal"""
+        state = self.engine.pending_checkpoint()
+        if state is None:
+            return
 
-        else:
-            print("Entry Error")
+        saved_at = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(state.wall_time))
+        message = (f"An unfinished test was checkpointed at {saved_at}:\n"
+                   f"pressure cycle {state.pressure_cycle_count}/{state.pressure_num_cycles}, "
+                   f"fluid cycle {state.fluid_cycle_count}, chamber cycle {state.chamber_cycle_count}.\n\n"
+                   f"Restore this test?")
+        if not self.create_dialogue_yes_no_box("Restore Test", message):
+            return
+
+        try:
+            self.engine.restore_checkpoint(state)
+        except EngineError as e:
+            self.create_dialogue_ok_box("Restore Test", f"Could not restore test: {e}")
+            return
+        self.show_parameters()
+        if self.engine.test_profile is not None:
+            self._load_profile_button.setText(f"PROFILE FILE: {self.engine.test_profile.name}")
+        self.create_dialogue_ok_box("Restore Test", "Test restored, connect devices and press START/RESUME.")
 
     def plot(self, graph, x, y, plotname, color, width):
-        """(DYNAMIC) Function for plotting calculated period"""
+        """(DYNAMIC) Function for plotting a compiled profile polyline"""
         pen = pg.mkPen(color=color, width=width)
-        graph.plot(x, y, name=plotname, pen=pen, stepMode=True)
+        graph.plot(x, y, name=plotname, pen=pen)
 
     def generate_profile(self):
         """(STATIC) Generate a plot based on enabled cycles"""
         
         if self.create_dialogue_yes_no_box("Confirmation", "Are you sure you want to generate new profile?"):
-            print("Generating Profile...")
-            # Enable bool
-            self.profile_generated = True
-            self.initial_start = True
-            
-            # Test Case Profile
-            if self.test_case_enabled:
-                self.test_case() 
-
-            # Megatron
-            if self.megatron_enabled:
-                self.fluid_period = self.chamber_period
-
-            # Deactivate and reset test
-            self._test_active = False
-            self.pressure_cycle_count = 0
-            self.cycle_log_count = 0
-            self.fluid_remaining_time = self.fluid_period*3600
-            self.chamber_remaining_time = self.chamber_period*3600
-
-            # Resuming test 
-            if not self.resume_cycle_enabled:
-                self.fluid_cycle_count = 0
-                self.chamber_cycle_count = 0
-                self.pressure_drop_count = 0 # For pressure drop check
-                self.pressure_drop_debug = 0
-
-            # Initialize fluid cycling timer    
-            self._fluid_timer = PausableTimer(self.fluid_period*3600, self.set_julabo_temp)
-            self._chamber_timer = PausableTimer(self.chamber_period*3600, self.set_chamber_temp)
-
-            # Clear both graphs and reset the range
-            self._graph_1.clear()
-            self._graph_2.clear()
-            self._graph_1.setXRange(0, self.total_period, padding=0)
-
-            # Re-intialize dict ["curve"] with live plotting because we cleared all .plot()
-            self._test_timer_count = 0 # This counter is for 'data[x_values]'
-            for sen in self.sensor_data:
-                self.sensor_data[sen]["curve"] = self.init_curve_plot(self._choose_graph(sen), 'r')
-                self.sensor_data[sen]["values"] = []
-                self.sensor_data[sen]["x_values"] = []
-                self.sensor_data[sen]["time_counter"] = 0
-
-
-            # Plot profiles
-            x, y, self.fluid_num_cycles = self.calculate_period(self.fluid_period, self.fluid_min_temp, self.fluid_max_temp)
-            self.plot(self._graph_1,x, y, "fluid temperature", 'm', self.plot_width_1)
-
-            x, y, self.chamber_num_cycles = self.calculate_period(self.chamber_period, self.chamber_min_temp, self.chamber_max_temp)
-            self.plot(self._graph_1,x, y, "chamber temperature", 'k', self.plot_width_1)
-
-            # Update cycle labels
-            self.pressure_cycle_count_label.setText(f"Pressure Cycle Count: {self.pressure_cycle_count}/{self.pressure_num_cycles}")
-            self.fluid_cycle_count_label.setText(f"Fluid Cycle Count: {self.fluid_cycle_count}/{self.fluid_num_cycles}")
-            self.chamber_cycle_count_label.setText(f"Chamber Cycle Count: {self.chamber_cycle_count}/{self.chamber_num_cycles}")
-
-            # LOGGING
-            if self.logging_enabled:
-                self.create_log_file(self.log_file_name)
+            try:
+                self.engine.build_profile()
+            except EngineError as e:
+                self.create_dialogue_ok_box("Entry Error", str(e))
+
+    def on_engine_event(self, event, data):
+        """(DYNAMIC) Engine listener, may run on a worker thread so it only publishes to the update bus"""
+        if event == "counts":
+            self.bus.publish("counts", data)
+        else:
+            self.bus.post(event, data, droppable=event == "sensors") # only sample frames may be lost to a backlog
+
+    def count_qt_objects(self):
+        """ Qt object count for the soak monitor, findChildren is not safe off the GUI thread """
+        self._qt_objects = len(self.findChildren(QObject))
+
+    def apply_updates(self):
+        """(DYNAMIC) Function connected to the frame timer, applies everything published since the last frame"""
+        self._bus_version, state = self.bus.snapshot(self._bus_version)
+        counts = state.get("counts")
+        if counts is not None:
+            self.set_label_text(self.pressure_cycle_count_label, f"Pressure Cycle Count: {counts['pressure']}/{counts['pressure_total']}")
+            self.set_label_text(self.fluid_cycle_count_label, f"Fluid Cycle Count: {counts['fluid']}/{counts['fluid_total']}")
+            self.set_label_text(self.chamber_cycle_count_label, f"Chamber Cycle Count: {counts['chamber']}/{counts['chamber_total']}")
+
+        sampled = False
+        for event, data in self.bus.drain():
+            if event == "sensors":
+                self.sensor_model.add_samples(data["values"])
+                sampled |= self.record_sensor_values(data["values"], data["time_index"], data.get("spans"))
+            elif event == "profile":
+                self.show_profile(data["fluid"], data["chamber"], data["total_period"])
+            elif event == "device":
+                self.show_device_state(data["name"], data["state"])
+            elif event == "alarm" and data["alarm"].action != WARN:
+                if self._replay is not None and self._replay.running:
+                    print(f"Replay: {data['alarm'].rule.name} detected at cycle {self._replay.pressure_cycle_count}")
+                else:
+                    self.create_dialogue_ok_box("Test Error", f"{data['alarm'].rule.name} detected, test paused")
+
+        if self.bus.dropped > self._bus_dropped:
+            print(f"Warning: GUI fell behind, {self.bus.dropped - self._bus_dropped} sensor frames not plotted")
+            self._bus_dropped = self.bus.dropped
+
+        # One table update and one curve redraw per frame
+        self.sensor_model.flush()
+        if sampled:
+            self.refresh_curves()
+        if self._replay is not None and not self._replay.running:
+            self.set_label_text(self._replay_button, "REPLAY LOG")
+
+    def show_device_state(self, name, state):
+        """(DYNAMIC) Connection status label of a device the watchdog lost or got back"""
+        labels = {"flexlogger": "_flexlogger_conn_status", "julabo": "_julabo_conn_status",
+                  "canbus": "_canbus_mega_conn_status" if self.engine.megatron_enabled else "_canbus_main_conn_status"}
+        from watchdog_lib import UP
+        self.set_label_text(getattr(self, labels[name]), "Connected" if state == UP else "Reconnecting...")
+
+    def set_label_text(self, label, text):
+        """(DYNAMIC) setText only when the text differs from what the label already shows"""
+        if self._label_text.get(label) != text:
+            self._label_text[label] = text
+            label.setText(text)
+
+    def show_profile(self, fluid_profile, chamber_profile, total_period):
+        """(STATIC) Clear the graphs and plot a newly built profile"""
+        # Clear both graphs and reset the range
+        self._graph_1.clear()
+        self._graph_2.clear()
+        self._graph_1.setXRange(0, total_period, padding=0)
+        self._graph_2.setXRange(0, total_period, padding=0)
+
+        # Put the live curves back, clear() removed every item from the graphs
+        self.sensor_model.reset_stats()
+        for sen, data in self.sensor_data.items():
+            data["pyramid"].clear()
+            data["curve"].setData([], [])
+            self._choose_graph(sen).addItem(data["curve"])
+
+        # Plot profiles
+        x, y = fluid_profile.plot_arrays()
+        self.plot(self._graph_1,x, y, "fluid temperature", 'm', self.plot_width_1)
+
+        x, y = chamber_profile.plot_arrays()
+        self.plot(self._graph_1,x, y, "chamber temperature", 'k', self.plot_width_1)
 
     def init_curve_plot(self, graph, color):
         """(STATIC) Create a live plot 'curve' for a sensor"""
         curve = graph.plot([], [], pen=pg.mkPen(color=color, width=self.plot_width_2)) 
         return curve
 
-    def update_curve(self):
-            """(DYNAMIC) Update all live plots with new sensor values"""
-            if self._test_active: 
-                
-                for sensor, data in self.sensor_data.items(): 
-                    # Ensure alignment in plot update
-                    x_data = np.array(data["x_values"], dtype=float)
-                    y_data = np.array(data["values"], dtype=float)
-                    data["curve"].setData(x_data, y_data)  # Update plot
-
-                    # Auto-scroll X axis
-                    if len(x_data) > 0:
-                        self._graph_2.setXRange(x_data[0], x_data[-1], padding=0.1)
-
-                if self.logging_enabled:
-                    self.update_log_file()
+    def refresh_curves(self, *args):
+        """(DYNAMIC) Redraw every curve from its min/max pyramid at the detail matching the graph zoom"""
+        for sensor, data in getattr(self, "sensor_data", {}).items():
+            graph = self._choose_graph(sensor)
+            x_min, x_max = graph.viewRange()[0]
+            x_data, y_data = data["pyramid"].view(x_min, x_max, self.plot_max_points)
+            data["curve"].setData(x_data, y_data)  # Update plot
 
     def _choose_graph(self, sensor_label):
         """(STATIC) Internal function to choose which graph to display on based on sensor name"""
@@ -754,281 +792,200 @@ class PumpControlApp(QMainWindow):
         else:    
             return self._graph_2
 
-    def create_sensor_box(self, sensors):
-        """(STATIC) Create widget for sensor data (FlexLogger)"""
+    def create_sensor_box(self):
+        """(STATIC) Create widget for sensor data (FlexLogger): a sortable table with a channel filter"""
+        from sensor_table_lib import SensorTableModel, create_sensor_view
         sensor_box = QGroupBox("Live Sensor Data")
-        layout = QGridLayout()
+        self.sensor_model = SensorTableModel(self)
         self.sensor_data = {}
-        
-        if not sensors:  # Check if the sensor list is empty
-            no_sensors_label = QLabel("No sensors available")
-            self.flexlogger_connected = False
-            layout.addWidget(no_sensors_label, 0, 0, 1, 2)
-        else:
-            # For every sensor in the list, create a label widget, value array, curve
-            for row, sen in enumerate(sensors):
-                sensor_label = QLabel("0.00")
-
-                # Initialize CSV file for logging
-                if self.logging_enabled:
-                    pass
-
-                # Dict to store sensor properties
-                self.sensor_data[sen] = {
-                    "label": sensor_label,
-                    "x_values": [],
-                    "values": [],
-                    "time_counter": 0,
-                    "curve": self.init_curve_plot(self._choose_graph(sen), 'r')
-                }
-                
-                layout.addWidget(QLabel(f"{str(sen)}:"), row, 0)
-                layout.addWidget(sensor_label, row, 1)
-
-                # Store count of pressure sensors
-                if "psi" in sen.lower():
-                    self.curr_psi_array.append(0)
-
-        # Return created sensor widget layout 
+        self._sensor_view, proxy = create_sensor_view(self.sensor_model, sensor_box)
+        sensor_filter = QLineEdit()
+        sensor_filter.setPlaceholderText("Filter channels")
+        sensor_filter.textChanged.connect(proxy.setFilterFixedString)
+
+        layout = QVBoxLayout()
+        layout.addWidget(sensor_filter)
+        layout.addWidget(self._sensor_view)
         sensor_box.setLayout(layout)
         return sensor_box
 
-    def update_sensor_values(self):
-        """(DYNAMIC) Function connected to timer to append sensor values to dict & log to file"""
-
+    def set_sensors(self, sensors):
+        """(STATIC) Point the sensor table and the live curves at a new channel list"""
         for sen, data in self.sensor_data.items():
-            new_value = self._flex.read_sensor_val(sen)  # Read latest sensor value
-            
-            try:
-                new_value = float(new_value)  # Ensure it's a valid float
-                data["label"].setText(str(new_value))  # Update QLabel
-
-                if self._test_active:
-                    
-                    time_index = data["time_counter"] * (self.timer_ms / 3600000)  # X-axis value
-                    data["time_counter"] += 1  # Increment array counter
-
-                    # Append new value and time index (keep 100 most recent)
-                    data["values"].append(new_value)
-                    data["x_values"].append(time_index)
-
-                    if len(data["values"]) > 100:
-                        data["values"].pop(0)
-                        data["x_values"].pop(0)
-                    
-                    # inlet pressure drop check
-                    if "pressure1" in sen.lower():
-                        curr_pressure = new_value # Sets current value to sensor reading
-                        if curr_pressure < 30: # if current pressure < max psi add to count -8 for range
-                            self.pressure_drop_count += 1
-                        else:                                     # if not, reset count
-                            self.pressure_drop_count = 0
-                        
-                        print(f"Pressure drop count: {self.pressure_drop_count}") # Debug statement
-                        if self.pressure_drop_count > 100:
-                            print("Pressure drop detected, test crashed")
-                            self._test_active = False
-                            self.create_crash_file()
-                            self.create_dialogue_ok_box("Test Error", "Pressure drop detected, test paused")
-                            
-
-            except ValueError:
-                print(f"Warning: Non-numeric value received for {sen}: {new_value}")
-
-    def get_timestamp(self):
-        """(DYNAMIC) Return the current timestamp as a filename-safe formatted string"""
-        from datetime import datetime
-        return datetime.now().strftime("%Y-%m-%d_%H-%M-%S")  # Replace colons with dashes
+            self._choose_graph(sen).removeItem(data["curve"])
+        # Dict to store sensor properties
+        self.sensor_data = {sen: {"pyramid": MinMaxPyramid(), "curve": self.init_curve_plot(self._choose_graph(sen), 'r')}
+                            for sen in sensors}
+        # Store count of pressure sensors
+        self.curr_psi_array = [0 for sen in sensors if "psi" in sen.lower()]
+        self.sensor_model.set_channels(sensors)
+        self._sensors_list.setTitle(f"Live Sensor Data ({len(sensors)} channels)" if sensors else "Live Sensor Data - no sensors available")
 
-    def start_test(self):
-        
-        """(STATIC) Enables test active bool and starts the test loop in a separate thread"""
-        if not self.flexlogger_connected:
-            self.create_dialogue_ok_box("Warning", "FlexLogger not connected!")
+    def update_sensor_values(self):
+        """(DYNAMIC) Function connected to timer, runs one engine acquisition tick"""
+        if self._replay is None or not self._replay.running:  # live values would mix into the replayed ones
+            self.engine.tick()
+
+    def record_sensor_values(self, values, time_index, spans=None):
+        """(DYNAMIC) Add one acquisition to the plot history while the test runs, True if anything was added.
+        With spans (full-rate stream) the min and max since the last acquisition are plotted too"""
+        if time_index is None:
+            return False
+        spans = spans or {}
+        for sen, new_value in values.items():
+            data = self.sensor_data.get(sen)
+            if data is not None:
+                if sen in spans:
+                    data["pyramid"].append(time_index, spans[sen][0])
+                    data["pyramid"].append(time_index, spans[sen][1])
+                data["pyramid"].append(time_index, new_value) # Whole-test history for plotting
+        return True
+
+    def show_diagnostics(self):
+        """(STATIC) Non-modal window with live latency histograms of the device calls, enables metrics on first use"""
+        from metrics_lib import METRICS
+        if not METRICS.enabled:
+            METRICS.enable()
+            self.engine.instrument()
+            METRICS.instrument(self, "refresh_curves", "curve_update")
+        if self._diagnostics_dialog is None:
+            dialog = QDialog(self)
+            dialog.setWindowTitle("Diagnostics")
+            label = QLabel()
+            label.setStyleSheet("font-family: monospace;")
+            label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+            layout = QVBoxLayout()
+            layout.addWidget(label)
+            dialog.setLayout(layout)
+            timer = QTimer(dialog)
+            timer.timeout.connect(lambda: label.setText(self.diagnostics_text()))
+            timer.start(1000)
+            label.setText(self.diagnostics_text())
+            self._diagnostics_dialog = dialog
+        self._diagnostics_dialog.show()
+        self._diagnostics_dialog.raise_()
+
+    def replay_log(self):
+        """(STATIC) Attached to replay log button, plays saved log files through the plots and safety rules, or stops a replay"""
+        if self._replay is not None and self._replay.running:
+            self._replay.stop()
+            self.set_label_text(self._replay_button, "REPLAY LOG")
+            return
+        if self.engine.active:
+            self.create_dialogue_ok_box("Replay", "Pause the test before replaying a log.")
             return
 
-        if not self.canbus_connected:
-            self.create_dialogue_ok_box("Warning", "CANBUS not connected!")
+        paths, _ = QFileDialog.getOpenFileNames(self, "Replay Log Files", self.engine.log_dir, "All files (*)")
+        if not paths:
             return
-        
-        if not self.julabo_connected and not self.megatron_enabled:
-            self.create_dialogue_ok_box("Warning", "JULABO not connected!")
+        speed, ok = QInputDialog.getItem(self, "Replay Speed", "Log seconds per second:", list(REPLAY_SPEEDS), 2, False)
+        if not ok:
+            return
+        from replay_lib import LogReplay, LogReplayError
+        try:
+            replay = LogReplay(self.engine, paths, speed=REPLAY_SPEEDS[speed],
+                               throttle=lambda: self.bus.pending > self.replay_max_backlog)
+        except (OSError, LogReplayError) as e:
+            print(f"Error: {e}")
+            self.create_dialogue_ok_box("Replay Error", str(e))
             return
 
-        if self.profile_generated:
-            print("Starting Test")
-            # Activate test bool
-            self._test_active = True 
-
-            # Updating live curve
-            self.p_timer = QTimer(self) # Initialize timer 
-            self.p_timer.timeout.connect(self.update_curve)
-            self.p_timer.start(self.timer_ms)
-
-            # Run pressure profile            
-            self.test_thread = threading.Thread(target=self.run_test_profile, daemon=True) # This is in separate thread to allow for GUI interaction
-            self.test_thread.start()
-
-            # Time
-            if self.initial_start:
-                self.last_fluid_time = time.time() - (self.fluid_period * 3600 - self.fluid_remaining_time)
-                self.last_chamber_time = time.time() - (self.chamber_period * 3600 - self.chamber_remaining_time)
-                self.initial_start = False
-
+        # Plot the replay on its own sensor box and an auto-ranging time axis
+        self.set_sensors(replay.sensors)
+        for graph in (self._graph_1, self._graph_2):
+            graph.enableAutoRange(axis='x')
+        self._replay = replay
+        self.set_label_text(self._replay_button, "STOP REPLAY")
+        replay.start()
+
+    def end_replay(self):
+        """(STATIC) Stop any replay and bring back the live sensor box"""
+        if self._replay is None:
+            return
+        self._replay.stop()
+        self._replay = None
+        self.set_label_text(self._replay_button, "REPLAY LOG")
+        if self.engine.flexlogger_connected:
+            self.set_sensors(self.engine.sensors)
+        if self.engine.profile_generated:
+            for graph in (self._graph_1, self._graph_2):
+                graph.setXRange(0, self.engine.total_period, padding=0)
+
+    def diagnostics_text(self):
+        """(DYNAMIC) Latency table, plus resource growth when soak diagnostics run"""
+        from metrics_lib import METRICS
+        text = METRICS.summary_table()
+        text += f"\n\nUpdate bus: {self.bus.pending} queued, {self.bus.dropped} sensor frames dropped"
+        if self.watchdog is not None:
+            text += "\n\n" + self.watchdog.summary()
+        if self.engine.setpoint_scheduler is not None:
+            text += "\n\n" + self.engine.setpoint_scheduler.summary()
+        if self.soak is not None:
+            text += "\n\n" + self.soak.summary()
+        return text
 
-        else:
-            self.create_dialogue_ok_box("Warning", "Profile not generated!")
+    def start_test(self):
+        """(STATIC) Starts the engine's test loop"""
+        self.end_replay()
+        try:
+            (self.runner or self.engine).start()
+        except EngineError as e:
+            self.create_dialogue_ok_box("Warning", str(e))
 
     def pause_test(self):
-        """(STATIC) Disables test active bool"""
-        # Disable test bool
-        self._test_active = False
-        self._fluid_timer.pause()
-        self._chamber_timer.pause()
-        print("Pausing Test...")
-        # Stops the pressure profile (does not reset pressure_cycle_count)
-        if hasattr(self, "test_thread") and self.test_thread.is_alive():
-            self.test_thread.join()  # Ensure the test thread stops cleanly
-        print("Test Paused")
+        """(STATIC) Pauses the engine's test loop"""
+        if not self.engine.profile_generated:
+            return
+        if self.watchdog is not None:
+            self.watchdog.cancel_resume()
+        (self.runner or self.engine).pause()
         self.create_dialogue_ok_box("Test Status", "Test Paused!")
     
-    def create_crash_file(self):
-        """"(STATIC) Create a file with status of test on crash as a backup"""
-        # Get crash timestamp and float(time)
-        crash_timestamp = self.get_timestamp()
-        crash_time = time.time()
-
-        # Create crash file
-        self.crash_filename = crash_timestamp + "_Crash"
-        with open(self.crash_filename, mode='w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(["pressure_cycle_count", "fluid_cycle_count", "fluid_cycle_remaining_seconds", "chamber_cycle_count", "chamber_cycle_remaining_seconds"])
-
-        # Fill crash file with remaining status
-        data = [self.pressure_cycle_count] + [self.fluid_cycle_count] + [(self.fluid_period*3600) - (crash_time - self.last_fluid_time)] + [self.chamber_cycle_count] + [(self.chamber_period*3600) - (crash_time - self.last_chamber_time)]
-        with open(self.crash_filename, mode='a', newline='') as file:  # Use 'a' (append mode)
-            writer = csv.writer(file)
-            writer.writerow(data)  # Write row with timestamp + sensor values
-
-        print(f"Crash file '{self.crash_filename}' created successfully.")
-
-    def create_log_file(self, name=""):
-        """(STATIC) Creates a CSV file with a timestamped header including sensor names."""
-        sensors = self._flex.get_sensor_list()  # Get list of sensor names
-        self.log_input_name = name
-        self.curr_filename = self.get_timestamp() + "_" + self.log_input_name
-        with open(self.curr_filename, mode='w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(["timestamp"] + ["pressure_cycle_count"] + sensors)  # Write header row once
-        print(f"Log file '{self.curr_filename}' created successfully.")
-
-    def update_log_file(self):
-        """(DYNAMIC) Updates CSV file with values"""
-        curr_data = [self.get_timestamp()] + [self.pressure_cycle_count] # Start with timestamp as first element
-
-        # Extract the latest values from each sensor and append them
-        for sen, data in self.sensor_data.items():
-            if data["values"]:  
-                curr_data.append(data["values"][-1])  # Get the most recent value
-
-        with open(self.curr_filename, mode='a', newline='') as file:  # Use 'a' (append mode)
-            writer = csv.writer(file)
-            writer.writerow(curr_data)  # Write row with timestamp + sensor values
-
-    def run_test_profile(self):
-        """(STATIC) Runs the test loop, cycling pumps on and off while test is active."""
-        self._cantroller.start()
-        if self.julabo_connected:
-            self._julabo.set_power_on()
-        self._fluid_timer.start()
-        self._chamber_timer.start()
-        
-        # Initial sequence to let test warm up
-        if self._test_active and self.pressure_cycle_count < self.pressure_num_cycles:
-            self._cantroller.set_pump_power(self.pump_power)
-            time.sleep(2)
-
-        while self._test_active and self.pressure_cycle_count < self.pressure_num_cycles:
-            self._cantroller.set_pump_power(self.pump_power)
-            time.sleep(4)
-
-            self._cantroller.set_pump_power(0)
-            time.sleep(1.27)  
-
-            #print(f"Julabo temp: {self._julabo.get_temperature()}") # Debug statement
-
-            self.pressure_cycle_count += 1
-            self.cycle_log_count += 1
-            print(f"Cycle Log #: {self.cycle_log_count}")
-
-            if self.cycle_log_count > 16394:
-                self.create_log_file(self.log_input_name)
-                self.cycle_log_count = 0
-                
-            self.pressure_cycle_count_label.setText(f"Pressure Cycle Count: {self.pressure_cycle_count}/{self.pressure_num_cycles}")
-
-        # PAUSING BEHAVIOUR
-        if self.pressure_cycle_count < self.pressure_num_cycles:
-            self._cantroller.stop()
-            self._fluid_timer.pause()
-            self._chamber_timer.pause()
-            if self.julabo_connected:
-                self._julabo.set_power_off()
-        # PUMP PROFILE FINISHED
-        else:
-            time.sleep(5) # Allow time for clean log finish
-            self._test_active = False
-            self.stop_test()
-            #self.create_dialogue_ok_box("Test Status", "Test is completed!")
-            print("Pressure Profile Finished! Congratulations, you finally made it!")
-
-    def set_julabo_temp(self):
-        """(DYNAMIC) Function to change temperature of fluid in julabo based on even/odd (called at end of timer)"""
-        self.last_fluid_time = time.time()
-        if self.julabo_connected:
-            if self.fluid_cycle_count % 2 == 0:
-                self._julabo.set_work_temperature(self.fluid_max_temp)
-                print(f"Set julabo temp to max_temp: {self.fluid_max_temp}")
-            else: 
-                self._julabo.set_work_temperature(self.fluid_min_temp)
-                print(f"Set julabo temp to min_temp: {self.fluid_min_temp} ")
-
-        self.fluid_cycle_count+=1
-        self.fluid_cycle_count_label.setText(f"Fluid Cycle Count: {self.fluid_cycle_count}/{self.fluid_num_cycles}")
-
-    def set_chamber_temp(self):
-        """(DYNAMIC) Filler for logging chamber cycle status"""
-        self.last_chamber_time = time.time()
-        self.chamber_cycle_count+=1
-        self.chamber_cycle_count_label.setText(f"Chamber Cycle Count: {self.chamber_cycle_count}/{self.chamber_num_cycles}")
-
-    def stop_test(self):
-        """(STATIC) Stop moving components of test"""
-        if self.julabo_connected:
-            self._fluid_timer.stop()
-            self._julabo.set_power_off()
-        if self.canbus_connected:
-            self._cantroller.stop()
-        self._chamber_timer.stop()
-
     def closeEvent(self, event):
-        """(STATIC) Override to cleanly stop the timer on window close"""
-        if self._test_active:
-            self.create_crash_file()
-            self.stop_test()
-        if self.julabo_connected:
-            self._julabo.close()
-        if self.canbus_connected:
-            self._cantroller.shutdown()
+        """(STATIC) Override to cleanly stop the test and devices on window close"""
+        if self._replay is not None:
+            self._replay.stop()
+        if self.soak is not None:
+            self.soak.stop()
+            print(self.soak.summary())
+        if self.watchdog is not None:
+            self.watchdog.stop()
+        if self.engine.setpoint_scheduler is not None:
+            self.engine.setpoint_scheduler.stop()
+            print(self.engine.setpoint_scheduler.summary())
+        self.engine.shutdown()
+        if self.runner is not None:
+            self.runner.shutdown()
         event.accept()  # Proceed with window closing
 
 
+def report_startup():
+    """ First event loop pass: the window is up and taking input """
+    startup_ms = (time.perf_counter() - LAUNCH_TIME) * 1000
+    print(f"Startup: interactive window after {startup_ms:.0f} ms")
+    if IMPORT_PROFILER is not None:
+        IMPORT_PROFILER.write_report(header=f"interactive window after {startup_ms:.0f} ms")
+
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
-    window = PumpControlApp()
+    if "--asyncio" in sys.argv or os.environ.get("RIG_ASYNCIO") == "1":
+        from async_devices_lib import install_qt_event_loop
+        from async_runner_lib import AsyncTestRunner
+        loop = install_qt_event_loop(app)
+        engine = TestEngine()
+        window = PumpControlApp(engine, AsyncTestRunner(engine, loop))
+    else:
+        loop = None
+        window = PumpControlApp()
     window.show()
+    QTimer.singleShot(0, report_startup)
 
-
+    if loop is not None and loop.is_qasync:
+        app.lastWindowClosed.connect(loop.stop)
+        with loop:
+            loop.run_forever()
+        sys.exit(0)
     sys.exit(app.exec())
     
    
\ No newline at end of file
@@ -5,8 +5,8 @@ a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
-    datas=[],
-    hiddenimports=['can', 'can.interfaces.vector'],
+    datas=[('profiles', 'profiles')],
+    hiddenimports=['can', 'can.interfaces.vector', 'serial', 'flexlogger_lib', 'can_controller_lib', 'julabo_lib'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
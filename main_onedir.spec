@@ -0,0 +1,49 @@
+# -*- mode: python ; coding: utf-8 -*-
+# One-dir build: the bundle is unpacked once at install time instead of into a temp
+# directory on every launch (onefile), and DLLs are not UPX compressed so nothing is
+# decompressed at load. Ship the whole dist/main folder and run dist/main/main.exe.
+
+
+a = Analysis(
+    ['main.py'],
+    pathex=[],
+    binaries=[],
+    datas=[('profiles', 'profiles')],
+    # Device libraries are imported lazily in TestEngine.connect_*, list them so they are bundled
+    hiddenimports=['can', 'can.interfaces.vector', 'serial', 'flexlogger_lib', 'can_controller_lib', 'julabo_lib'],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=['tkinter'],
+    noarchive=False,
+    optimize=0,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='main',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=False,
+    console=True,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+)
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='main',
+)
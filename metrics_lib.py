@@ -0,0 +1,259 @@
+import os
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram resolution: 2**SUB_BUCKET_BITS buckets per power of two, about 3% relative error
+SUB_BUCKET_BITS = 5
+_SUB = 1 << SUB_BUCKET_BITS
+_LINEAR = _SUB << 1
+
+
+def _bucket_index(value):
+    if value < _LINEAR:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return (shift + 1) * _SUB + (value >> shift) - _SUB
+
+
+def _bucket_value(index):
+    """ Middle of the range of values that land in bucket index """
+    if index < _LINEAR:
+        return index
+    shift = index // _SUB - 1
+    low = (index % _SUB + _SUB) << shift
+    return low + ((1 << shift) >> 1)
+
+
+class LatencyHistogram:
+    """ HDR-style log-linear histogram of durations in nanoseconds.
+
+    record() is one bucket increment, with no lock; under heavy contention a count can
+    occasionally be lost, which is fine for diagnostics.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * (_LINEAR + 64 * _SUB)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def record(self, nanoseconds):
+        index = _bucket_index(nanoseconds)
+        if index >= len(self.counts):
+            index = len(self.counts) - 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += nanoseconds
+        if nanoseconds > self.max:
+            self.max = nanoseconds
+        if self.min is None or nanoseconds < self.min:
+            self.min = nanoseconds
+
+    def percentile(self, q):
+        """ Value (ns) at or below which q percent of the recordings fall """
+        if not self.count:
+            return 0
+        target = max(1, round(self.count * q / 100))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return min(_bucket_value(index), self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self):
+        """ Milliseconds summary used by the exporters """
+        ms = 1e-6
+        return {"count": self.count, "mean_ms": self.mean * ms, "min_ms": (self.min or 0) * ms,
+                "p50_ms": self.percentile(50) * ms, "p90_ms": self.percentile(90) * ms,
+                "p99_ms": self.percentile(99) * ms, "p999_ms": self.percentile(99.9) * ms, "max_ms": self.max * ms}
+
+
+class MetricsRegistry:
+    """ Named latency histograms and counters for the rig's hot paths.
+
+    Call sites are never edited: instrument() swaps a method on one object for a timing wrapper,
+    so with metrics disabled nothing is wrapped and the hot paths cost exactly what they did.
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.histograms = {}
+        self.counters = {}
+        self.started = time.time()
+
+    def enable(self):
+        self.enabled = True
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms.setdefault(name, LatencyHistogram(name))
+        return histogram
+
+    def increment(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def instrument(self, obj, attr, name):
+        """ Time every call of obj.attr into histogram name, exceptions also count name_errors.
+        Does nothing when disabled or already instrumented; returns True if it wrapped the method """
+        if not self.enabled or obj is None:
+            return False
+        method = getattr(obj, attr)
+        if getattr(method, "_metrics_name", None) is not None:
+            return False
+        histogram = self.histogram(name)
+        perf_counter_ns = time.perf_counter_ns
+        registry = self
+
+        def timed(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return method(*args, **kwargs)
+            except Exception:
+                registry.increment(name + "_errors")
+                raise
+            finally:
+                histogram.record(perf_counter_ns() - start)
+
+        timed._metrics_name = name
+        timed.__wrapped__ = method
+        setattr(obj, attr, timed)
+        return True
+
+    def reset(self):
+        for histogram in self.histograms.values():
+            histogram.reset()
+        self.counters.clear()
+        self.started = time.time()
+
+    def snapshot(self):
+        return {"time": time.time(), "uptime_s": time.time() - self.started,
+                "histograms": {name: h.summary() for name, h in list(self.histograms.items())},
+                "counters": dict(self.counters)}
+
+    def summary_table(self):
+        """ Text table for the diagnostics panel """
+        lines = [f"{'metric':<20} {'count':>8} {'p50 ms':>9} {'p99 ms':>9} {'p99.9 ms':>9} {'max ms':>9}"]
+        for name, histogram in sorted(self.histograms.items()):
+            s = histogram.summary()
+            lines.append(f"{name:<20} {s['count']:>8} {s['p50_ms']:>9.3f} {s['p99_ms']:>9.3f} {s['p999_ms']:>9.3f} {s['max_ms']:>9.3f}")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{name:<20} {value:>8}")
+        return "\n".join(lines)
+
+    def prometheus_text(self):
+        """ Prometheus text exposition format, durations in seconds """
+        lines = []
+        for name, histogram in sorted(self.histograms.items()):
+            metric = f"rig_{name}_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            for q in (0.5, 0.9, 0.99, 0.999):
+                lines.append(f'{metric}{{quantile="{q}"}} {histogram.percentile(q * 100) / 1e9:.9f}')
+            lines.append(f"{metric}_sum {histogram.total / 1e9:.9f}")
+            lines.append(f"{metric}_count {histogram.count}")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE rig_{name}_total counter")
+            lines.append(f"rig_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry, RIG_METRICS=1 enables it at startup
+METRICS = MetricsRegistry(enabled=os.environ.get("RIG_METRICS") == "1")
+
+
+class MetricsFileWriter:
+    """ Appends a JSON snapshot of the registry to a file every interval seconds """
+    def __init__(self, registry, path, interval=60.0):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-file", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def write(self):
+        with open(self.path, "a") as file:
+            file.write(json.dumps(self.registry.snapshot()) + "\n")
+
+    def stop(self):
+        self._stop.set()
+        self.write()
+
+
+class MetricsServer:
+    """ Serves prometheus_text() at http://host:port/metrics """
+    def __init__(self, registry, port=9108, host="127.0.0.1"):
+        registry_ref = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry_ref.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # keep scrapes out of the console
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        print(f"Metrics at http://127.0.0.1:{self.port}/metrics")
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == "__main__":
+    import random
+
+    class Device:
+        def read(self):
+            time.sleep(random.choice((0.0005, 0.001, 0.002, 0.02)))
+
+    registry = MetricsRegistry(enabled=True)
+    device = Device()
+    registry.instrument(device, "read", "device_read")
+    for _ in range(500):
+        device.read()
+    print(registry.summary_table())
+
+    # Cost of one instrumented call of an empty method
+    class Empty:
+        def call(self):
+            pass
+
+    plain, timed = Empty(), Empty()
+    registry.instrument(timed, "call", "empty_call")
+    for obj, label in ((plain, "plain"), (timed, "instrumented")):
+        start = time.perf_counter()
+        for _ in range(200000):
+            obj.call()
+        print(f"{label}: {(time.perf_counter() - start) / 200000 * 1e9:.0f} ns per call")
+    print(registry.prometheus_text().splitlines()[0:7])
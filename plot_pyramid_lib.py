@@ -0,0 +1,164 @@
+import numpy as np
+
+
+class _PyramidLevel:
+    """ One level of detail: bucket start times with the min/max of every bucket """
+    def __init__(self, capacity, factor):
+        self.capacity = capacity
+        self.factor = factor
+        self.t = np.empty(capacity, dtype=np.float64)
+        self.lo = np.empty(capacity, dtype=np.float32)
+        self.hi = np.empty(capacity, dtype=np.float32)
+        self.n = 0
+
+        # Partial bucket being built for the next (coarser) level
+        self.acc_count = 0
+        self.acc_t = 0.0
+        self.acc_lo = 0.0
+        self.acc_hi = 0.0
+
+    def push(self, t, lo, hi):
+        """ Store a bucket, dropping the oldest half of the level when it is full """
+        if self.n == self.capacity:
+            half = self.capacity // 2
+            keep = self.n - half
+            self.t[:keep] = self.t[half:self.n]
+            self.lo[:keep] = self.lo[half:self.n]
+            self.hi[:keep] = self.hi[half:self.n]
+            self.n = keep
+        self.t[self.n] = t
+        self.lo[self.n] = lo
+        self.hi[self.n] = hi
+        self.n += 1
+
+    def accumulate(self, t, lo, hi):
+        """ Fold a bucket into the partial parent bucket, returns True once it is complete """
+        if self.acc_count == 0:
+            self.acc_t = t
+            self.acc_lo = lo
+            self.acc_hi = hi
+        else:
+            if lo < self.acc_lo:
+                self.acc_lo = lo
+            if hi > self.acc_hi:
+                self.acc_hi = hi
+        self.acc_count += 1
+        return self.acc_count == self.factor
+
+
+class MinMaxPyramid:
+    """ Incrementally built min/max decimation pyramid for a single channel.
+
+    Level 0 holds raw samples, level k holds buckets of factor**k samples. Every level keeps
+    at most level_capacity buckets (oldest dropped first), so the finer levels cover the recent
+    past at full detail while the coarse levels always cover the whole test. Appending is O(1)
+    amortized and memory is bounded by roughly levels * level_capacity.
+    """
+    def __init__(self, factor=4, level_capacity=4096):
+        if factor < 2:
+            raise ValueError("factor must be at least 2")
+        self.factor = factor
+        self.level_capacity = level_capacity
+        self.levels = [_PyramidLevel(level_capacity, factor)]
+        self.count = 0
+        self.t_first = 0.0
+
+    def clear(self):
+        """ Drop all stored samples """
+        self.levels = [_PyramidLevel(self.level_capacity, self.factor)]
+        self.count = 0
+        self.t_first = 0.0
+
+    def append(self, t, value):
+        """ Add a sample, t must be non-decreasing """
+        value = float(value)
+        if self.count == 0:
+            self.t_first = t
+        self.count += 1
+        k = 0
+        lo = hi = value
+        while True:
+            level = self.levels[k]
+            level.push(t, lo, hi)
+            if not level.accumulate(t, lo, hi):
+                break
+            # Bucket for level k + 1 is complete, hand it up
+            t, lo, hi = level.acc_t, level.acc_lo, level.acc_hi
+            level.acc_count = 0
+            k += 1
+            if k == len(self.levels):
+                self.levels.append(_PyramidLevel(self.level_capacity, self.factor))
+
+    def choose_level(self, x_min, x_max, max_points):
+        """ Return the finest level that covers x_min and has at most max_points buckets in range """
+        x_start = max(x_min, self.t_first)
+        for k, level in enumerate(self.levels):
+            if level.n == 0:
+                continue
+            t = level.t[:level.n]
+            if t[0] > x_start and k < len(self.levels) - 1 and self.levels[k + 1].n > 0:
+                continue  # Older data was dropped from this level, go coarser
+            i0 = max(np.searchsorted(t, x_min, side='right') - 1, 0)
+            i1 = np.searchsorted(t, x_max, side='right')
+            if i1 - i0 <= max_points:
+                return k
+        return len(self.levels) - 1
+
+    def view(self, x_min, x_max, max_points=2000):
+        """ Return (x, y) arrays for the visible range at the matching level of detail """
+        if self.count == 0:
+            return np.empty(0), np.empty(0)
+
+        k = self.choose_level(x_min, x_max, max_points)
+        level = self.levels[k]
+        t = level.t[:level.n]
+        i0 = max(np.searchsorted(t, x_min, side='right') - 1, 0)
+        i1 = min(np.searchsorted(t, x_max, side='right') + 1, level.n)
+
+        # Samples not yet folded into level k live in the partial buckets of the finer levels
+        tail_t = []
+        tail_lo = []
+        tail_hi = []
+        if i1 == level.n:
+            for j in range(k - 1, -1, -1):
+                finer = self.levels[j]
+                if finer.acc_count:
+                    tail_t.append(finer.acc_t)
+                    tail_lo.append(finer.acc_lo)
+                    tail_hi.append(finer.acc_hi)
+
+        if k == 0:
+            x = np.concatenate((t[i0:i1], tail_t))
+            y = np.concatenate((level.lo[i0:i1], tail_lo)).astype(np.float64)
+            return x, y
+
+        # Each bucket is drawn as a vertical min-max segment
+        bucket_t = np.concatenate((t[i0:i1], tail_t))
+        x = np.repeat(bucket_t, 2)
+        y = np.empty(x.size, dtype=np.float64)
+        y[0::2] = np.concatenate((level.lo[i0:i1], tail_lo))
+        y[1::2] = np.concatenate((level.hi[i0:i1], tail_hi))
+        return x, y
+
+    def nbytes(self):
+        """ Approximate memory used by the stored levels """
+        return sum(level.t.nbytes + level.lo.nbytes + level.hi.nbytes for level in self.levels)
+
+
+if __name__ == "__main__":
+    import time
+
+    # 648 hours sampled at 1 Hz
+    pyramid = MinMaxPyramid()
+    total_hours = 648
+    samples = total_hours * 3600
+    start = time.perf_counter()
+    for i in range(samples):
+        hour = i / 3600
+        pyramid.append(hour, 35 * ((i // 5) % 2) + np.sin(hour))
+    print(f"Appended {samples} samples in {time.perf_counter() - start:.1f}s, "
+          f"{len(pyramid.levels)} levels, {pyramid.nbytes() / 1e6:.1f} MB")
+
+    for x_min, x_max in [(0, total_hours), (100, 110), (647.9, 648)]:
+        x, y = pyramid.view(x_min, x_max)
+        print(f"View {x_min}-{x_max} h: {len(x)} points")
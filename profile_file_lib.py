@@ -0,0 +1,285 @@
+import os
+import sys
+import json
+import hashlib
+import numpy as np
+from profile_lib import (RAMP, Step, Ramp, Soak, Repeat, CompiledProfile, compile_profile,
+                         square_wave, pressure_cycles)
+from anomaly_lib import DEFAULT_RULES, rules_from_config
+
+# Bump when the compiled schedule layout changes so stale cache files are ignored
+SCHEDULE_VERSION = 1
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))  # inside a onefile bundle: the temporary folder it unpacks to
+PROFILE_DIR = os.path.join(BASE_DIR, "profiles")
+DEFAULT_PROFILE = os.path.join(PROFILE_DIR, "cyclic_pressure_648h.json")
+# Compiled schedules must outlive the process, a bundled exe keeps them next to itself
+CACHE_DIR = os.path.join(os.path.dirname(sys.executable) if getattr(sys, "frozen", False) else BASE_DIR, ".profile_cache")
+
+# Channel ids used in the merged event schedule
+FLUID = 0
+CHAMBER = 1
+PRESSURE = 2
+CHANNELS = {"fluid": FLUID, "chamber": CHAMBER, "pressure": PRESSURE}
+
+
+class TestProfileError(ValueError):
+    """ Raised when a test profile file is missing fields or has invalid values """
+
+
+class TestProfile:
+    """ Validated test definition loaded from a JSON or TOML profile file.
+
+    Temperatures are in C, periods in hours, pressure timing in seconds. fluid and chamber take
+    either period/min_temp/max_temp (square wave) or an explicit "segments" list.
+    """
+    def __init__(self, data, path=None):
+        self.data = data
+        self.path = path
+        self.validate()
+
+    def validate(self):
+        """ Check required fields and ranges, raises TestProfileError """
+        data = self.data
+        self.name = str(data.get("name", os.path.basename(self.path or "profile")))
+        self.total_period = self._number(data, "total_period", minimum=0, exclusive=True)
+
+        for key in ("fluid", "chamber"):
+            section = self._section(data, key)
+            if "segments" in section:
+                if not isinstance(section["segments"], list) or not section["segments"]:
+                    raise TestProfileError(f"'{key}.segments' must be a non-empty list")
+                try:
+                    compiled = compile_profile(_build_segments(section["segments"], key))
+                except TestProfileError:
+                    raise
+                except (TypeError, ValueError) as e:
+                    raise TestProfileError(f"'{key}.segments': {e}")
+                if key == "fluid" and (compiled.kinds == RAMP).any():
+                    # The Julabo gets one setpoint per interval, a ramp would run as a step to its end value
+                    raise TestProfileError("'fluid.segments': ramps are not supported on the fluid (Julabo) channel yet, use step")
+            else:
+                self._number(section, "period", key, minimum=0, exclusive=True)
+                low = self._number(section, "min_temp", key)
+                high = self._number(section, "max_temp", key)
+                if high <= low:
+                    raise TestProfileError(f"'{key}.max_temp' must be above '{key}.min_temp'")
+
+        pressure = self._section(data, "pressure")
+        num_cycles = self._number(pressure, "num_cycles", "pressure", minimum=1)
+        if int(num_cycles) != num_cycles:
+            raise TestProfileError("'pressure.num_cycles' must be a whole number")
+        if self._number(pressure, "max_psi", "pressure") < self._number(pressure, "min_psi", "pressure"):
+            raise TestProfileError("'pressure.max_psi' must not be below 'pressure.min_psi'")
+        self._number(pressure, "on_seconds", "pressure", minimum=0, exclusive=True)
+        self._number(pressure, "off_seconds", "pressure", minimum=0, exclusive=True)
+
+        pump = self._section(data, "pump")
+        power = self._number(pump, "power", "pump", minimum=0)
+        if power > 100:
+            raise TestProfileError("'pump.power' must be a percentage (0-100)")
+        self._number(pump, "warmup_seconds", "pump", minimum=0)
+
+        if "rules" in data:
+            if not isinstance(data["rules"], list):
+                raise TestProfileError("'rules' must be a list")
+            try:
+                rules_from_config(data["rules"])
+            except ValueError as e:
+                raise TestProfileError(str(e))
+
+    def _section(self, data, key):
+        if not isinstance(data.get(key), dict):
+            raise TestProfileError(f"Missing section '{key}'")
+        return data[key]
+
+    def _number(self, data, key, section=None, minimum=None, exclusive=False):
+        name = f"{section}.{key}" if section else key
+        value = data.get(key)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise TestProfileError(f"'{name}' must be a number")
+        if minimum is not None and (value < minimum or (exclusive and value == minimum)):
+            raise TestProfileError(f"'{name}' must be {'above' if exclusive else 'at least'} {minimum}")
+        return value
+
+    def content_hash(self):
+        """ Hash of the canonical profile content, used as the schedule cache key """
+        canonical = json.dumps({"version": SCHEDULE_VERSION, "profile": self.data}, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def segments(self, key):
+        """ Segment list (profile_lib) for 'fluid', 'chamber' or 'pressure' """
+        section = self.data[key]
+        if key == "pressure":
+            return pressure_cycles(section["on_seconds"], section["off_seconds"],
+                                   section["max_psi"], section["min_psi"], int(section["num_cycles"]))
+        if "segments" in section:
+            return _build_segments(section["segments"], key)
+        return square_wave(section["period"], section["min_temp"], section["max_temp"], self.total_period)
+
+    def rules_config(self):
+        """ Anomaly rule definitions (anomaly_lib), the built-in pressure drop check if none are given """
+        return self.data.get("rules", DEFAULT_RULES)
+
+    def apply_to(self, target):
+        """ Copy the profile values onto an object using the PumpControlApp attribute names """
+        data = self.data
+        target.total_period = data["total_period"]
+        for key in ("fluid", "chamber"):
+            section = data[key]
+            if "segments" not in section:
+                setattr(target, f"{key}_period", section["period"])
+                setattr(target, f"{key}_min_temp", section["min_temp"])
+                setattr(target, f"{key}_max_temp", section["max_temp"])
+        target.pressure_num_cycles = int(data["pressure"]["num_cycles"])
+        target.pressure_min_psi = data["pressure"]["min_psi"]
+        target.pressure_max_psi = data["pressure"]["max_psi"]
+        target.pressure_on_time = data["pressure"]["on_seconds"]
+        target.pressure_off_time = data["pressure"]["off_seconds"]
+        target.pump_power = data["pump"]["power"]
+        target.pump_warmup_time = data["pump"]["warmup_seconds"]
+
+
+def _duration(entry, where):
+    if "hours" in entry:
+        return float(entry["hours"]) * 3600
+    if "seconds" in entry:
+        return float(entry["seconds"])
+    raise TestProfileError(f"{where}: segment needs 'hours' or 'seconds'")
+
+
+def _build_segments(entries, where):
+    """ Translate profile file segment entries into profile_lib segments """
+    segments = []
+    for i, entry in enumerate(entries):
+        label = f"{where}.segments[{i}]"
+        if not isinstance(entry, dict):
+            raise TestProfileError(f"{label} must be a table/object")
+        if "repeat" in entry:
+            if not isinstance(entry["repeat"], int) or entry["repeat"] < 1:
+                raise TestProfileError(f"{label}.repeat must be a positive whole number")
+            segments.append(Repeat(_build_segments(entry.get("segments", []), label), entry["repeat"]))
+        elif "step" in entry:
+            segments.append(Step(float(entry["step"]), _duration(entry, label)))
+        elif "ramp" in entry:
+            segments.append(Ramp(float(entry["ramp"]), _duration(entry, label)))
+        elif "soak" in entry:
+            segments.append(Soak(_duration(entry, label)))
+        else:
+            raise TestProfileError(f"{label} must be one of step, ramp, soak or repeat")
+    return segments
+
+
+def load_test_profile(path):
+    """ Load and validate a .json or .toml test profile """
+    try:
+        if path.lower().endswith(".toml"):
+            try:
+                import tomllib
+            except ImportError:
+                raise TestProfileError("TOML profiles need Python 3.11+, use JSON instead")
+            with open(path, "rb") as file:
+                data = tomllib.load(file)
+        else:
+            with open(path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+    except OSError as e:
+        raise TestProfileError(f"Could not read profile '{path}': {e}")
+    except ValueError as e:
+        if isinstance(e, TestProfileError):
+            raise
+        raise TestProfileError(f"Could not parse profile '{path}': {e}")
+
+    if not isinstance(data, dict):
+        raise TestProfileError("Profile must be a JSON object / TOML table")
+    return TestProfile(data, path)
+
+
+class TestSchedule:
+    """ Compiled profiles for every channel plus the merged, time-sorted event list """
+    def __init__(self, profiles, times, channels, values, indices, content_hash):
+        self.profiles = profiles
+        self.times = times
+        self.channels = channels
+        self.values = values
+        self.indices = indices
+        self.content_hash = content_hash
+
+    def __len__(self):
+        return self.times.size
+
+    def events_between(self, t_start, t_end):
+        """ (times, channels, values, indices) of events with t_start <= time < t_end """
+        i0 = np.searchsorted(self.times, t_start, side='left')
+        i1 = np.searchsorted(self.times, t_end, side='left')
+        return self.times[i0:i1], self.channels[i0:i1], self.values[i0:i1], self.indices[i0:i1]
+
+    def save(self, path):
+        """ Atomically write the schedule to an .npz file """
+        arrays = {"times": self.times, "channels": self.channels, "values": self.values, "indices": self.indices}
+        for key, profile in self.profiles.items():
+            arrays[f"{key}_kinds"] = profile.kinds
+            arrays[f"{key}_starts"] = profile.starts
+            arrays[f"{key}_ends"] = profile.ends
+            arrays[f"{key}_start_values"] = profile.start_values
+            arrays[f"{key}_end_values"] = profile.end_values
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            np.savez(file, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, content_hash):
+        with np.load(path) as arrays:
+            profiles = {key: CompiledProfile(arrays[f"{key}_kinds"], arrays[f"{key}_starts"], arrays[f"{key}_ends"],
+                                             arrays[f"{key}_start_values"], arrays[f"{key}_end_values"])
+                        for key in CHANNELS}
+            return cls(profiles, arrays["times"], arrays["channels"], arrays["values"], arrays["indices"], content_hash)
+
+
+def compile_schedule(profile):
+    """ Compile every channel of a TestProfile and merge their interval starts into one event list """
+    profiles = {key: compile_profile(profile.segments(key)) for key in CHANNELS}
+    times = np.concatenate([p.starts for p in profiles.values()])
+    channels = np.concatenate([np.full(len(p), CHANNELS[key], dtype=np.int8) for key, p in profiles.items()])
+    values = np.concatenate([p.end_values for p in profiles.values()])
+    indices = np.concatenate([np.arange(len(p), dtype=np.int32) for p in profiles.values()])
+    order = np.argsort(times, kind='stable')
+    return TestSchedule(profiles, times[order], channels[order], values[order], indices[order], profile.content_hash())
+
+
+def load_schedule(profile, cache_dir=CACHE_DIR):
+    """ Return the compiled schedule for a profile, compiling and caching it on first use """
+    content_hash = profile.content_hash()
+    cache_path = os.path.join(cache_dir, content_hash + ".npz")
+    if os.path.exists(cache_path):
+        try:
+            return TestSchedule.load(cache_path, content_hash)
+        except (OSError, KeyError, ValueError):
+            print(f"Warning: ignoring unreadable schedule cache '{cache_path}'")
+
+    schedule = compile_schedule(profile)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        schedule.save(cache_path)
+    except OSError as e:
+        print(f"Warning: could not cache schedule: {e}")
+    return schedule
+
+
+if __name__ == "__main__":
+    import time
+
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PROFILE
+    try:
+        test_profile = load_test_profile(path)
+    except TestProfileError as e:
+        print(f"Invalid profile: {e}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    test_schedule = load_schedule(test_profile)
+    print(f"Profile '{test_profile.name}' ({test_profile.content_hash()[:12]}) ready in {(time.perf_counter() - start) * 1000:.1f} ms")
+    for key, compiled in test_schedule.profiles.items():
+        print(f"  {key}: {len(compiled)} intervals over {compiled.duration / 3600:.2f} h")
+    print(f"  {len(test_schedule)} scheduled events")
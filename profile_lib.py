@@ -0,0 +1,203 @@
+import numpy as np
+
+# Interval kinds used in the compiled arrays
+STEP = 0
+RAMP = 1
+SOAK = 2
+
+
+class Step:
+    """ Jump to value and hold it for duration seconds """
+    kind = STEP
+
+    def __init__(self, value, duration):
+        self.value = value
+        self.duration = duration
+
+
+class Ramp:
+    """ Move linearly from the current value to value over duration seconds """
+    kind = RAMP
+
+    def __init__(self, value, duration):
+        self.value = value
+        self.duration = duration
+
+
+class Soak:
+    """ Hold the current value for duration seconds """
+    kind = SOAK
+
+    def __init__(self, duration):
+        self.value = np.nan
+        self.duration = duration
+
+
+class Repeat:
+    """ Repeat a sequence of segments count times """
+    def __init__(self, segments, count):
+        self.segments = list(segments)
+        self.count = count
+
+
+class ProfileState:
+    """ State of a compiled profile at one point in time """
+    def __init__(self, index, value, start, end):
+        self.index = index      # Interval number, counts up by one for every step/ramp/soak
+        self.value = value
+        self.start = start
+        self.end = end
+        self.remaining = 0.0
+
+    def __repr__(self):
+        return f"ProfileState(index={self.index}, value={self.value:.3f}, remaining={self.remaining:.1f}s)"
+
+
+def _flatten(segments):
+    """ Turn a (possibly nested) segment list into kind/target/duration arrays without per-interval loops """
+    kinds = []
+    targets = []
+    durations = []
+    for seg in segments:
+        if isinstance(seg, Repeat):
+            if seg.count < 1:
+                raise ValueError("Repeat count must be at least 1")
+            k, v, d = _flatten(seg.segments)
+            kinds.append(np.tile(k, seg.count))
+            targets.append(np.tile(v, seg.count))
+            durations.append(np.tile(d, seg.count))
+        else:
+            if seg.duration <= 0:
+                raise ValueError(f"{type(seg).__name__} duration must be positive, got {seg.duration}")
+            kinds.append(np.array([seg.kind], dtype=np.int8))
+            targets.append(np.array([seg.value], dtype=np.float64))
+            durations.append(np.array([seg.duration], dtype=np.float64))
+    if not kinds:
+        return np.empty(0, dtype=np.int8), np.empty(0), np.empty(0)
+    return np.concatenate(kinds), np.concatenate(targets), np.concatenate(durations)
+
+
+def compile_profile(segments, initial_value=0.0):
+    """ Compile a segment sequence into a CompiledProfile """
+    kinds, targets, durations = _flatten(segments)
+    if kinds.size == 0:
+        raise ValueError("Profile has no segments")
+
+    # Value at the end of each interval: the target for steps/ramps, carried forward through soaks
+    end_values = np.where(kinds == SOAK, np.nan, targets)
+    known = ~np.isnan(end_values)
+    last_known = np.maximum.accumulate(np.where(known, np.arange(kinds.size), -1))
+    end_values = np.where(last_known >= 0, end_values[np.maximum(last_known, 0)], initial_value)
+
+    # Value at the start of each interval: steps jump straight to their target
+    previous_end = np.concatenate(([initial_value], end_values[:-1]))
+    start_values = np.where(kinds == STEP, end_values, previous_end)
+
+    ends = np.cumsum(durations)
+    starts = ends - durations
+    return CompiledProfile(kinds, starts, ends, start_values, end_values)
+
+
+class CompiledProfile:
+    """ Compact interval table for a profile, times in seconds from test start """
+    def __init__(self, kinds, starts, ends, start_values, end_values):
+        self.kinds = kinds
+        self.starts = starts
+        self.ends = ends
+        self.start_values = start_values
+        self.end_values = end_values
+
+    def __len__(self):
+        return self.starts.size
+
+    @property
+    def duration(self):
+        return float(self.ends[-1])
+
+    @property
+    def num_cycles(self):
+        """ Number of transitions between intervals """
+        return len(self) - 1
+
+    def index_at(self, t):
+        """ Interval index active at time t (O(log n)), clamped to the profile """
+        i = int(np.searchsorted(self.starts, t, side='right')) - 1
+        return min(max(i, 0), len(self) - 1)
+
+    def value_at(self, t):
+        """ Profile value at time t, vectorized over arrays of t """
+        t = np.asarray(t, dtype=np.float64)
+        i = np.clip(np.searchsorted(self.starts, t, side='right') - 1, 0, len(self) - 1)
+        span = self.ends[i] - self.starts[i]
+        frac = np.clip((t - self.starts[i]) / span, 0.0, 1.0)
+        return self.start_values[i] + (self.end_values[i] - self.start_values[i]) * frac
+
+    def state_at(self, t):
+        """ Full state at time t: interval index, value and seconds remaining in the interval """
+        i = self.index_at(t)
+        state = ProfileState(i, float(self.value_at(t)), float(self.starts[i]), float(self.ends[i]))
+        state.remaining = max(state.end - t, 0.0)
+        return state
+
+    def next_change(self, t):
+        """ Time of the next interval boundary after t, None once the profile is done """
+        i = int(np.searchsorted(self.starts, t, side='right'))
+        return float(self.starts[i]) if i < len(self) else None
+
+    def interval_value(self, index):
+        """ Target value of an interval, e.g. the setpoint to command when interval index starts """
+        return float(self.end_values[min(int(index), len(self) - 1)])
+
+    def interval_duration(self, index):
+        """ Length in seconds of an interval, clamped to the profile like interval_value """
+        i = min(max(int(index), 0), len(self) - 1)
+        return float(self.ends[i] - self.starts[i])
+
+    def intervals_before(self, t):
+        """ Number of intervals that start before time t, the intervals a test of length t runs through """
+        return int(np.searchsorted(self.starts, t, side='left'))
+
+    def elapsed_at(self, index, remaining):
+        """ Seconds from test start given an interval count and the time left in it (for resuming) """
+        i = min(max(int(index) - 1, 0), len(self) - 1)
+        return float(self.ends[i] - remaining)
+
+    def plot_arrays(self, time_scale=1 / 3600):
+        """ Polyline (x, y) through every interval, x scaled to hours by default """
+        x = np.empty(2 * len(self))
+        y = np.empty(2 * len(self))
+        x[0::2] = self.starts * time_scale
+        x[1::2] = self.ends * time_scale
+        y[0::2] = self.start_values
+        y[1::2] = self.end_values
+        return x, y
+
+
+def square_wave(period, low, high, total, time_scale=3600):
+    """ Alternating high/low steps of one period each covering total (same units as period, hours by default) """
+    if period <= 0 or high <= low:
+        raise ValueError("Entry Error")
+    intervals = int(total / period) + 1
+    segments = [Repeat([Step(high, period * time_scale), Step(low, period * time_scale)], intervals // 2)] if intervals > 1 else []
+    if intervals % 2:
+        segments.append(Step(high, period * time_scale))
+    return segments
+
+
+def pressure_cycles(on_seconds, off_seconds, high, low, count):
+    """ count pump on/off pressure cycles """
+    return [Repeat([Step(high, on_seconds), Step(low, off_seconds)], count)]
+
+
+if __name__ == "__main__":
+    import time
+
+    start = time.perf_counter()
+    fluid = compile_profile(square_wave(12, -20, 40, 648))
+    pressure = compile_profile(pressure_cycles(4, 1.27, 35, 0, 444000))
+    mixed = compile_profile([Step(20, 600), Ramp(60, 3600), Soak(7200), Ramp(-20, 3600), Soak(7200)])
+    print(f"Compiled in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    print(f"Fluid: {len(fluid)} intervals, {fluid.num_cycles} cycles, state at 13h {fluid.state_at(13 * 3600)}")
+    print(f"Pressure: {len(pressure)} intervals, ends at {pressure.duration / 3600:.1f}h")
+    print(f"Mixed at 2000s: {mixed.state_at(2000)}, next change {mixed.next_change(2000)}")
@@ -0,0 +1,157 @@
+import os
+import csv
+import time
+import argparse
+import itertools
+from datetime import datetime
+from clock_lib import SYSTEM_CLOCK
+
+# Format of the timestamp column written by TestEngine.update_log_file
+LOG_TIME_FORMAT = "%Y-%m-%d_%H-%M-%S"
+
+
+class LogReplayError(Exception):
+    """ Raised when a file is not a test log or the logs do not share the same channels """
+
+
+def read_log_header(path):
+    """ Sensor names of a log file (the columns after timestamp and pressure_cycle_count) """
+    with open(path, newline="") as file:
+        header = next(csv.reader(file), None)
+    if not header or header[:2] != ["timestamp", "pressure_cycle_count"]:
+        raise LogReplayError(f"'{path}' is not a test log file")
+    return header[2:]
+
+
+def read_log_chunks(path, chunk_rows=2000):
+    """ Stream a log file as lists of (unix time, pressure cycle count, [values]) rows, chunk_rows at a time.
+    Rows that were cut short or hold non-numeric values are skipped """
+    sensors = read_log_header(path)
+    width = len(sensors) + 2
+    last_text, last_time = None, None
+    with open(path, newline="") as file:
+        reader = csv.reader(file)
+        next(reader)
+        while True:
+            chunk = []
+            for row in itertools.islice(reader, chunk_rows):
+                if len(row) != width:
+                    continue
+                try:
+                    if row[0] != last_text:  # rows come several per second, parse each timestamp once
+                        last_time = datetime.strptime(row[0], LOG_TIME_FORMAT).timestamp()
+                        last_text = row[0]
+                    chunk.append((last_time, int(row[1]), [float(v) for v in row[2:]]))
+                except ValueError:
+                    continue
+            if not chunk:
+                return
+            yield chunk
+
+
+class LogReplay:
+    """ Plays logs written by TestEngine.update_log_file back through engine.feed_sensor_values, so the GUI
+    plots and the safety rules (inlet pressure drop etc.) see them as if they were live.
+
+    speed is log seconds per second (1 to 1000), None replays as fast as possible. Gaps longer than
+    max_gap log seconds (test paused, rotated files) are shortened to max_gap. throttle() is asked once
+    per chunk and holds the replay while it returns True, so an unlimited replay can wait for a consumer
+    that falls behind. Runs on its own thread after start(), or on the caller's with run().
+    """
+    def __init__(self, engine, paths, speed=1.0, chunk_rows=2000, max_gap=60.0, throttle=None, clock=None):
+        if not paths:
+            raise LogReplayError("No log files to replay")
+        self.engine = engine
+        self.paths = sorted(paths)  # names start with the creation timestamp
+        self.speed = speed
+        self.chunk_rows = chunk_rows
+        self.max_gap = max_gap
+        self.throttle = throttle
+        self.clock = clock if clock is not None else SYSTEM_CLOCK
+        self.sensors = read_log_header(self.paths[0])
+        for path in self.paths[1:]:
+            if read_log_header(path) != self.sensors:
+                raise LogReplayError(f"'{path}' has different channels than '{self.paths[0]}'")
+        self.rows = 0
+        self.log_seconds = 0.0  # log time replayed so far, gaps shortened
+        self.pressure_cycle_count = 0
+        self.alarms = []
+        self._stopped = False
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        self._thread = self.clock.thread(self.run, name="log-replay")
+        self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        if self._thread is not None:
+            self.clock.join(self._thread)
+
+    def _on_event(self, event, data):
+        if event == "alarm":
+            self.alarms.append(data["alarm"])
+
+    def run(self):
+        """ Replay every file in order, returns the number of rows played """
+        engine = self.engine
+        engine._anomaly.bind(self.sensors)
+        engine.add_listener(self._on_event)
+        started = self.clock.monotonic()
+        last_time = None
+        try:
+            for path in self.paths:
+                print(f"Replaying '{path}'")
+                for chunk in read_log_chunks(path, self.chunk_rows):
+                    while self.throttle is not None and self.throttle() and not self._stopped:
+                        self.clock.sleep(0.01)
+                    for log_time, cycle, values in chunk:
+                        if self._stopped:
+                            return self.rows
+                        if last_time is not None:
+                            self.log_seconds += min(max(log_time - last_time, 0.0), self.max_gap)
+                        last_time = log_time
+                        if self.speed:
+                            delay = started + self.log_seconds / self.speed - self.clock.monotonic()
+                            if delay > 0:
+                                self.clock.sleep(delay)
+                        self.pressure_cycle_count = cycle
+                        self.rows += 1
+                        engine.feed_sensor_values(dict(zip(self.sensors, values)), self.log_seconds / 3600, log_time)
+        finally:
+            engine.listeners.remove(self._on_event)
+            if engine.flexlogger_connected:
+                engine._anomaly.bind(engine.sensors)  # back to the live channels
+        print(f"Replay done: {self.rows} rows, {self.log_seconds / 3600:.2f} h of log, {len(self.alarms)} alarms")
+        return self.rows
+
+
+if __name__ == "__main__":
+    from engine_lib import TestEngine
+    from metrics_lib import METRICS
+
+    parser = argparse.ArgumentParser(description="Replay test logs through the safety rules, e.g. to profile them")
+    parser.add_argument("logs", nargs="+", help="log files written by a test, played in name order")
+    parser.add_argument("--speed", type=float, default=0.0, help="log seconds per second, 0 for as fast as possible")
+    parser.add_argument("--chunk-rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    METRICS.enable()
+    engine = TestEngine(journal_path=os.devnull)
+    METRICS.instrument(engine, "feed_sensor_values", "replay_feed")
+    try:
+        replay = LogReplay(engine, args.logs, speed=args.speed or None, chunk_rows=args.chunk_rows)
+    except (OSError, LogReplayError) as e:
+        print(f"Error: {e}")
+        raise SystemExit(1)
+    start = time.perf_counter()
+    rows = replay.run()
+    seconds = time.perf_counter() - start
+    print(f"{rows / max(seconds, 1e-9):.0f} rows/s, {replay.log_seconds / max(seconds, 1e-9):.0f}x real time")
+    for alarm in replay.alarms:
+        print(f"  {alarm.action}: {alarm}")
+    print(METRICS.summary_table())
@@ -0,0 +1,285 @@
+import json
+import math
+import numpy as np
+from multiprocessing import shared_memory
+
+MAGIC = 0x52494E47  # "RING"
+HEADER_SIZE = 4096  # int64 fields followed by the channel names as JSON
+_FIELDS = 5  # magic, capacity, channel count, write sequence, claimed sequence
+_WRITE_SEQ = 3
+_CLAIM_SEQ = 4
+
+
+def _open_shared_memory(name, create=False, size=0):
+    """ SharedMemory without the resource tracker unlinking segments this process only attached to """
+    try:
+        return shared_memory.SharedMemory(name=name, create=create, size=size, track=create)
+    except TypeError:  # track= needs Python 3.13
+        return shared_memory.SharedMemory(name=name, create=create, size=size)
+
+
+class SampleBlock:
+    """ Rows read from a ring: sequence number of the first row, times, values (rows x channels) and
+    how many rows were lost because the reader fell more than a ring behind """
+    def __init__(self, start, t, values, lost):
+        self.start = start
+        self.t = t
+        self.values = values
+        self.lost = lost
+
+    def __len__(self):
+        return len(self.t)
+
+
+class SampleRing:
+    """ Single-writer, many-reader ring of samples in shared memory.
+
+    Row seq lives in slot seq % capacity. The writer first claims the rows it is about to overwrite,
+    fills them, then bumps the shared write sequence; a reader that copies rows and then sees the
+    claim has not lapped them knows they were intact. Every process maps the same buffer, readers get NumPy views without copying.
+    Create in the acquisition process, attach by name everywhere else.
+    """
+    def __init__(self, shm, owner):
+        self._shm = shm
+        self.owner = owner
+        self._header = np.ndarray((_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        if self._header[0] != MAGIC:
+            raise ValueError(f"Shared memory '{shm.name}' is not a sample ring")
+        self.capacity = int(self._header[1])
+        width = int(self._header[2])
+        names_len = HEADER_SIZE - _FIELDS * 8
+        names = bytes(shm.buf[_FIELDS * 8:_FIELDS * 8 + names_len]).rstrip(b"\0")
+        self.channels = json.loads(names.decode("utf-8"))
+        self.t = np.ndarray((self.capacity,), dtype=np.float64, buffer=shm.buf, offset=HEADER_SIZE)
+        self.values = np.ndarray((self.capacity, width), dtype=np.float64, buffer=shm.buf,
+                                 offset=HEADER_SIZE + self.capacity * 8)
+
+    @classmethod
+    def create(cls, name, channels, capacity=65536):
+        """ New ring for the given channel names, raises FileExistsError if name is taken """
+        names = json.dumps(list(channels)).encode("utf-8")
+        if len(names) > HEADER_SIZE - _FIELDS * 8:
+            raise ValueError("Too many channel names for the ring header")
+        size = HEADER_SIZE + capacity * 8 * (1 + len(channels))
+        shm = _open_shared_memory(name, create=True, size=size)
+        header = np.ndarray((_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        header[:] = (MAGIC, capacity, len(channels), 0, 0)
+        shm.buf[_FIELDS * 8:_FIELDS * 8 + len(names)] = names
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        """ Map an existing ring, raises FileNotFoundError if it does not exist """
+        return cls(_open_shared_memory(name), owner=False)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    @property
+    def write_seq(self):
+        """ Sequence number the next row will get (rows written so far) """
+        return int(self._header[_WRITE_SEQ])
+
+    @property
+    def claim_seq(self):
+        """ End of the rows the writer may be overwriting right now """
+        return int(self._header[_CLAIM_SEQ])
+
+    def write(self, t, values):
+        """ Append one row, values in channel order (writer process only) """
+        seq = int(self._header[_WRITE_SEQ])
+        slot = seq % self.capacity
+        self._header[_CLAIM_SEQ] = seq + 1
+        self.t[slot] = t
+        self.values[slot] = values
+        self._header[_WRITE_SEQ] = seq + 1
+
+    def write_block(self, t, values):
+        """ Append rows: t has n times, values is n x channels (writer process only) """
+        t = np.asarray(t, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64).reshape(len(t), -1)
+        n = len(t)
+        if n > self.capacity:
+            t, values = t[-self.capacity:], values[-self.capacity:]
+            self._header[_WRITE_SEQ] += n - self.capacity
+            n = self.capacity
+        seq = int(self._header[_WRITE_SEQ])
+        slot = seq % self.capacity
+        self._header[_CLAIM_SEQ] = seq + n
+        first = min(n, self.capacity - slot)
+        self.t[slot:slot + first] = t[:first]
+        self.values[slot:slot + first] = values[:first]
+        if first < n:
+            self.t[:n - first] = t[first:]
+            self.values[:n - first] = values[first:]
+        self._header[_WRITE_SEQ] = seq + n
+
+    def write_dict(self, t, values):
+        """ Append one row from {channel: value}, missing channels are NaN """
+        self.write(t, [values.get(channel, math.nan) for channel in self.channels])
+
+    def reader(self, start="latest"):
+        """ Reader starting at the next row written ("latest"), the oldest row still held ("oldest") or a sequence number """
+        return RingReader(self, start)
+
+    def close(self):
+        """ Unmap; the creating process also removes the segment """
+        self._header = self.t = self.values = None
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+
+
+class RingReader:
+    """ Consumes a SampleRing in order, each reader keeps its own position """
+    def __init__(self, ring, start="latest"):
+        self.ring = ring
+        write_seq = ring.write_seq
+        if start == "latest":
+            self.seq = write_seq
+        elif start == "oldest":
+            self.seq = max(write_seq - ring.capacity, 0)
+        else:
+            self.seq = int(start)
+        self.lost = 0
+
+    def available(self):
+        return self.ring.write_seq - self.seq
+
+    def read(self, max_rows=None, copy=True):
+        """ Next rows as a SampleBlock (empty when caught up).
+
+        With copy=False the block holds views into shared memory and stops at the end of the ring
+        (the next read continues from the start); check overrun(block) after using it.
+        """
+        ring = self.ring
+        write_seq = ring.write_seq
+        lost = 0
+        if write_seq - self.seq > ring.capacity:
+            lost = write_seq - ring.capacity - self.seq
+            self.seq += lost
+            self.lost += lost
+        n = write_seq - self.seq
+        if max_rows is not None:
+            n = min(n, max_rows)
+        slot = self.seq % ring.capacity
+        if not copy:
+            n = min(n, ring.capacity - slot)
+            block = SampleBlock(self.seq, ring.t[slot:slot + n], ring.values[slot:slot + n], lost)
+        else:
+            index = (np.arange(self.seq, self.seq + n) % ring.capacity) if slot + n > ring.capacity else slice(slot, slot + n)
+            block = SampleBlock(self.seq, ring.t[index].copy(), ring.values[index].copy(), lost)
+            # Rows the writer claimed while they were copied are dropped and counted as lost
+            overrun = ring.claim_seq - ring.capacity - self.seq
+            if overrun > 0:
+                keep = max(n - overrun, 0)
+                block = SampleBlock(self.seq + n - keep, block.t[n - keep:], block.values[n - keep:], lost + min(overrun, n))
+                self.lost += min(overrun, n)
+        self.seq += n
+        return block
+
+    def overrun(self, block):
+        """ True if the writer has since overwritten any row of a copy=False block """
+        return self.ring.claim_seq - self.ring.capacity > block.start
+
+
+def ring_listener(ring):
+    """ TestEngine listener writing every sensor poll into the ring as (wall time, values) """
+    import time
+
+    def listener(event, data):
+        if event == "sensors":
+            ring.write_dict(time.time(), data["values"])
+    return listener
+
+
+def record_ring(name, path, stop, interval=0.2):
+    """ Reader process body: append every row of ring name to the CSV at path (unix time, one column per
+    channel) until the stop event is set, then write what is left """
+    ring = SampleRing.attach(name)
+    reader = ring.reader("oldest")
+    formats = ["%.6f"] + ["%.6g"] * len(ring.channels)
+    try:
+        with open(path, "a") as file:
+            if file.tell() == 0:
+                file.write(",".join(["unix_time"] + ring.channels) + "\n")
+            while True:
+                stopping = stop.is_set()
+                block = reader.read()
+                if block.lost:
+                    print(f"Warning: ring recorder fell behind, {block.lost} rows lost")
+                if len(block):
+                    np.savetxt(file, np.column_stack([block.t, block.values]), fmt=formats, delimiter=",")
+                    file.flush()
+                elif stopping:
+                    return
+                else:
+                    stop.wait(interval)
+    finally:
+        ring.close()
+
+
+class RingRecorder:
+    """ Writes a ring to a CSV from its own process, so the file I/O never holds the acquisition process's GIL """
+    def __init__(self, name, path):
+        import multiprocessing
+        context = multiprocessing.get_context("spawn")
+        self.path = path
+        self._stop = context.Event()
+        self._process = context.Process(target=record_ring, args=(name, path, self._stop), name="ring-recorder", daemon=True)
+
+    def start(self):
+        self._process.start()
+        print(f"Recording sample ring to '{self.path}' (pid {self._process.pid})")
+
+    def stop(self, timeout=10.0):
+        self._stop.set()
+        self._process.join(timeout)
+        if self._process.is_alive():
+            print("Warning: ring recorder did not finish, terminating it")
+            self._process.terminate()
+
+
+def _demo_reader(name, rows, result):
+    ring = SampleRing.attach(name)
+    reader = ring.reader("oldest")
+    total = 0
+    checksum = 0.0
+    while total + reader.lost < rows:
+        block = reader.read(copy=True)
+        total += len(block)
+        checksum += float(block.values[:, 0].sum())
+    result.put((total, reader.lost, checksum))
+    ring.close()
+
+
+if __name__ == "__main__":
+    import time
+    import multiprocessing
+
+    # Writer streams 2M rows of 8 channels in 1000-row blocks (about 1M rows/s) to two reader processes
+    rows, block_rows = 2000000, 1000
+    channels = [f"ch{i}" for i in range(8)]
+    ring = SampleRing.create("demo_sample_ring", channels, capacity=262144)
+    result = multiprocessing.Queue()
+    readers = [multiprocessing.Process(target=_demo_reader, args=(ring.name, rows, result)) for _ in range(2)]
+    for process in readers:
+        process.start()
+    time.sleep(1)
+
+    start = time.perf_counter()
+    values = np.ones((block_rows, len(channels)))
+    t = np.arange(block_rows, dtype=np.float64)
+    for _ in range(rows // block_rows):
+        ring.write_block(t, values)
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    for _ in readers:
+        total, lost, checksum = result.get()
+        print(f"reader: {total} rows, {lost} lost, checksum {checksum:.0f}")
+    for process in readers:
+        process.join()
+    print(f"{rows / elapsed / 1e6:.1f} M rows/s written")
+    ring.close()
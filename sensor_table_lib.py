@@ -0,0 +1,203 @@
+import math
+import numpy as np
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QSortFilterProxyModel
+from PySide6.QtWidgets import QTableView, QHeaderView, QAbstractItemView
+
+COLUMNS = ("Channel", "Value", "Min", "Max", "Mean")
+VALUE, MIN, MAX, MEAN = 1, 2, 3, 4
+SORT_ROLE = Qt.UserRole  # raw numbers for sorting, the display text would sort "10.0" before "9.0"
+
+
+class SensorTableModel(QAbstractTableModel):
+    """ Live channel table: latest value plus min/max/mean of every sample since the channels were set
+    (or reset_stats), kept in NumPy arrays.
+
+    add_samples only updates the arrays and widens the dirty row range; flush (once per GUI frame)
+    sends a single dataChanged for that range, so the view repaints whichever of those rows are
+    visible, however many polls and channels arrived in between.
+    """
+    def __init__(self, parent=None, decimals=2):
+        super().__init__(parent)
+        self.decimals = decimals
+        self.channels = []
+        self._rows = {}
+        self._keys = None  # channel order of the last add_samples call and its row indices
+        self._key_rows = None
+        self._dirty = None  # (first row, last row) changed since the last flush
+        self._allocate(0)
+
+    def _allocate(self, count):
+        self.value = np.full(count, np.nan)
+        self.minimum = np.full(count, np.inf)
+        self.maximum = np.full(count, -np.inf)
+        self.total = np.zeros(count)
+        self.count = np.zeros(count, dtype=np.int64)
+
+    def set_channels(self, channels):
+        """ Replace the channel list, statistics start over """
+        self.beginResetModel()
+        self.channels = list(channels)
+        self._rows = {name: row for row, name in enumerate(self.channels)}
+        self._keys = self._key_rows = self._dirty = None
+        self._allocate(len(self.channels))
+        self.endResetModel()
+
+    def reset_stats(self):
+        """ Start min/max/mean over (e.g. for a new profile), latest values stay """
+        self.minimum[:] = np.inf
+        self.maximum[:] = -np.inf
+        self.total[:] = 0
+        self.count[:] = 0
+        if self.channels:
+            self._mark(0, len(self.channels) - 1)
+
+    def add_samples(self, values):
+        """ Fold one poll {channel: value} into the statistics, channels not in the table are ignored """
+        keys = tuple(values)
+        if keys != self._keys:  # polls repeat the same channels in the same order, look the rows up once
+            pairs = [(i, self._rows[k]) for i, k in enumerate(keys) if k in self._rows]
+            self._keys = keys
+            self._key_rows = (np.array([i for i, _ in pairs], dtype=np.intp), np.array([r for _, r in pairs], dtype=np.intp))
+        picks, rows = self._key_rows
+        if not len(rows):
+            return
+        new = np.fromiter(values.values(), dtype=float, count=len(keys))[picks]
+        valid = ~np.isnan(new)
+        if not valid.all():
+            new, rows = new[valid], rows[valid]
+        self.value[rows] = new
+        self.minimum[rows] = np.minimum(self.minimum[rows], new)
+        self.maximum[rows] = np.maximum(self.maximum[rows], new)
+        self.total[rows] += new
+        self.count[rows] += 1
+        if len(rows):
+            self._mark(rows.min(), rows.max())
+
+    def _mark(self, first, last):
+        if self._dirty is None:
+            self._dirty = (int(first), int(last))
+        else:
+            self._dirty = (min(self._dirty[0], int(first)), max(self._dirty[1], int(last)))
+
+    def flush(self):
+        """ One dataChanged for every row changed since the last flush, returns the number of rows """
+        if self._dirty is None:
+            return 0
+        first, last = self._dirty
+        self._dirty = None
+        self.dataChanged.emit(self.index(first, VALUE), self.index(last, MEAN), [Qt.DisplayRole, SORT_ROLE])
+        return last - first + 1
+
+    def stat(self, row, column):
+        """ Number shown in a cell, NaN before the channel's first sample """
+        if column == VALUE:
+            return self.value[row]
+        if not self.count[row]:
+            return math.nan
+        if column == MIN:
+            return self.minimum[row]
+        if column == MAX:
+            return self.maximum[row]
+        return self.total[row] / self.count[row]
+
+    # ----- QAbstractTableModel -----
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.channels)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row, column = index.row(), index.column()
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return self.channels[row]
+            value = self.stat(row, column)
+            return "" if math.isnan(value) else f"{value:.{self.decimals}f}"
+        if role == SORT_ROLE:
+            return self.channels[row] if column == 0 else float(self.stat(row, column))
+        if role == Qt.TextAlignmentRole and column:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMNS[section]
+        return None
+
+
+def create_sensor_view(model, parent=None):
+    """ Sortable table view of model behind a case-insensitive channel name filter, returns (view, proxy);
+    connect a line edit's textChanged to proxy.setFilterFixedString """
+    proxy = QSortFilterProxyModel(parent)
+    proxy.setSourceModel(model)
+    proxy.setSortRole(SORT_ROLE)
+    proxy.setFilterKeyColumn(0)
+    proxy.setFilterCaseSensitivity(Qt.CaseInsensitive)
+
+    view = QTableView(parent)
+    view.setModel(proxy)
+    view.setSortingEnabled(True)
+    view.sortByColumn(-1, Qt.AscendingOrder)  # channel order until a header is clicked
+    view.setSelectionBehavior(QAbstractItemView.SelectRows)
+    view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+    view.setAlternatingRowColors(True)
+    view.setWordWrap(False)
+    # Fixed row heights and column widths: nothing is measured per row, so the cost stays with the visible rows
+    view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+    view.verticalHeader().setDefaultSectionSize(view.fontMetrics().height() + 6)
+    view.verticalHeader().hide()
+    header = view.horizontalHeader()
+    header.setSectionResizeMode(QHeaderView.Interactive)
+    header.setSectionResizeMode(0, QHeaderView.Stretch)
+    for column in range(1, len(COLUMNS)):
+        header.resizeSection(column, 70)
+    return view, proxy
+
+
+if __name__ == "__main__":
+    # 250 channels polled at 10 Hz with a 20 fps repaint, prints the GUI-thread cost per second
+    import sys
+    import time
+    import random
+    from PySide6.QtCore import QTimer
+    from PySide6.QtWidgets import QApplication, QWidget, QVBoxLayout, QLineEdit
+
+    app = QApplication(sys.argv)
+    model = SensorTableModel()
+    model.set_channels([f"PRESSURE {i} PSI" for i in range(200)] + [f"TEMP {i} (C)" for i in range(50)])
+    window = QWidget()
+    view, proxy = create_sensor_view(model, window)
+    filter_edit = QLineEdit()
+    filter_edit.setPlaceholderText("Filter channels")
+    filter_edit.textChanged.connect(proxy.setFilterFixedString)
+    layout = QVBoxLayout(window)
+    layout.addWidget(filter_edit)
+    layout.addWidget(view)
+    window.resize(500, 700)
+    window.show()
+
+    busy = [0.0, time.perf_counter()]
+
+    def poll():
+        start = time.perf_counter()
+        model.add_samples({name: 30 + random.random() for name in model.channels})
+        busy[0] += time.perf_counter() - start
+
+    def frame():
+        start = time.perf_counter()
+        model.flush()
+        busy[0] += time.perf_counter() - start
+        if time.perf_counter() - busy[1] >= 1:
+            print(f"model work {busy[0] * 1000:.1f} ms/s for {len(model.channels)} channels")
+            busy[0], busy[1] = 0.0, time.perf_counter()
+
+    poll_timer, frame_timer = QTimer(), QTimer()
+    poll_timer.timeout.connect(poll)
+    frame_timer.timeout.connect(frame)
+    poll_timer.start(100)
+    frame_timer.start(50)
+    sys.exit(app.exec())
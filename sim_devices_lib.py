@@ -0,0 +1,230 @@
+""" Simulated device backends for benchmarks and simulations: same call surface as the real libraries, no hardware """
+import math
+import time
+import random
+import queue
+import threading
+from collections import deque
+from types import SimpleNamespace
+
+
+class SimFlexLogger:
+    """ Stands in for FlexLoggerInterface: channels named like the rig's channel spec, optional RPC latency """
+    def __init__(self, channel_count=6, latency=0.0):
+        names = ["CHAMBER TEMP (C)", "COOLANT TEMP (C)"] + [f"PRESSURE {i} PSI" for i in range(1, 5)]
+        self.channels = (names + [f"AUX {i} (V)" for i in range(channel_count)])[:channel_count]
+        self.latency = latency
+        self.reads = 0
+        self.down = False  # set to simulate FlexLogger being closed or restarted
+        self.clock_offset = 0.0  # seconds the simulated FlexLogger PC clock is behind
+
+    def connect_to_instance(self):
+        return not self.down
+
+    def check_active_project(self):
+        return not self.down
+
+    def get_sensor_list(self):
+        return list(self.channels)
+
+    def read_sensor_val(self, name):
+        return self.read_sensor_sample(name)[0]
+
+    def read_sensor_sample(self, name):
+        if self.down:
+            raise ConnectionError("FlexLogger not responding")
+        if self.latency:
+            time.sleep(self.latency)
+        self.reads += 1
+        base = 35.0 if "PSI" in name else 20.0
+        return base + math.sin(self.reads * 0.01) + random.random() * 0.1, time.time() - self.clock_offset
+
+
+class SimCanBus:
+    """ Stands in for a python-can bus: records when each message was sent, with echo=True also hands
+    them back from recv stamped with the send time (like receive_own_messages on the Vector adapter) """
+    def __init__(self, latency=0.0, echo=False):
+        self.latency = latency
+        self.sent = []
+        self.echo = queue.Queue(maxsize=10000) if echo else None
+        self._lock = threading.Lock()
+
+    def send(self, message):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.sent.append((time.perf_counter(), message.arbitration_id))
+        if self.echo is not None and not self.echo.full():
+            self.echo.put(SimpleNamespace(arbitration_id=message.arbitration_id, data=message.data, timestamp=time.time()))
+
+    def recv(self, timeout=None):
+        if self.echo is None:
+            time.sleep(timeout or 0)
+            return None
+        try:
+            return self.echo.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def shutdown(self):
+        pass
+
+
+class SimCantroller:
+    """ Stands in for Cantroller in the pressure loop: counts pump power changes, optionally records them.
+
+    latency is slept on the given clock per command, e.g. to see its effect on cycle timing.
+    """
+    def __init__(self, record=True, latency=0.0, clock=None, megatron=False):
+        self.record = record
+        self.megatron = megatron
+        self.bus = SimCanBus()
+        self.latency = latency
+        self.clock = clock
+        self._now = clock.monotonic if clock is not None else time.perf_counter
+        self.changes = []
+        self.power_changes = 0
+        self.pump_power = 0
+        self.down = False  # set to simulate the CAN adapter dropping off
+
+    def connect_to_instance(self):
+        return not self.down
+
+    def healthy(self):
+        return not self.down
+
+    def set_pump_power(self, value):
+        if self.latency:
+            (self.clock.sleep if self.clock is not None else time.sleep)(self.latency)
+        self.power_changes += 1
+        self.pump_power = value
+        if self.record:
+            self.changes.append((self._now(), value))
+
+    def frame_channels(self):
+        return ["BCM PUMP POWER (%)"] if self.megatron else ["BCM PUMP POWER (%)", "PTN PUMP POWER (%)"]
+
+    def decode_frame(self, message):
+        names = {0x203: "BCM PUMP POWER (%)", 0x204: "PTN PUMP POWER (%)"}
+        return (names[message.arbitration_id], message.data[0]) if message.arbitration_id in names else None
+
+    def periodic_messages(self):
+        """ Like Cantroller.periodic_messages, message stand-ins carrying the arbitration id and power """
+        ids = [0x203] if self.megatron else [0x203, 0x204]
+        return [lambda i=i: SimpleNamespace(arbitration_id=i, data=[self.pump_power]) for i in ids]
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def shutdown(self):
+        pass
+
+
+class SimJulabo:
+    """ Stands in for JULABO at the command level: keeps setpoint history, no serial port.
+
+    With tau (seconds) the bath temperature follows the setpoint as a first order lag that starts
+    dead_time seconds after each change, on clock's time; without it the bath is always 0.3 C below.
+    """
+    def __init__(self, tau=None, dead_time=0.0, clock=None, start_temp=20.0):
+        self.setpoints = []
+        self.powered = False
+        self.down = False  # set to simulate a serial glitch: no replies until cleared
+        self.tau = tau
+        self.dead_time = dead_time
+        self._time = clock.time if clock is not None else time.time
+        self._bath = start_temp
+        self._bath_time = None
+        self._acting = start_temp  # setpoint the bath is moving to
+        self._changes = deque()  # (time it takes effect, setpoint)
+
+    def reopen(self):
+        pass
+
+    def get_version(self):
+        return "" if self.down else "JULABO SIMULATED VERSION 1.0"
+
+    def set_power_on(self):
+        self.powered = True
+
+    def set_power_off(self):
+        self.powered = False
+
+    def set_work_temperature(self, temp):
+        self._advance()
+        self.setpoints.append(temp)
+        self._changes.append((self._time() + self.dead_time, temp))
+
+    def get_work_temperature(self):
+        return self.setpoints[-1] if self.setpoints else 20.0
+
+    def get_temperature(self):
+        if self.tau is None:
+            return self.get_work_temperature() - 0.3
+        self._advance()
+        return round(self._bath, 2)
+
+    def _advance(self):
+        """ Move the bath temperature on to now, through the setpoint changes that took effect meanwhile """
+        if self.tau is None:
+            return
+        now = self._time()
+        if self._bath_time is None:
+            self._bath_time = now
+        while self._bath_time < now:
+            until = min(self._changes[0][0], now) if self._changes else now
+            if until > self._bath_time:
+                self._bath = self._acting + (self._bath - self._acting) * math.exp(-(until - self._bath_time) / self.tau)
+                self._bath_time = until
+            if self._changes and self._changes[0][0] <= self._bath_time:
+                self._acting = self._changes.popleft()[1]
+            elif until == now:
+                break
+
+    def close(self):
+        pass
+
+
+class SimSerial:
+    """ Stands in for the pyserial port of a Julabo at 4800 baud 7E1: replies after the line time """
+    def __init__(self, baud=4800, processing=0.005):
+        self.char_time = 10 / baud  # start + 7 data + parity + stop bits
+        self.processing = processing
+        self.setpoint = 20.0
+        self._reply = b""
+
+    def write(self, data):
+        time.sleep(len(data) * self.char_time)
+        command = data.decode("ascii").strip()
+        if command.startswith("out_sp_00"):
+            self.setpoint = float(command.split()[1])
+            reply = ""
+        elif command == "in_sp_00":
+            reply = f"{self.setpoint:.2f}"
+        elif command == "in_pv_00":
+            reply = f"{self.setpoint - 0.3:.2f}"
+        elif command == "version":
+            reply = "JULABO SIMULATED VERSION 1.0"
+        else:
+            reply = "0"
+        self._reply = (reply + "\r").encode("ascii") if reply else b""
+        time.sleep(self.processing)
+
+    def read(self, size=1):
+        if not self._reply:
+            return b""
+        time.sleep(size * self.char_time)
+        data, self._reply = self._reply[:size], self._reply[size:]
+        return data
+
+    def flushInput(self):
+        pass
+
+    def flushOutput(self):
+        pass
+
+    def close(self):
+        pass
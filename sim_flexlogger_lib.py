@@ -0,0 +1,221 @@
+""" Stand-in for flexlogger.automation so FlexLoggerInterface runs without FlexLogger (any OS, no rig).
+
+    FlexLoggerInterface(app=SimApplication())
+
+Emulates Application.get_active_project, Project.open_channel_specification_document and the channel
+spec calls the rig uses (get_channel_names, is_channel_enabled, set_channel_enabled, get_channel_value).
+Values come from a Signal per channel and are returned as ChannelDataPoint look-alikes whose str() is the
+real one, so the regex parse in FlexLoggerInterface is exercised as on the rig.
+"""
+import math
+import time
+import random
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+
+try:
+    from flexlogger.automation import FlexLoggerError
+except ImportError:
+    class FlexLoggerError(Exception):
+        """ Same role as flexlogger.automation.FlexLoggerError where the package is not installed """
+
+DEFAULT_CHANNELS = ["COOLANT TEMP (C)", "CHAMBER TEMP (C)"] + [f"PRESSURE {i} PSI" for i in range(1, 5)]
+
+
+class Signal:
+    """ Generator of one channel's value at time t (seconds):
+    "constant" (offset), "sine", "square" (offset +- amplitude, high for duty of each period),
+    "ramp" (sawtooth from offset - amplitude to offset + amplitude), plus uniform noise of +- noise """
+    KINDS = ("constant", "sine", "square", "ramp")
+
+    def __init__(self, kind="sine", offset=0.0, amplitude=1.0, period=10.0, duty=0.5, noise=0.0, phase=0.0):
+        if kind not in self.KINDS:
+            raise ValueError(f"unknown signal '{kind}', expected one of {', '.join(self.KINDS)}")
+        self.kind = kind
+        self.offset = offset
+        self.amplitude = amplitude
+        self.period = period
+        self.duty = duty
+        self.noise = noise
+        self.phase = phase
+
+    @classmethod
+    def parse(cls, text):
+        """ "kind[:offset[:amplitude[:period[:noise]]]]", e.g. "square:20:15:2:0.1" """
+        kind, *numbers = text.split(":")
+        names = ("offset", "amplitude", "period", "noise")
+        return cls(kind, **{name: float(number) for name, number in zip(names, numbers)})
+
+    def __call__(self, t):
+        position = ((t / self.period) + self.phase) % 1.0
+        if self.kind == "sine":
+            value = self.offset + self.amplitude * math.sin(2 * math.pi * position)
+        elif self.kind == "square":
+            value = self.offset + (self.amplitude if position < self.duty else -self.amplitude)
+        elif self.kind == "ramp":
+            value = self.offset + self.amplitude * (2 * position - 1)
+        else:
+            value = self.offset
+        if self.noise:
+            value += random.uniform(-self.noise, self.noise)
+        return value
+
+
+def default_signal(name):
+    """ Rig-like signal for a channel name: pump pressure pulses on PSI channels, slow drift on temperatures """
+    upper = name.upper()
+    if "PSI" in upper:
+        return Signal("square", offset=20.0, amplitude=15.0, period=2.0, noise=0.2)
+    if "TEMP" in upper or "(C)" in upper:
+        return Signal("sine", offset=22.0, amplitude=2.0, period=600.0, noise=0.05)
+    return Signal("sine", offset=0.0, amplitude=1.0, period=10.0, noise=0.01)
+
+
+def read_channel_spec(path):
+    """ [(channel name, sample rate Hz)] of the input channels in a FlexLogger 'Channel Specification.flxio'
+    (FullName of every *Channel element, without FlexLogger's internal tag channels) """
+    channels = []
+    for element in ET.parse(path).getroot().iter():
+        name = element.get("FullName")
+        if name is None or not element.tag.endswith("Channel") or element.get("IsTag", "").endswith("True"):
+            continue
+        rate = element.get("SampleRate", "[double]1").rpartition("]")[2]
+        channels.append((name, float(rate)))
+    return channels
+
+
+class ChannelDataPoint:
+    """ Same value, timestamp and repr as flexlogger.automation.ChannelDataPoint """
+    def __init__(self, name, value, timestamp):
+        self.name = name
+        self.value = value
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return 'flexlogger.automation.ChannelDataPoint("%s", %f, %s)' % (self.name, self.value, repr(self.timestamp))
+
+
+class SimChannelSpecification:
+    """ Channel specification document: enabled flags and generated values.
+
+    A value is the channel's latest sample: its time is the current time rounded down to the channel's
+    sample rate, stamped in UTC like FlexLogger does, and clock_offset seconds behind the host.
+    """
+    def __init__(self, application, channels, signals, rates):
+        self._app = application
+        self._channels = list(channels)
+        self._signals = signals
+        self._rates = rates
+        self._enabled = {name: True for name in self._channels}
+
+    def _check(self, name):
+        self._app._call()
+        if name not in self._enabled:
+            raise FlexLoggerError(f"Channel '{name}' does not exist")
+
+    def get_channel_names(self):
+        self._app._call()
+        return list(self._channels)
+
+    def is_channel_enabled(self, channel_name):
+        self._check(channel_name)
+        return self._enabled[channel_name]
+
+    def set_channel_enabled(self, channel_name, channel_enabled):
+        self._check(channel_name)
+        self._enabled[channel_name] = bool(channel_enabled)
+
+    def get_actual_data_rate(self, channel_name):
+        self._check(channel_name)
+        return self._rates.get(channel_name, self._app.sample_rate)
+
+    def get_channel_value(self, channel_name):
+        self._check(channel_name)
+        now = time.time() - self._app.clock_offset
+        rate = self._rates.get(channel_name, self._app.sample_rate)
+        t = math.floor(now * rate) / rate if rate > 0 else now
+        value = self._signals[channel_name](t)
+        return ChannelDataPoint(channel_name, value, datetime.fromtimestamp(t, timezone.utc))
+
+
+class SimProject:
+    """ The open project; only the channel specification document is emulated """
+    def __init__(self, application, name):
+        self._app = application
+        self.project_name = name
+
+    def open_channel_specification_document(self):
+        self._app._call()
+        return self._app.channel_spec
+
+    def close(self):
+        self._app.project = None
+
+
+class SimApplication:
+    """ Stands in for flexlogger.automation.Application with a project open.
+
+    channels: names, or None for the channel spec file (if given) else the rig's six channels.
+    signals: {name: Signal or "kind:offset:amplitude:period:noise"}, the rest use default_signal.
+    latency: seconds every call takes (an automation gRPC round trip is about 1-3 ms on the rig PC).
+    sample_rate: Hz for channels without a rate from the spec file. Set closed to make every call
+    fail like a closed FlexLogger (get_active_project raises), project = None for no open project.
+    """
+    def __init__(self, channels=None, channel_spec_path=None, signals=None, latency=0.0, sample_rate=1000.0,
+                 clock_offset=0.0, project_name="Cyclic Pressure Testing"):
+        rates = {}
+        if channels is None and channel_spec_path:
+            spec = read_channel_spec(channel_spec_path)
+            channels = [name for name, _ in spec]
+            rates = dict(spec)
+        if channels is None:
+            channels = DEFAULT_CHANNELS
+        signals = dict(signals or {})
+        for name in channels:
+            signal = signals.get(name)
+            signals[name] = Signal.parse(signal) if isinstance(signal, str) else signal or default_signal(name)
+
+        self.latency = latency
+        self.sample_rate = sample_rate
+        self.clock_offset = clock_offset
+        self.closed = False
+        self.calls = 0
+        self.channel_spec = SimChannelSpecification(self, channels, signals, rates)
+        self.project = SimProject(self, project_name)
+
+    def _call(self):
+        if self.closed:
+            raise FlexLoggerError("Failed to connect to the FlexLogger automation server")
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get_active_project(self):
+        self._call()
+        return self.project
+
+    def close(self):
+        pass
+
+
+if __name__ == "__main__":
+    # The real FlexLoggerInterface against the stand-in with the project's channel spec, then the cost of a read
+    import os
+    import sys
+    from flexlogger_lib import FlexLoggerInterface
+
+    spec = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Cyclic Pressure Testing", "Channel Specification.flxio")
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.0
+    flex = FlexLoggerInterface(app=SimApplication(channel_spec_path=spec, latency=latency, sample_rate=100.0))
+    if not flex.connect_to_instance():
+        sys.exit(1)
+    sensors = flex.get_sensor_list()
+    for sensor in sensors:
+        value, stamp = flex.read_sensor_sample(sensor)
+        print(f"{sensor}: {value:.3f} at {datetime.fromtimestamp(stamp):%H:%M:%S.%f}")
+
+    reads = 2000
+    start = time.perf_counter()
+    for i in range(reads):
+        flex.read_sensor_sample(sensors[i % len(sensors)])
+    print(f"read_sensor_sample: {(time.perf_counter() - start) / reads * 1e6:.1f} us per read with {latency * 1000:.1f} ms latency")
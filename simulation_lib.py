@@ -0,0 +1,316 @@
+import os
+import io
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+from clock_lib import VirtualClock
+from engine_lib import TestEngine, LOG_ROTATE_CYCLES
+from checkpoint_lib import recover
+from profile_file_lib import DEFAULT_PROFILE, load_test_profile
+from sim_devices_lib import SimFlexLogger, SimCantroller, SimJulabo
+from soak_lib import SoakMonitor
+from thermal_lib import SetpointScheduler
+from watchdog_lib import Watchdog
+
+
+class SimulationResult:
+    """ What a simulated test did, plus the checks that failed (empty when everything matched) """
+    def __init__(self):
+        self.runs = []  # (start, end) virtual times of each active stretch
+        self.finished_at = None
+        self.failures = []
+        self.stats = {}
+
+    @property
+    def passed(self):
+        return not self.failures
+
+    def check(self, condition, message):
+        if not condition:
+            self.failures.append(message)
+
+    def report(self):
+        lines = [f"{key}: {value}" for key, value in self.stats.items()]
+        lines += [f"FAIL: {failure}" for failure in self.failures] or ["All checks passed"]
+        return "\n".join(lines)
+
+
+class TestSimulation:
+    """ Runs the real TestEngine (scheduling, cycle counting, log rotation, checkpoint/resume) on a
+    VirtualClock with simulated FlexLogger, CAN and Julabo, so a 648 h test takes minutes.
+
+    pause_at/downtime (hours) pause the test part way, throw the engine away and restore a new one
+    from the checkpoint journal, the same path as a crash-restart on the rig. soak_interval (virtual
+    seconds) samples the process resources during the run and fails the check on steady growth.
+    outages are (device, at hours, minutes) faults injected into the simulated devices; they need
+    watchdog_interval (seconds) to be ridden out. bath (tau, dead time in minutes) gives the simulated
+    Julabo a thermal lag; setpoint_scheduler (SetpointScheduler keyword arguments) runs the scheduler.
+    """
+    def __init__(self, profile_path=DEFAULT_PROFILE, workdir=None, tick_seconds=60.0, can_latency=0.0,
+                 megatron=False, num_cycles=None, soak_interval=None, watchdog_interval=None, outages=(),
+                 bath=None, setpoint_scheduler=None):
+        self.profile_path = profile_path
+        self.workdir = workdir or tempfile.mkdtemp(prefix="rig_sim_")
+        self.tick_seconds = tick_seconds
+        self.can_latency = can_latency
+        self.megatron = megatron
+        self.num_cycles = num_cycles
+        self.clock = VirtualClock()
+        self.julabo = SimJulabo(tau=bath[0] * 60, dead_time=bath[1] * 60, clock=self.clock) if bath else SimJulabo()
+        self.result = SimulationResult()
+        self.watchdog_interval = watchdog_interval
+        self.watchdog = None  # of the current engine
+        self.watchdogs = []
+        self.outages = list(outages)
+        self.setpoint_scheduler = setpoint_scheduler
+        self.scheduler = None  # of the current engine
+        self.schedulers = []
+        self.soak = None
+        if soak_interval:
+            self.soak = SoakMonitor(os.path.join(self.workdir, "soak.csv"), interval=soak_interval, clock=self.clock)
+
+    def make_engine(self):
+        engine = TestEngine(journal_path=os.path.join(self.workdir, "checkpoint.journal"), log_dir=self.workdir, clock=self.clock)
+        engine.timer_ms = self.tick_seconds * 1000
+        engine.waveform_sample_ms = 0  # 20 ms sampling would be 10^8 events over a full test
+        engine._flex = SimFlexLogger(6)
+        engine.flexlogger_connected = True
+        engine.sensors = engine._flex.get_sensor_list()
+        engine._cantroller = SimCantroller(record=False, latency=self.can_latency, clock=self.clock)
+        engine.canbus_connected = True
+        if self.megatron:
+            engine.megatron_enabled = True
+        else:
+            engine._julabo = self.julabo
+            engine.julabo_connected = True
+        engine.add_listener(self._on_event)
+        return engine
+
+    def _on_event(self, event, data):
+        if event == "finished":
+            self.result.finished_at = self.clock.time()
+
+    def _drive(self, engine, until=None):
+        """ Tick loop like headless.run, pausing at virtual time until """
+        watchdog = self._watch(engine)
+        scheduler = self._schedule(engine)
+        engine.start()
+        self._run_start = self.clock.time()
+        period = engine.timer_ms / 1000
+        next_tick = self.clock.monotonic()
+        try:
+            while engine.active or (watchdog is not None and watchdog.holding):
+                if until is not None and self.clock.time() >= until and engine.active:
+                    self.result.runs.append((self._run_start, self.clock.time()))
+                    engine.pause()
+                    return
+                engine.tick()
+                next_tick += period
+                self.clock.sleep(max(next_tick - self.clock.monotonic(), 0))
+            self.clock.join(engine.test_thread)
+            self.result.runs.append((self._run_start, self.result.finished_at or self.clock.time()))
+        finally:
+            if watchdog is not None:
+                watchdog.stop(wait=True)
+            if scheduler is not None:
+                scheduler.stop(wait=True)
+
+    def _watch(self, engine):
+        """ A watchdog on engine whose pause/resume also end and start an active stretch """
+        if not self.watchdog_interval:
+            return None
+
+        def pause():
+            self.result.runs.append((self._run_start, self.clock.time()))
+            engine.pause()
+
+        def resume():
+            engine.start()
+            self._run_start = self.clock.time()
+
+        self.watchdog = Watchdog(engine, interval=self.watchdog_interval, pause=pause, resume=resume, clock=self.clock)
+        self.watchdog.start()
+        self.watchdogs.append(self.watchdog)
+        return self.watchdog
+
+    def _schedule(self, engine):
+        """ A setpoint scheduler on engine, polling once a tick """
+        if self.setpoint_scheduler is None or self.megatron:
+            return None
+        options = dict({"poll": self.tick_seconds}, **self.setpoint_scheduler)
+        if self.scheduler is not None:  # a resumed test starts from the bath model fitted so far
+            options.setdefault("model", self.scheduler.model)
+        self.scheduler = engine.setpoint_scheduler = SetpointScheduler(engine, **options)
+        self.scheduler.start()
+        self.schedulers.append(self.scheduler)
+        return self.scheduler
+
+    def _inject(self, device, at, minutes):
+        """ Take a simulated device down at hour at for the given minutes """
+        self.clock.sleep(at * 3600)
+        target = {"flexlogger": lambda: self.engine._flex, "canbus": lambda: self.engine._cantroller,
+                  "julabo": lambda: self.julabo}[device]()
+        target.down = True
+        self.clock.sleep(minutes * 60)
+        target.down = False
+
+    def _scenario(self, pause_at, downtime):
+        if self.soak is not None:
+            self.soak.start()
+        faults = [self.clock.thread(lambda o=outage: self._inject(*o), name="fault") for outage in self.outages]
+        for fault in faults:
+            fault.start()
+        try:
+            self._run_test(pause_at, downtime)
+        finally:
+            for fault in faults:
+                self.clock.join(fault)
+            if self.soak is not None:
+                self.soak.stop(wait=True)
+
+    def _run_test(self, pause_at, downtime):
+        engine = self.make_engine()
+        profile_path = self.profile_path
+        if self.num_cycles is not None:  # a copy of the profile with the shorter run, the checkpoint must match its file
+            data = load_test_profile(profile_path).data
+            data["pressure"]["num_cycles"] = self.num_cycles
+            profile_path = os.path.join(self.workdir, "profile.json")
+            with open(profile_path, "w") as file:
+                json.dump(data, file, indent=2)
+        engine.load_profile(profile_path)
+        engine.build_profile()
+        self.engine = engine
+        t0 = self.clock.time()
+
+        if pause_at is not None:
+            self._drive(engine, until=t0 + pause_at * 3600)
+            engine.shutdown()
+            self.clock.sleep(downtime * 3600)
+            engine = self.make_engine()
+            state = engine.pending_checkpoint()
+            self.result.check(state is not None, "no checkpoint to resume from after the pause")
+            if state is None:
+                return
+            engine.restore_checkpoint(state)
+            self.engine = engine
+        self._drive(engine)
+        engine.shutdown()
+
+    def run(self, pause_at=None, downtime=0.0, verbose=False):
+        """ Simulate the whole test and check the outcome, returns a SimulationResult """
+        wall_start = time.perf_counter()
+        output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+        with output:
+            self.clock.run(self._scenario, pause_at, downtime)
+        self._verify(time.perf_counter() - wall_start)
+        return self.result
+
+    def _verify(self, wall_seconds):
+        engine, result = self.engine, self.result
+        n = engine.pressure_num_cycles
+        active = sum(end - start for start, end in result.runs)
+        cycle = engine.pressure_on_time + engine.pressure_off_time
+        # Each start warms up, the finish waits 5 s; a pause lets the running cycle complete
+        nominal = len(result.runs) * engine.pump_warmup_time + n * cycle + 5
+        result.stats.update({
+            "wall_seconds": round(wall_seconds, 1),
+            "virtual_hours": round(self.clock.elapsed() / 3600, 3),
+            "active_hours": round(active / 3600, 3),
+            "events": self.clock.events_run,
+            "pressure_cycles": f"{engine.pressure_cycle_count}/{n}",
+            "fluid_cycles": f"{engine.fluid_cycle_count}/{engine.fluid_num_cycles}",
+            "chamber_cycles": f"{engine.chamber_cycle_count}/{engine.chamber_num_cycles}",
+            "drift_s": round(active - nominal, 3),
+            "workdir": self.workdir,
+        })
+
+        result.check(result.finished_at is not None, "test never finished")
+        result.check(engine.pressure_cycle_count == n, f"pressure count {engine.pressure_cycle_count} != {n}")
+        result.check(abs(active - nominal) <= len(result.runs) * cycle + 2 * n * self.can_latency + 1e-6,
+                     f"active time {active:.1f}s differs from nominal {nominal:.1f}s by more than the pause allowance")
+
+        # Temperature timers fire at start and then at every interval boundary passed in unpaused time
+        for name, profile, count, total in (("fluid", engine.fluid_profile, engine.fluid_cycle_count, engine.fluid_num_cycles),
+                                            ("chamber", engine.chamber_profile, engine.chamber_cycle_count, engine.chamber_num_cycles)):
+            if name == "fluid" and self.megatron:
+                continue
+            result.check(count <= total, f"{name} count {count} ran past the {total} intervals of the profile")
+            expected = min(profile.intervals_before(active + 1e-6), total)
+            result.check(count == expected, f"{name} count {count} != {expected} for {active / 3600:.2f} active hours")
+
+        # Every Julabo setpoint follows the fluid profile in order (the scheduler adds boosts, its targets must)
+        if self.scheduler is not None and self.scheduler.control:
+            targets = [(record.index, record.target) for scheduler in self.schedulers for record in scheduler.intervals]
+            expected = [(i, engine.fluid_profile.interval_value(i)) for i in range(len(targets))]
+            result.check(targets == expected, "scheduled fluid intervals skipped or repeated profile intervals")
+            result.check(len(targets) <= engine.fluid_num_cycles, "fluid intervals scheduled after the fluid profile ended")
+        elif not self.megatron:
+            expected = [engine.fluid_profile.interval_value(i) for i in range(len(self.julabo.setpoints))]
+            result.check(self.julabo.setpoints == expected, "Julabo setpoints skipped or repeated profile intervals")
+            result.check(len(self.julabo.setpoints) <= engine.fluid_num_cycles, "Julabo got setpoints after the fluid profile ended")
+        if self.scheduler is not None:
+            records = [record for scheduler in self.schedulers for record in scheduler.intervals if record.active > 0]
+            active_fluid = sum(record.active for record in records)
+            if active_fluid:
+                result.stats["fluid_at_temperature_pct"] = round(100 * sum(record.at_temperature for record in records) / active_fluid, 1)
+
+        # Log rotation: a new file after every LOG_ROTATE_CYCLES + 1 cycles
+        logs = [f for f in os.listdir(self.workdir)
+                if f[:4].isdigit() and not f.endswith(("_cycles.bin", "_Crash"))]
+        expected_logs = 1 + n // (LOG_ROTATE_CYCLES + 1)
+        result.check(len(logs) == expected_logs, f"{len(logs)} log files, expected {expected_logs}")
+
+        if self.watchdog is not None:
+            health = [h for watchdog in self.watchdogs for h in watchdog.health.values()]
+            result.stats["outages"] = sum(h.outages for h in health)
+            result.stats["outage_minutes"] = round(sum(h.downtime for h in health) / 60, 1)
+            result.check(all(h.state == "up" for h in health), "a device was still down at the end")
+            result.check(result.stats["outages"] >= len(self.outages), f"{result.stats['outages']} outages seen, {len(self.outages)} injected")
+
+        if self.soak is not None:
+            for column, per_hour in self.soak.growth().items():
+                result.failures.append(f"{column} grew steadily, {per_hour:+.3g}/h")
+
+        # The journal ends with a complete checkpoint matching the final counts
+        state = recover(engine.journal_path)
+        result.check(state is not None and state.complete, "journal does not end with a COMPLETE checkpoint")
+        if state is not None:
+            result.check(state.pressure_cycle_count == n, f"journal pressure count {state.pressure_cycle_count} != {n}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a whole test profile in virtual time against simulated devices")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE)
+    parser.add_argument("--cycles", type=int, default=None, help="override the pressure cycle count (quick runs)")
+    parser.add_argument("--tick-seconds", type=float, default=60.0, help="acquisition/log period in virtual seconds")
+    parser.add_argument("--can-latency-ms", type=float, default=0.0, help="simulated delay of each pump command")
+    parser.add_argument("--pause-at", type=float, default=None, help="pause after this many hours, then resume from the journal")
+    parser.add_argument("--downtime", type=float, default=1.0, help="hours between the pause and the resume")
+    parser.add_argument("--megatron", action="store_true")
+    parser.add_argument("--soak", type=float, default=None, metavar="SECONDS", help="sample process resources every SECONDS of virtual time and fail on steady growth")
+    parser.add_argument("--watchdog", type=float, default=None, metavar="SECONDS", help="run the device watchdog with this heartbeat interval (virtual seconds)")
+    parser.add_argument("--outage", action="append", default=[], metavar="DEVICE:HOURS:MINUTES",
+                        help="take flexlogger, canbus or julabo down at HOURS for MINUTES (repeatable, implies --watchdog 10)")
+    parser.add_argument("--bath", default=None, metavar="TAU:DEAD", help="give the Julabo bath a thermal lag, time constant and dead time in minutes")
+    parser.add_argument("--setpoint-scheduler", choices=("control", "monitor"), default=None,
+                        help="plan the Julabo setpoints from a fitted bath model (monitor: only measure the time at temperature)")
+    parser.add_argument("--fluid-soak", type=float, default=None, metavar="HOURS", help="time at temperature each fluid interval needs (lets the scheduler start transitions early)")
+    parser.add_argument("--verbose", action="store_true", help="show the engine's console output")
+    args = parser.parse_args()
+
+    simulation = TestSimulation(args.profile, tick_seconds=args.tick_seconds, can_latency=args.can_latency_ms / 1000,
+                                megatron=args.megatron, num_cycles=args.cycles, soak_interval=args.soak,
+                                watchdog_interval=args.watchdog or (10.0 if args.outage else None),
+                                outages=[(d, float(h), float(m)) for d, h, m in (o.split(":") for o in args.outage)],
+                                bath=tuple(float(v) for v in args.bath.split(":")) if args.bath else None,
+                                setpoint_scheduler=None if args.setpoint_scheduler is None else
+                                {"control": args.setpoint_scheduler == "control", "soak": args.fluid_soak * 3600 if args.fluid_soak else None})
+    outcome = simulation.run(pause_at=args.pause_at, downtime=args.downtime, verbose=args.verbose)
+    print(outcome.report())
+    if simulation.soak is not None:
+        print(simulation.soak.summary())
+    if simulation.scheduler is not None:
+        print(simulation.scheduler.summary())
+    raise SystemExit(0 if outcome.passed else 1)
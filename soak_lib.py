@@ -0,0 +1,194 @@
+import os
+import gc
+import sys
+import time
+import threading
+import tracemalloc
+from clock_lib import SYSTEM_CLOCK
+
+try:
+    import psutil
+except ImportError:  # optional, without it RSS and file handles come from /proc (Linux only)
+    psutil = None
+
+COLUMNS = ("time", "rss_mb", "threads", "native_threads", "fds", "qt_objects", "gc_objects", "traced_mb")
+
+# Growth over the analysed span below these amounts is never flagged
+MIN_GROWTH = {"rss_mb": 5.0, "threads": 2, "native_threads": 2, "fds": 4, "qt_objects": 20, "gc_objects": 5000, "traced_mb": 2.0}
+
+
+def read_resources():
+    """ Current RSS (MB), Python and native thread counts and open file handles, None where unavailable """
+    rss = native = fds = None
+    if psutil is not None:
+        process = psutil.Process()
+        rss = process.memory_info().rss / 1e6
+        native = process.num_threads()
+        fds = process.num_handles() if sys.platform == "win32" else process.num_fds()
+    elif os.path.exists("/proc/self/statm"):
+        with open("/proc/self/statm") as file:
+            rss = int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+        native = len(os.listdir("/proc/self/task"))
+        fds = len(os.listdir("/proc/self/fd"))
+    return rss, threading.active_count(), native, fds
+
+
+def find_growth(times, values, min_growth, warmup=0.25):
+    """ Flag steady growth: after skipping the warmup fraction of samples, the median of each quarter of the
+    rest is above the one before and the total rise is at least min_growth. Returns growth per hour or None """
+    points = [(t, v) for t, v in zip(times, values) if v is not None]
+    points = points[int(len(points) * warmup):]
+    if len(points) < 8:
+        return None
+    quarter = len(points) // 4
+    medians = []
+    for i in range(4):
+        part = sorted(v for _, v in points[i * quarter:(i + 1) * quarter])
+        medians.append(part[len(part) // 2])
+    rise = medians[-1] - medians[0]
+    if rise < min_growth or any(b <= a for a, b in zip(medians, medians[1:])):
+        return None
+    hours = (points[-1][0] - points[0][0]) / 3600
+    return rise / hours if hours > 0 else None
+
+
+class SoakMonitor:
+    """ Soak diagnostics for runs of days or weeks: samples RSS, threads, file handles, Qt objects, GC objects
+    and (with trace_frames) tracemalloc every interval seconds, and flags whatever keeps growing.
+
+    The series stays compact: past capacity samples every other one is dropped, so it always spans the
+    whole run. Rows are also appended to a CSV file at path, and the allocation sites that grew most
+    since the first sample are rewritten next to it. qt_counter is a callable returning the Qt object
+    count (the GUI passes one, soak_lib never imports Qt).
+    """
+    def __init__(self, path=None, interval=60.0, trace_frames=0, top=10, qt_counter=None, clock=None, capacity=4096):
+        self.path = path
+        self.interval = interval
+        self.trace_frames = trace_frames
+        self.top = top
+        self.qt_counter = qt_counter
+        self.clock = clock if clock is not None else SYSTEM_CLOCK
+        self.capacity = capacity
+        self.series = {column: [] for column in COLUMNS}
+        self.top_growth = []
+        self._baseline = None
+        self._stopped = False
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, argv=None, **kwargs):
+        """ A monitor if --soak is in argv or RIG_SOAK=1, RIG_SOAK_INTERVAL sets the interval (seconds),
+        RIG_SOAK_TRACE_FRAMES > 0 turns on tracemalloc with that many frames (off by default, it slows every allocation) """
+        argv = sys.argv if argv is None else argv
+        if "--soak" not in argv and os.environ.get("RIG_SOAK") != "1":
+            return None
+        kwargs.setdefault("interval", float(os.environ.get("RIG_SOAK_INTERVAL", 60)))
+        kwargs.setdefault("trace_frames", int(os.environ.get("RIG_SOAK_TRACE_FRAMES", 0)))
+        return cls(**kwargs)
+
+    def start(self):
+        if self.trace_frames and not tracemalloc.is_tracing():
+            tracemalloc.start(self.trace_frames)
+        if self.path:
+            with open(self.path, "a") as file:
+                if file.tell() == 0:
+                    file.write(",".join(COLUMNS) + "\n")
+        self.sample()
+        self._thread = self.clock.thread(self._run, name="soak-monitor")
+        self._thread.start()
+        print(f"Soak diagnostics every {self.interval:.0f} s" + (f" to '{self.path}'" if self.path else ""))
+
+    def _run(self):
+        while True:
+            self.clock.sleep(self.interval)
+            if self._stopped:
+                return
+            self.sample()
+
+    def stop(self, wait=False):
+        """ Take a last sample and stop; wait=True also waits for the sampling thread (up to one interval) """
+        if self._stopped:
+            return
+        self._stopped = True
+        self.sample()
+        if wait and self._thread is not None:
+            self.clock.join(self._thread)
+
+    def sample(self):
+        """ Record one row, returns it as a dict """
+        rss, threads, native, fds = read_resources()
+        traced = None
+        if tracemalloc.is_tracing():
+            traced = tracemalloc.get_traced_memory()[0] / 1e6
+            self._update_top_growth()
+        qt_objects = None
+        if self.qt_counter is not None:
+            try:
+                qt_objects = self.qt_counter()
+            except RuntimeError:  # widgets already deleted at shutdown
+                pass
+        row = {"time": self.clock.time(), "rss_mb": rss, "threads": threads, "native_threads": native, "fds": fds,
+               "qt_objects": qt_objects, "gc_objects": len(gc.get_objects()), "traced_mb": traced}
+
+        with self._lock:
+            for column in COLUMNS:
+                self.series[column].append(row[column])
+            if len(self.series["time"]) > self.capacity:
+                for column in COLUMNS:
+                    del self.series[column][1::2]
+        if self.path:
+            with open(self.path, "a") as file:
+                file.write(",".join("" if row[c] is None else f"{row[c]:.6g}" if c != "time" else f"{row[c]:.0f}" for c in COLUMNS) + "\n")
+        return row
+
+    def _update_top_growth(self):
+        snapshot = tracemalloc.take_snapshot()
+        if self._baseline is None:
+            self._baseline = snapshot
+            return
+        self.top_growth = [str(stat) for stat in snapshot.compare_to(self._baseline, "lineno")[:self.top] if stat.size_diff > 0]
+        if self.path:
+            with open(os.path.splitext(self.path)[0] + "_tracemalloc.txt", "w") as file:
+                file.write(f"Allocation growth since the first sample, {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+                file.write("\n".join(self.top_growth) + "\n")
+
+    def growth(self):
+        """ {column: growth per hour} of every column that grew steadily """
+        with self._lock:
+            series = {column: list(values) for column, values in self.series.items()}
+        flagged = {}
+        for column, minimum in MIN_GROWTH.items():
+            per_hour = find_growth(series["time"], series[column], minimum)
+            if per_hour is not None:
+                flagged[column] = per_hour
+        return flagged
+
+    def summary(self):
+        """ Text for the diagnostics panel and console: latest values and flagged growth """
+        with self._lock:
+            latest = {column: values[-1] for column, values in self.series.items() if values}
+            count = len(self.series["time"])
+        lines = [f"Soak: {count} samples, " + ", ".join(f"{c} {v:.1f}" for c, v in latest.items() if c != "time" and v is not None)]
+        for column, per_hour in self.growth().items():
+            lines.append(f"GROWING: {column} +{per_hour:.3g}/h")
+        lines += self.top_growth[:5]
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # A deliberate leak: one list grows every sample, the monitor should flag gc_objects and traced memory
+    from clock_lib import VirtualClock
+    clock = VirtualClock()
+    leak = []
+    monitor = SoakMonitor(interval=600, trace_frames=1, clock=clock)
+
+    def soak():
+        monitor.start()
+        for _ in range(24 * 6):
+            leak.extend([object() for _ in range(100)] + [bytearray(50000)])
+            clock.sleep(600)
+        monitor.stop(wait=True)
+
+    clock.run(soak)
+    print(monitor.summary())
@@ -0,0 +1,276 @@
+import os
+import sys
+import json
+import time
+import queue
+import signal
+import asyncio
+import argparse
+import multiprocessing
+from profile_file_lib import DEFAULT_PROFILE
+
+# A rig that has not reported for this long is shown as stalled
+STALL_SECONDS = 10.0
+
+# Keys of a rig entry in the rigs file and their defaults
+RIG_DEFAULTS = {
+    "profile": DEFAULT_PROFILE,
+    "megatron": False,
+    "can_channel": None,
+    "com_port": "COM6",
+    "channels": [],
+    "log_dir": "",
+    "log_name": "",  # defaults to the rig name
+    "journal": None,  # defaults to checkpoint.journal in log_dir
+    "no_log": False,
+    "resume": False,
+    "telemetry_port": 0,
+    "sample_ring": "",
+    "watchdog_interval": 10.0,
+    "asyncio": False,
+}
+
+
+def load_rigs(path):
+    """ Read and check a rigs file: {"rigs": [{"name": ..., <RIG_DEFAULTS keys>}, ...]}, raises ValueError """
+    with open(path) as file:
+        data = json.load(file)
+    rigs = []
+    for i, entry in enumerate(data.get("rigs", [])):
+        if not isinstance(entry, dict) or not entry.get("name"):
+            raise ValueError(f"rigs[{i}] needs a 'name'")
+        unknown = set(entry) - set(RIG_DEFAULTS) - {"name"}
+        if unknown:
+            raise ValueError(f"rigs[{i}] has unknown keys {sorted(unknown)}")
+        rig = dict(RIG_DEFAULTS, **entry)
+        if rig["journal"] is None:
+            rig["journal"] = os.path.join(rig["log_dir"], "checkpoint.journal")
+        if not rig["log_name"]:
+            rig["log_name"] = rig["name"]
+        if rig["can_channel"] is None:
+            rig["can_channel"] = 1 if rig["megatron"] else 0
+        rigs.append(rig)
+    if not rigs:
+        raise ValueError(f"No rigs in '{path}'")
+
+    # Rigs run at the same time, so nothing they write to or drive may be shared
+    for key in ("name", "can_channel", "journal"):
+        values = [rig[key] for rig in rigs]
+        if len(set(values)) != len(values):
+            raise ValueError(f"Every rig needs its own '{key}'")
+    # Rigs start in the same second, log files (<timestamp>_<log name>, its _cycles.bin, _Crash) would collide
+    logs = [(os.path.abspath(rig["log_dir"]), rig["log_name"]) for rig in rigs]
+    if len(set(logs)) != len(logs):
+        raise ValueError("Rigs sharing a 'log_dir' need different 'log_name's")
+    ports = [rig["com_port"] for rig in rigs if not rig["megatron"]]
+    if len(set(ports)) != len(ports):
+        raise ValueError("Every rig with a Julabo needs its own 'com_port'")
+    for key in ("telemetry_port", "sample_ring"):
+        values = [rig[key] for rig in rigs if rig[key]]
+        if len(set(values)) != len(values):
+            raise ValueError(f"Every rig needs its own '{key}'")
+    return rigs
+
+
+def rig_argv(rig):
+    """ headless.py arguments for a rig entry """
+    argv = ["--profile", rig["profile"], "--com-port", rig["com_port"], "--can-channel", str(rig["can_channel"]),
+            "--log-dir", rig["log_dir"], "--log-name", rig["log_name"], "--journal", rig["journal"]]
+    if rig["channels"]:
+        argv += ["--channels"] + list(rig["channels"])
+    if rig["telemetry_port"]:
+        argv += ["--telemetry-port", str(rig["telemetry_port"])]
+    if rig["sample_ring"]:
+        argv += ["--sample-ring", rig["sample_ring"]]
+    argv += ["--watchdog-interval", str(rig["watchdog_interval"])]
+    for flag in ("megatron", "no_log", "resume", "asyncio"):
+        if rig[flag]:
+            argv.append("--" + flag.replace("_", "-"))
+    return argv
+
+
+def rig_process(name, argv, status, commands):
+    """ Child process: one TestEngine driving one rig through headless.run/run_async, reporting to the
+    supervisor through status. Ctrl+C is ignored here, the supervisor turns it into a pause command """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from headless import parse_args, build_engine, start_outputs, run, run_async
+    from engine_lib import EngineError
+
+    args = parse_args(argv)
+    if args.log_dir:
+        os.makedirs(args.log_dir, exist_ok=True)
+    # Each rig gets its own console log instead of interleaving with the others
+    sys.stdout = sys.stderr = open(os.path.join(args.log_dir, f"{name}_console.txt"), "a", buffering=1)
+
+    def forward(event, data):
+        if event == "counts":
+            status.put((name, "counts", data))
+        elif event == "alarm":
+            status.put((name, "alarm", {"action": data["alarm"].action, "message": str(data["alarm"])}))
+        elif event in ("state", "finished"):
+            status.put((name, event, data))
+
+    def on_tick():
+        """ Heartbeat every acquisition period, True when the supervisor asked for a pause """
+        status.put((name, "heartbeat", {"values": dict(engine.latest_values)}))
+        try:
+            command = commands.get_nowait()
+        except queue.Empty:
+            return False
+        return command in ("pause", "stop")
+
+    try:
+        engine = build_engine(args)
+    except EngineError as e:
+        status.put((name, "error", {"message": str(e)}))
+        return
+    engine.add_listener(forward)
+    closers = start_outputs(engine, args)
+
+    try:
+        if args.asyncio:
+            asyncio.run(run_async(engine, args.watchdog_interval, on_tick))
+        else:
+            run(engine, args.watchdog_interval, on_tick)
+    except EngineError as e:
+        status.put((name, "error", {"message": str(e)}))
+    finally:
+        for close in closers:
+            close()
+        status.put((name, "exited", {}))
+
+
+class RigSupervisor:
+    """ Runs one process per rig and keeps the latest status of each.
+
+    Rigs only share the status queue, so a crash or stall in one rig's process cannot stop the others;
+    its journal lets restart() resume it where it left off.
+    """
+    def __init__(self, rigs):
+        self.rigs = {rig["name"]: rig for rig in rigs}
+        self._context = multiprocessing.get_context("spawn")
+        self._status = self._context.Queue()
+        self.processes = {}
+        self._commands = {}
+        self.status = {}
+
+    def start(self, name=None):
+        """ Start one rig or every rig """
+        for rig_name in ([name] if name else self.rigs):
+            self._launch(rig_name, self.rigs[rig_name])
+
+    def _launch(self, name, rig):
+        commands = self._context.Queue()
+        process = self._context.Process(target=rig_process, args=(name, rig_argv(rig), self._status, commands),
+                                        name=f"rig-{name}", daemon=False)
+        process.start()
+        self.processes[name] = process
+        self._commands[name] = commands
+        self.status[name] = {"state": "starting", "counts": None, "alarm": "", "values": {}, "last_seen": time.monotonic()}
+
+    def restart(self, name):
+        """ Relaunch a rig whose process ended, resuming from its checkpoint journal """
+        process = self.processes.get(name)
+        if process is not None and process.is_alive():
+            return False
+        self._launch(name, dict(self.rigs[name], resume=True))
+        return True
+
+    def poll(self):
+        """ Apply every queued status message, returns how many there were """
+        count = 0
+        while True:
+            try:
+                name, event, data = self._status.get_nowait()
+            except queue.Empty:
+                break
+            count += 1
+            status = self.status[name]
+            status["last_seen"] = time.monotonic()
+            if event == "counts":
+                status["counts"] = data
+            elif event == "heartbeat":
+                status["values"] = data["values"]
+                if status["state"] == "starting":
+                    status["state"] = "running"
+            elif event == "state":
+                status["state"] = "running" if data["active"] else "paused"
+            elif event == "alarm":
+                status["alarm"] = f"{data['action']}: {data['message']}"
+            elif event == "error":
+                status["state"] = "error"
+                status["alarm"] = data["message"]
+            elif event in ("finished", "exited") and status["state"] not in ("error", "paused"):
+                status["state"] = "finished" if event == "finished" else "exited"
+
+        for name, process in self.processes.items():
+            status = self.status[name]
+            if not process.is_alive() and process.exitcode not in (0, None):
+                status["state"] = f"died (exit {process.exitcode})"
+            elif process.is_alive() and time.monotonic() - status["last_seen"] > STALL_SECONDS:
+                status["state"] = "stalled"
+        return count
+
+    def status_table(self):
+        """ One line per rig: state, cycle counts, last alarm """
+        lines = [f"{'rig':<12} {'state':<16} {'pressure':>17} {'fluid':>9} {'chamber':>9}  alarm"]
+        for name, status in self.status.items():
+            counts = status["counts"]
+            if counts:
+                pressure = f"{counts['pressure']}/{counts['pressure_total']}"
+                fluid = f"{counts['fluid']}/{counts['fluid_total']}"
+                chamber = f"{counts['chamber']}/{counts['chamber_total']}"
+            else:
+                pressure = fluid = chamber = "-"
+            lines.append(f"{name:<12} {status['state']:<16} {pressure:>17} {fluid:>9} {chamber:>9}  {status['alarm']}")
+        return "\n".join(lines)
+
+    def stop(self, name=None, timeout=10.0):
+        """ Pause and close one rig or every rig, terminating any that do not exit in time """
+        names = [name] if name else list(self.processes)
+        for rig_name in names:
+            if self.processes[rig_name].is_alive():
+                self._commands[rig_name].put("stop")
+        deadline = time.monotonic() + timeout
+        for rig_name in names:
+            process = self.processes[rig_name]
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                print(f"Rig '{rig_name}' did not stop, terminating")
+                process.terminate()
+                process.join()
+        self.poll()
+
+    @property
+    def running(self):
+        return any(process.is_alive() for process in self.processes.values())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run several rigs at once, one process per rig")
+    parser.add_argument("rigs", help="rigs JSON file, see rigs_example.json")
+    parser.add_argument("--refresh", type=float, default=2.0, help="seconds between status table updates")
+    args = parser.parse_args(argv)
+
+    try:
+        rigs = load_rigs(args.rigs)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    supervisor = RigSupervisor(rigs)
+    supervisor.start()
+    try:
+        while supervisor.running:
+            time.sleep(args.refresh)
+            supervisor.poll()
+            print(supervisor.status_table() + "\n")
+    except KeyboardInterrupt:
+        print("Interrupted, pausing every rig")
+        supervisor.stop()
+    print(supervisor.status_table())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,497 @@
+""" Full-rate acquisition from the TDMS files FlexLogger logs, read incrementally while it writes them.
+
+TdmsTail parses new segments of a growing TDMS file into NumPy arrays (plain NumPy, no TDMS package);
+TdmsSource follows the newest log file of a folder in a thread and serves the engine: the latest value
+of every channel for the polls, the min/max since the last poll for the plots and every sample of the
+waveform channel for the cycle features. TdmsWriter writes synthetic files the same way for testing.
+"""
+import os
+import glob
+import math
+import time
+import struct
+import threading
+import xml.etree.ElementTree as ET
+from collections import deque
+import numpy as np
+from align_lib import SourceClock
+
+LEAD_IN = struct.Struct("<4sIIQQ")  # tag, table of contents flags, version, next segment offset, raw data offset
+TOC_METADATA = 1 << 1
+TOC_NEW_OBJECT_LIST = 1 << 2
+TOC_RAW_DATA = 1 << 3
+TOC_INTERLEAVED = 1 << 5
+TOC_BIG_ENDIAN = 1 << 6
+TOC_DAQMX_RAW = 1 << 7
+NO_RAW_DATA = 0xFFFFFFFF
+SAME_RAW_INDEX = 0x00000000
+OPEN_SEGMENT = 0xFFFFFFFFFFFFFFFF  # next segment offset of a segment still being written (or cut short)
+TDMS_EPOCH = -2082844800  # 1904-01-01 UTC in unix seconds
+
+# TDMS data type code: NumPy type (little-endian)
+DATA_TYPES = {1: "i1", 2: "i2", 3: "i4", 4: "i8", 5: "u1", 6: "u2", 7: "u4", 8: "u8",
+              9: "f4", 10: "f8", 0x19: "f4", 0x1A: "f8", 0x21: "u1", 0x44: "V16"}
+STRING = 0x20
+TIMESTAMP = 0x44
+
+
+class TdmsError(Exception):
+    """ Raised for a TDMS file this reader cannot parse """
+
+
+class _Object:
+    """ One object path (file, group or channel) with its properties and raw data layout """
+    def __init__(self, path):
+        self.path = path
+        self.properties = {}
+        self.dtype = None  # NumPy dtype of its raw data, None if it has none
+        self.count = 0  # values per chunk
+        self.size = 0  # bytes per chunk
+        self.samples = 0  # values read so far
+
+
+class TdmsTail:
+    """ Incremental reader of one TDMS file that may still be growing.
+
+    read() parses whatever complete data was appended since the last call and returns it as
+    {object path: array}. A segment still being written is read chunk by chunk as its data arrives,
+    so it works with writers that grow the last segment in place as well as with ones that append
+    segments. The metadata carries over between segments as in the TDMS format (object list, raw
+    data index reuse). Properties of every object (wf_start_time, wf_increment ...) are in objects.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.objects = {}
+        self.segments = 0
+        self._file = open(path, "rb")
+        self._offset = 0  # start of the segment being read
+        self._raw = []  # objects with raw data in the current segment, in order
+        self._interleaved = False
+        self._segment = None  # (data start, data end or None while open, chunk size, bytes consumed)
+
+    def close(self):
+        self._file.close()
+
+    @staticmethod
+    def channel_name(path):
+        """ Channel name of an object path like /'Group'/'PRESSURE 1 PSI', None for the file and groups """
+        parts = path.split("/'")
+        return parts[2].rstrip("'").replace("''", "'") if len(parts) == 3 else None
+
+    def read(self):
+        """ New data since the last call, {path: array}; blocks of one object from several segments are joined """
+        blocks = {}
+        size = os.fstat(self._file.fileno()).st_size
+        while True:
+            if self._segment is None and not self._open_segment(size):
+                break
+            if not self._read_chunks(size, blocks):
+                break
+        return {path: parts[0] if len(parts) == 1 else np.concatenate(parts) for path, parts in blocks.items()}
+
+    def _open_segment(self, size):
+        """ Parse the lead-in and metadata of the next segment, False if they are not complete yet """
+        if size - self._offset < LEAD_IN.size:
+            return False
+        self._file.seek(self._offset)
+        tag, toc, version, next_offset, raw_offset = LEAD_IN.unpack(self._file.read(LEAD_IN.size))
+        if tag != b"TDSm":
+            raise TdmsError(f"{self.path}: no segment at byte {self._offset}")
+        if toc & TOC_BIG_ENDIAN:
+            raise TdmsError(f"{self.path}: big-endian segments are not supported")
+        data_start = self._offset + LEAD_IN.size + raw_offset
+        if data_start > size:
+            return False  # metadata not fully written yet
+        if toc & TOC_METADATA:
+            self._file.seek(self._offset + LEAD_IN.size)
+            self._read_metadata(self._file.read(raw_offset), toc & TOC_NEW_OBJECT_LIST)
+        if toc & TOC_DAQMX_RAW:
+            raise TdmsError(f"{self.path}: DAQmx raw data segments are not supported")
+        data_end = None if next_offset == OPEN_SEGMENT else self._offset + LEAD_IN.size + next_offset
+        chunk = sum(obj.size for obj in self._raw) if toc & TOC_RAW_DATA else 0
+        self._interleaved = bool(toc & TOC_INTERLEAVED)
+        self._segment = (data_start, data_end, chunk, 0)
+        self.segments += 1
+        return True
+
+    def _read_metadata(self, data, new_list):
+        position = 0
+
+        def unpack(fmt):
+            nonlocal position
+            values = struct.unpack_from(fmt, data, position)
+            position += struct.calcsize(fmt)
+            return values[0] if len(values) == 1 else values
+
+        def string():
+            nonlocal position
+            length = unpack("<I")
+            position += length
+            return data[position - length:position].decode("utf-8")
+
+        if new_list:
+            self._raw = []
+        for _ in range(unpack("<I")):
+            path = string()
+            obj = self.objects.get(path)
+            if obj is None:
+                obj = self.objects[path] = _Object(path)
+            index = unpack("<I")
+            if index == NO_RAW_DATA:
+                if obj in self._raw:
+                    self._raw.remove(obj)
+            else:
+                if index != SAME_RAW_INDEX:
+                    if index in (0x69120000, 0x69130000):
+                        raise TdmsError(f"{self.path}: DAQmx raw data of '{path}' is not supported")
+                    code, dimension, obj.count = unpack("<IIQ")
+                    if code == STRING:
+                        unpack("<Q")
+                        raise TdmsError(f"{self.path}: string channel '{path}' is not supported")
+                    if code not in DATA_TYPES:
+                        raise TdmsError(f"{self.path}: unknown data type {code:#x} of '{path}'")
+                    obj.dtype = np.dtype("<" + DATA_TYPES[code])
+                    obj.size = obj.count * obj.dtype.itemsize
+                if obj not in self._raw:
+                    self._raw.append(obj)
+            for _ in range(unpack("<I")):
+                name = string()
+                code = unpack("<I")
+                if code == STRING:
+                    value = string()
+                elif code == TIMESTAMP:
+                    fraction, seconds = unpack("<Qq")
+                    value = TDMS_EPOCH + seconds + fraction / 2 ** 64  # unix seconds
+                elif code in DATA_TYPES:
+                    value = np.frombuffer(data, dtype="<" + DATA_TYPES[code], count=1, offset=position)[0].item()
+                    position += np.dtype(DATA_TYPES[code]).itemsize
+                else:
+                    raise TdmsError(f"{self.path}: unknown property type {code:#x} of '{path}'")
+                obj.properties[name] = value
+
+    def _read_chunks(self, size, blocks):
+        """ Whole chunks of the current segment that are on disk; True once the segment is done """
+        data_start, data_end, chunk, consumed = self._segment
+        if data_end is None:  # still open: the lead-in gets its real length when the segment is closed
+            self._file.seek(self._offset)
+            next_offset = LEAD_IN.unpack(self._file.read(LEAD_IN.size))[3]
+            if next_offset != OPEN_SEGMENT:
+                data_end = self._offset + LEAD_IN.size + next_offset
+        end = min(size, data_end) if data_end is not None else size
+        chunks = (end - data_start - consumed) // chunk if chunk else 0
+        if chunks:
+            self._file.seek(data_start + consumed)
+            raw = self._file.read(chunks * chunk)
+            consumed += chunks * chunk
+            self._decode(raw, chunks, blocks)
+        if data_end is not None and (not chunk or data_start + consumed + chunk > data_end):
+            self._offset = data_end  # done (a trailing partial chunk would be a writer error, skip it)
+            self._segment = None
+            return True
+        self._segment = (data_start, data_end, chunk, consumed)
+        return False
+
+    def _decode(self, raw, chunks, blocks):
+        if self._interleaved:
+            layout = np.dtype([(str(i), obj.dtype) for i, obj in enumerate(self._raw)])
+            records = np.frombuffer(raw, dtype=layout)
+            for i, obj in enumerate(self._raw):
+                self._add(blocks, obj, records[str(i)])
+            return
+        position = 0
+        values = [[] for _ in self._raw]
+        for _ in range(chunks):
+            for i, obj in enumerate(self._raw):
+                values[i].append(np.frombuffer(raw, dtype=obj.dtype, count=obj.count, offset=position))
+                position += obj.size
+        for obj, parts in zip(self._raw, values):
+            self._add(blocks, obj, parts[0] if len(parts) == 1 else np.concatenate(parts))
+
+    @staticmethod
+    def _add(blocks, obj, array):
+        if obj.dtype.kind == "V":  # timestamps: (fraction, seconds) pairs to unix seconds
+            pairs = array.view([("fraction", "<u8"), ("seconds", "<i8")])
+            array = TDMS_EPOCH + pairs["seconds"] + pairs["fraction"] / 2 ** 64
+        obj.samples += len(array)
+        blocks.setdefault(obj.path, []).append(array)
+
+
+class TdmsWriter:
+    """ Writes float64 waveform channels of one group the way a logger does, for tests and demos.
+
+    The first write() puts the whole object list (with wf_start_time and wf_increment) into the
+    segment, later writes with the same block length only a lead-in and raw data, other lengths a new
+    raw data index. open_segment(), append() and close_segment() instead grow one segment in place.
+    """
+    def __init__(self, path, group, channels, increment, start_time=None):
+        self.path = path
+        self.group = group
+        self.channels = list(channels)
+        self.increment = increment
+        self.start_time = time.time() if start_time is None else start_time
+        self._file = open(path, "wb")
+        self._count = None  # values per channel in the last segment's index
+        self._open = None  # file position of the open segment's lead-in
+
+    @staticmethod
+    def _string(text):
+        data = text.encode("utf-8")
+        return struct.pack("<I", len(data)) + data
+
+    def _channel_path(self, channel):
+        return f"/'{self.group}'/'{channel}'"
+
+    def _metadata(self, count):
+        """ Metadata and table of contents flags for blocks of count values per channel """
+        if self._count is None:
+            seconds = int(self.start_time // 1)
+            fraction = int((self.start_time - seconds) * 2 ** 64)
+            objects = [self._string("/") + struct.pack("<II", NO_RAW_DATA, 0),
+                       self._string(f"/'{self.group}'") + struct.pack("<II", NO_RAW_DATA, 0)]
+            for channel in self.channels:
+                objects.append(self._string(self._channel_path(channel)) + struct.pack("<IIIQ", 20, 10, 1, count) +
+                               struct.pack("<I", 2) +
+                               self._string("wf_start_time") + struct.pack("<IQq", TIMESTAMP, fraction, seconds - TDMS_EPOCH) +
+                               self._string("wf_increment") + struct.pack("<Id", 10, self.increment))
+            toc = TOC_METADATA | TOC_NEW_OBJECT_LIST | TOC_RAW_DATA
+        elif count != self._count:
+            objects = [self._string(self._channel_path(channel)) + struct.pack("<IIIQI", 20, 10, 1, count, 0)
+                       for channel in self.channels]
+            toc = TOC_METADATA | TOC_RAW_DATA
+        else:
+            return b"", TOC_RAW_DATA
+        self._count = count
+        return struct.pack("<I", len(objects)) + b"".join(objects), toc
+
+    def write(self, block):
+        """ One segment with block[i] (equal length arrays) as the next values of channel i """
+        block = [np.asarray(values, dtype="<f8") for values in block]
+        metadata, toc = self._metadata(len(block[0]))
+        raw = b"".join(values.tobytes() for values in block)
+        self._file.write(LEAD_IN.pack(b"TDSm", toc, 4713, len(metadata) + len(raw), len(metadata)) + metadata + raw)
+        self._file.flush()
+
+    def open_segment(self, count):
+        """ Start a segment of chunks of count values per channel that append() grows until close_segment() """
+        metadata, toc = self._metadata(count)
+        self._open = self._file.tell()
+        self._file.write(LEAD_IN.pack(b"TDSm", toc, 4713, OPEN_SEGMENT, len(metadata)) + metadata)
+        self._file.flush()
+
+    def append(self, block):
+        self._file.write(b"".join(np.asarray(values, dtype="<f8").tobytes() for values in block))
+        self._file.flush()
+
+    def close_segment(self):
+        """ Give the open segment its real length """
+        if self._open is not None:
+            end = self._file.tell()
+            self._file.seek(self._open + 12)
+            self._file.write(struct.pack("<Q", end - self._open - LEAD_IN.size))
+            self._file.seek(end)
+            self._file.flush()
+            self._open = None
+
+    def close(self):
+        self.close_segment()
+        self._file.close()
+
+
+def log_directory(project_dir):
+    """ Folder FlexLogger logs the project's TDMS files to, from its Logging Specification.flxcfg """
+    root = ET.parse(os.path.join(project_dir, "Logging Specification.flxcfg")).getroot()
+    for element in root.iter():
+        path = element.get("LogFileBasePath")
+        if path:
+            return path.strip('"').replace("\\\\", "\\")
+    raise TdmsError(f"No log file path in the logging specification of {project_dir}")
+
+
+class TdmsSource:
+    """ Tails the newest FlexLogger log file under path (a .tdms file or a folder searched recursively)
+    in a thread and keeps what the engine takes from it.
+
+    Sample times are unix seconds from each channel's wf_start_time and wf_increment, moved onto the
+    host monotonic timebase with a SourceClock (smallest file delay seen), so they line up with the
+    pump edges. waveform_channels keep every sample, at most capacity blocks each, until taken.
+    Values older than max_age seconds (FlexLogger stopped logging, or the file could not be parsed
+    further) are not handed out, the engine then reads FlexLogger directly.
+    """
+    def __init__(self, path, waveform_channels=(), interval=0.1, capacity=1000, max_age=5.0):
+        self.path = path
+        self.waveform_channels = set(waveform_channels)
+        self.interval = interval
+        self.max_age = max_age
+        self.clock = SourceClock("tdms")
+        self.file = None
+        self.samples = 0
+        self.errors = 0
+        self.arrived = None  # monotonic time the last samples were read from the file
+        self.stale = False
+        self._latest = {}
+        self._spans = {}
+        self._blocks = {name: deque(maxlen=capacity) for name in self.waveform_channels}
+        self._lock = threading.Lock()
+        self._tail = None
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="tdms-tail", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        if self._thread is not None:
+            self._thread.join()
+        if self._tail is not None:
+            self._tail.close()
+
+    def channels(self):
+        """ Channel names seen in the file so far """
+        with self._lock:
+            return list(self._latest)
+
+    def poll(self):
+        """ Latest value of every channel, {name: float}; empty while there is no sample newer than max_age """
+        with self._lock:
+            if self.arrived is None:
+                return {}
+            stale = time.monotonic() - self.arrived > self.max_age
+            if stale != self.stale:
+                print(f"Warning: no samples from '{self.file}' for {self.max_age:g} s, reading FlexLogger directly" if stale
+                      else f"Streaming '{self.file}' again")
+                self.stale = stale
+            return {} if stale else dict(self._latest)
+
+    def take_spans(self):
+        """ {name: (min, max)} of every channel since the last call """
+        with self._lock:
+            spans, self._spans = self._spans, {}
+        return spans
+
+    def take_blocks(self, name):
+        """ [(monotonic times, values)] of a waveform channel since the last call """
+        with self._lock:
+            blocks = list(self._blocks[name])
+            self._blocks[name].clear()
+        return blocks
+
+    def _newest_file(self):
+        if os.path.isfile(self.path):
+            return self.path
+        files = glob.glob(os.path.join(self.path, "**", "*.tdms"), recursive=True)
+        return max(files, key=os.path.getmtime) if files else None
+
+    def _run(self):
+        next_check = 0.0
+        while not self._stopped:
+            now = time.monotonic()
+            if now >= next_check:  # FlexLogger starts a new file per test, follow it
+                next_check = now + 5.0
+                newest = self._newest_file()
+                if newest is not None and newest != self.file:
+                    if self._tail is not None:
+                        self._tail.close()
+                    print(f"Streaming FlexLogger log '{newest}'")
+                    self.file, self._tail = newest, TdmsTail(newest)
+            if self._tail is not None:
+                try:
+                    self._take(self._tail.read(), time.monotonic())
+                except OSError as e:  # share or disk glitch, try again
+                    self.errors += 1
+                    print(f"Warning: reading '{self.file}' failed: {e}")
+                    time.sleep(1.0)
+                except TdmsError as e:  # the rest of this file cannot be parsed, wait for the next one
+                    self.errors += 1
+                    print(f"Error: {e}, no longer streaming it")
+                    self._tail.close()
+                    self._tail = None
+                    with self._lock:
+                        self.arrived = -math.inf  # what was read from it is stale now
+            time.sleep(self.interval)
+
+    def _take(self, blocks, arrived):
+        tail = self._tail
+        for path, values in blocks.items():
+            name = tail.channel_name(path)
+            if name is None or not len(values) or values.dtype.kind not in "iuf":
+                continue
+            values = values.astype(np.float64, copy=False)
+            obj = tail.objects[path]
+            start = obj.properties.get("wf_start_time")
+            increment = obj.properties.get("wf_increment")
+            first = obj.samples - len(values)
+            times = None
+            if start is not None and increment:
+                unix = start + (first + np.arange(len(values))) * increment
+                self.clock.to_host(arrived, unix[-1])
+                times = unix + self.clock.offset
+            elif name in self.waveform_channels:  # no timing in the file, spread over the read interval
+                times = np.linspace(arrived - self.interval, arrived, len(values), endpoint=False)
+            self.samples += len(values)
+            with self._lock:
+                self.arrived = arrived
+                self._latest[name] = float(values[-1])
+                lo, hi = float(values.min()), float(values.max())
+                if name in self._spans:
+                    lo, hi = min(lo, self._spans[name][0]), max(hi, self._spans[name][1])
+                self._spans[name] = (lo, hi)
+                if name in self.waveform_channels:
+                    self._blocks[name].append((times, values))
+
+
+if __name__ == "__main__":
+    # A synthetic 1 kHz log written in 100 ms segments (and one segment grown in place) tailed while it grows
+    import tempfile
+
+    workdir = tempfile.mkdtemp(prefix="tdms_")
+    path = os.path.join(workdir, "Log.tdms")
+    channels = ["PRESSURE 1 PSI", "PRESSURE 2 PSI", "CHAMBER TEMP (C)"]
+    rate, seconds = 1000, 3
+    writer = TdmsWriter(path, "Group", channels, 1 / rate)
+
+    def signal(n0, n):
+        t = (n0 + np.arange(n)) / rate
+        pressure = np.where(t % 2 < 1, 35.0, 5.0)
+        return [pressure, pressure + 0.5, 22 + 0.01 * t]
+
+    written = [0]
+
+    def log():
+        n = 0
+        while n < seconds * rate:
+            if n == rate:  # one segment that grows in place
+                writer.open_segment(50)
+                for _ in range(4):
+                    writer.append(signal(n, 50))
+                    n += 50
+                    time.sleep(0.05)
+                writer.close_segment()
+            size = 100 if n < 2 * rate else 137  # other lengths make the writer send a new raw index
+            writer.write(signal(n, size))
+            n += size
+            written[0] = n
+            time.sleep(size / rate)
+        writer.close()
+
+    source = TdmsSource(workdir, waveform_channels=["PRESSURE 1 PSI"], interval=0.05)
+    thread = threading.Thread(target=log)
+    thread.start()
+    source.start()
+    received = []
+    while thread.is_alive():
+        time.sleep(0.5)
+        blocks = source.take_blocks("PRESSURE 1 PSI")
+        received.extend(blocks)
+        print(f"{sum(len(v) for _, v in blocks)} samples, latest {source.poll()}, spans {source.take_spans()}")
+    time.sleep(0.3)
+    received.extend(source.take_blocks("PRESSURE 1 PSI"))
+    source.stop()
+
+    values = np.concatenate([v for _, v in received])
+    times = np.concatenate([t for t, _ in received])
+    expected = signal(0, len(values))[0]
+    print(f"{len(values)} of {written[0]} samples in {source._tail.segments} segments, "
+          f"values {'match' if np.array_equal(values, expected) else 'DIFFER'}, "
+          f"sample spacing {np.diff(times).mean() * 1000:.3f} ms")
@@ -0,0 +1,305 @@
+import json
+import itertools
+import math
+import time
+import socket
+import struct
+import threading
+from collections import deque
+import numpy as np
+
+DEFAULT_PORT = 8765
+
+# Frame: header then payload_length bytes of payload, little endian
+HEADER = struct.Struct("<IBQd")  # payload length, frame type, sequence, sender wall time
+HELLO = struct.Struct("<d")  # optional client request after connecting: max sample batches per second, 0 = all
+
+CHANNELS = 1  # payload: JSON list of channel names, sent on connect and whenever they change
+SAMPLES = 2   # payload: uint16 rows, then rows x (1 + channels) float64 (time followed by values)
+COUNTS = 3    # payload: 6 uint32, pressure, pressure total, fluid, fluid total, chamber, chamber total
+ALARM = 4     # payload: JSON {"action", "message"}
+STATE = 5     # payload: uint8 test active
+FRAME_NAMES = {CHANNELS: "channels", SAMPLES: "samples", COUNTS: "counts", ALARM: "alarm", STATE: "state"}
+
+_ROWS = struct.Struct("<H")
+_COUNTS = struct.Struct("<6I")
+
+
+class Subscriber:
+    """ One connected client with its own send thread and bounded queue.
+
+    Publishing never blocks on the client: counts are coalesced to the latest, sample batches are
+    thinned to the client's requested rate and dropped when the queue is backed up, channels,
+    alarms and state frames are always delivered. A client that stops reading is disconnected.
+    """
+    def __init__(self, server, sock, address):
+        self.server = server
+        self.sock = sock
+        self.address = address
+        self.max_hz = 0.0
+        self.dropped = 0
+        self.sent = 0
+        self.connected = True
+        self._queue = deque()
+        self._counts = None
+        self._last_samples = 0.0
+        self._cond = threading.Condition()
+        self.thread = threading.Thread(target=self._run, name=f"telemetry-{address}", daemon=True)
+
+    def offer(self, frame_type, frame):
+        """ Queue a frame according to the backpressure policy (any thread, returns at once) """
+        with self._cond:
+            if frame_type == COUNTS:
+                self._counts = frame
+            elif frame_type == SAMPLES:
+                now = time.monotonic()
+                if (self.max_hz and now - self._last_samples < 1 / self.max_hz) or len(self._queue) >= self.server.max_queue:
+                    self.dropped += 1
+                    return
+                self._last_samples = now
+                self._queue.append(frame)
+            else:
+                self._queue.append(frame)
+            self._cond.notify()
+
+    def _run(self):
+        self.sock.settimeout(self.server.send_timeout)
+        self._read_hello()
+        try:
+            while self.connected:
+                with self._cond:
+                    while self.connected and not self._queue and self._counts is None:
+                        self._cond.wait(1.0)
+                    frames = list(self._queue)
+                    self._queue.clear()
+                    if self._counts is not None:
+                        frames.append(self._counts)
+                        self._counts = None
+                if frames:
+                    self.sock.sendall(b"".join(frames))
+                    self.sent += len(frames)
+        except OSError:
+            pass  # client went away or stopped reading for send_timeout
+        finally:
+            self.close()
+
+    def _read_hello(self):
+        """ The client may send a HELLO within a short time of connecting, otherwise it gets every batch """
+        try:
+            self.sock.settimeout(0.5)
+            data = self.sock.recv(HELLO.size)
+            if len(data) == HELLO.size:
+                self.max_hz = max(HELLO.unpack(data)[0], 0.0)
+        except OSError:
+            pass
+        finally:
+            self.sock.settimeout(self.server.send_timeout)
+
+    def close(self):
+        with self._cond:
+            self.connected = False
+            self._cond.notify()
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+        self.server._remove(self)
+
+
+class TelemetryServer:
+    """ Local TCP endpoint streaming sensor batches, cycle counts, alarms and test state to any number of clients.
+
+    Use listener as a TestEngine listener, or call publish_samples() from a faster source.
+    """
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, max_queue=256, send_timeout=10.0):
+        self.host = host
+        self.port = port
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.channels = []
+        self.subscribers = []
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+        self._socket = None
+        self._thread = None
+        self._last_counts = None
+
+    def start(self):
+        """ Start accepting clients, raises OSError if the port is taken """
+        self._socket = socket.create_server((self.host, self.port))
+        self.port = self._socket.getsockname()[1]
+        self._thread = threading.Thread(target=self._accept, name="telemetry-accept", daemon=True)
+        self._thread.start()
+        print(f"Telemetry streaming on {self.host}:{self.port}")
+
+    def _accept(self):
+        while True:
+            try:
+                sock, address = self._socket.accept()
+            except OSError:
+                return  # server closed
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            subscriber = Subscriber(self, sock, address)
+            with self._lock:
+                # New clients get the channel list and latest counts before anything else, so both are
+                # queued before a broadcast can reach them
+                subscriber.offer(CHANNELS, self._frame(CHANNELS, json.dumps(self.channels).encode("utf-8")))
+                if self._last_counts is not None:
+                    subscriber.offer(COUNTS, self._last_counts)
+                self.subscribers.append(subscriber)
+            subscriber.thread.start()
+
+    def _remove(self, subscriber):
+        with self._lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+
+    def _frame(self, frame_type, payload):
+        return HEADER.pack(len(payload), frame_type, next(self._seq), time.time()) + payload
+
+    def _broadcast(self, frame_type, payload):
+        with self._lock:
+            return self._offer_all(frame_type, payload)
+
+    def _offer_all(self, frame_type, payload):
+        """ Frame and queue for every subscriber; the caller holds _lock, so frames from different threads keep their order """
+        frame = self._frame(frame_type, payload)
+        for subscriber in self.subscribers:
+            subscriber.offer(frame_type, frame)  # never blocks
+        return frame
+
+    def set_channels(self, channels):
+        with self._lock:
+            self.channels = list(channels)
+            self._offer_all(CHANNELS, json.dumps(self.channels).encode("utf-8"))
+
+    def publish_samples(self, t, rows):
+        """ Send a batch: t has n times, rows is n x channels in self.channels order """
+        block = np.column_stack([np.asarray(t, dtype=np.float64), np.asarray(rows, dtype=np.float64).reshape(len(t), -1)])
+        self._broadcast(SAMPLES, _ROWS.pack(len(block)) + block.astype("<f8").tobytes())
+
+    def publish_counts(self, data):
+        payload = _COUNTS.pack(data["pressure"], data["pressure_total"], data["fluid"], data["fluid_total"], data["chamber"], data["chamber_total"])
+        with self._lock:
+            self._last_counts = self._offer_all(COUNTS, payload)
+
+    def publish_alarm(self, action, message):
+        self._broadcast(ALARM, json.dumps({"action": action, "message": message}).encode("utf-8"))
+
+    def publish_state(self, active):
+        self._broadcast(STATE, bytes([1 if active else 0]))
+
+    def listener(self, event, data):
+        """ TestEngine listener """
+        if event == "sensors":
+            values = data["values"]
+            if list(values) != self.channels:
+                self.set_channels(values)
+            self.publish_samples([time.time()], [[values.get(channel, math.nan) for channel in self.channels]])
+        elif event == "counts":
+            self.publish_counts(data)
+        elif event == "alarm":
+            self.publish_alarm(data["alarm"].action, str(data["alarm"]))
+        elif event == "state":
+            self.publish_state(data["active"])
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+        with self._lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            subscriber.close()
+
+
+def _recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Telemetry server closed the connection")
+        data += chunk
+    return bytes(data)
+
+
+def read_frames(sock):
+    """ Yield (frame type, sequence, wall time, decoded payload) from a connected socket """
+    channels = []
+    while True:
+        length, frame_type, seq, wall_time = HEADER.unpack(_recv_exact(sock, HEADER.size))
+        payload = _recv_exact(sock, length)
+        if frame_type == CHANNELS:
+            channels = json.loads(payload)
+            value = channels
+        elif frame_type == SAMPLES:
+            rows = _ROWS.unpack_from(payload)[0]
+            value = np.frombuffer(payload, dtype="<f8", offset=_ROWS.size).reshape(rows, len(channels) + 1)
+        elif frame_type == COUNTS:
+            value = dict(zip(("pressure", "pressure_total", "fluid", "fluid_total", "chamber", "chamber_total"),
+                             _COUNTS.unpack(payload)))
+        elif frame_type == ALARM:
+            value = json.loads(payload)
+        elif frame_type == STATE:
+            value = bool(payload[0])
+        else:
+            value = payload
+        yield frame_type, seq, wall_time, value
+
+
+def connect(host="127.0.0.1", port=DEFAULT_PORT, max_hz=0.0):
+    """ Open a client connection, asking for at most max_hz sample batches per second (0 = all) """
+    sock = socket.create_connection((host, port))
+    sock.sendall(HELLO.pack(max_hz))
+    return sock
+
+
+def run_client(host, port, max_hz):
+    """ Tiny console client: prints every frame """
+    sock = connect(host, port, max_hz)
+    channels = []
+    try:
+        for frame_type, seq, wall_time, value in read_frames(sock):
+            if frame_type == CHANNELS:
+                channels = value
+                print(f"[{seq}] channels: {', '.join(channels)}")
+            elif frame_type == SAMPLES:
+                latest = ", ".join(f"{name}={v:.3f}" for name, v in zip(channels, value[-1, 1:]))
+                print(f"[{seq}] {len(value)} rows, latest {latest}")
+            else:
+                print(f"[{seq}] {FRAME_NAMES.get(frame_type, frame_type)}: {value}")
+    except (ConnectionError, KeyboardInterrupt):
+        pass
+    finally:
+        sock.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Telemetry test client, or a demo server with synthetic data")
+    parser.add_argument("mode", choices=["client", "demo"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-hz", type=float, default=0.0, help="client: sample batches per second, 0 for all")
+    args = parser.parse_args()
+
+    if args.mode == "client":
+        run_client(args.host, args.port, args.max_hz)
+    else:
+        # 100 batches/s of 10 rows x 4 channels, counts every second
+        server = TelemetryServer(args.host, args.port)
+        server.start()
+        server.set_channels(["PRESSURE 1 PSI", "PRESSURE 2 PSI", "COOLANT TEMP (C)", "CHAMBER TEMP (C)"])
+        count = 0
+        try:
+            while True:
+                t = time.time() + np.arange(10) * 0.001
+                server.publish_samples(t, 30 + np.random.rand(10, 4))
+                count += 1
+                if count % 100 == 0:
+                    server.publish_counts({"pressure": count // 100, "pressure_total": 444000, "fluid": 0,
+                                           "fluid_total": 54, "chamber": 0, "chamber_total": 48})
+                    print(", ".join(f"{s.address[1]}: sent {s.sent} dropped {s.dropped}" for s in server.subscribers))
+                time.sleep(0.01)
+        except KeyboardInterrupt:
+            server.close()
@@ -1,4 +1,5 @@
 from can_controller_lib import Cantroller
+from engine_lib import pump_cycle
 import time
 import sys
 
@@ -50,14 +51,9 @@ if __name__ == "__main__":
             print("Invalid input, try again.")
 
     while current_cycle < total_cycles:
-
-        controller.set_pump_power(percent)
-        print(f"Pumps to {percent}%")
-        time.sleep(4)
-
-        print("pumps to 0%")    
-        controller.set_pump_power(0)
-        time.sleep(1.27)
+        pump_cycle(controller, percent, 4, 1.27,
+                   on_edge=lambda: print(f"Pumps to {percent}%"),
+                   off_edge=lambda: print("pumps to 0%"))
         current_cycle+=1
     
     controller.stop()
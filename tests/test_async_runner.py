@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+import asyncio
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import engine_lib
+from sim_devices_lib import SimFlexLogger, SimCantroller, SimJulabo
+from async_runner_lib import AsyncTestRunner
+
+
+class HangingJulabo(SimJulabo):
+    """ Power on that takes longer than the Julabo timeout """
+    def set_power_on(self):
+        time.sleep(0.3)
+        super().set_power_on()
+
+
+def test_device_timeout_pauses_every_task():
+    """ A pressure loop that dies on a device timeout pauses the test instead of leaving the timers running """
+    async def run():
+        workdir = tempfile.mkdtemp(prefix="async_runner_")
+        engine = engine_lib.TestEngine(journal_path=os.path.join(workdir, "checkpoint.journal"), log_dir=workdir)
+        engine._flex, engine._cantroller, engine._julabo = SimFlexLogger(6), SimCantroller(), HangingJulabo()
+        engine.sensors = engine._flex.get_sensor_list()
+        engine.flexlogger_connected = engine.canbus_connected = engine.julabo_connected = True
+        engine.total_period, engine.fluid_period, engine.chamber_period = 1 / 3600, 0.1 / 3600, 0.1 / 3600
+        engine.fluid_min_temp, engine.fluid_max_temp, engine.chamber_min_temp, engine.chamber_max_temp = 20, 80, 20, 60
+        engine.pressure_on_time, engine.pressure_off_time, engine.pump_warmup_time = 0.01, 0.01, 0.01
+        engine.pressure_num_cycles = 60
+        engine.build_profile()
+        states = []
+        engine.add_listener(lambda event, data: states.append(data["active"]) if event == "state" else None)
+
+        runner = AsyncTestRunner(engine)
+        runner.bind_devices()
+        runner.julabo.timeout = 0.1
+        runner.start()
+        await asyncio.wait_for(runner.wait(), 5)
+        fluid = engine.fluid_cycle_count
+        await asyncio.sleep(0.3)  # the timers would have counted further intervals by now
+        assert engine.fluid_cycle_count == fluid
+        assert all(task.done() for task in runner._tasks.values())
+        await runner.close()
+        engine.shutdown()
+        return engine, states
+
+    engine, states = asyncio.run(run())
+    assert not engine._test_active
+    assert engine.pressure_cycle_count == 0
+    assert states[-1] is False
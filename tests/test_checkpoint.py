@@ -0,0 +1,58 @@
+import os
+import sys
+import shutil
+import tempfile
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import engine_lib
+import profile_file_lib
+from checkpoint_lib import CheckpointJournal, CheckpointState, FLAG_RUNNING, RECORD_SIZE, recover
+
+
+def test_torn_tail_recovers_last_record():
+    """ A record cut mid-write is ignored by recover() and cut off by open(), so new records stay aligned """
+    path = os.path.join(tempfile.mkdtemp(prefix="checkpoint_"), "checkpoint.journal")
+    journal = CheckpointJournal(path)
+    journal.open(truncate=True)
+    state = CheckpointState(flags=FLAG_RUNNING, log_file_name="log.csv")
+    for cycle in range(1, 6):
+        state.pressure_cycle_count = cycle
+        journal.append(state)
+    journal.close()
+    os.truncate(path, 4 * RECORD_SIZE + RECORD_SIZE // 2)
+
+    assert recover(path).pressure_cycle_count == 4
+    journal.open()
+    assert os.path.getsize(path) == 4 * RECORD_SIZE
+    state.pressure_cycle_count = 7
+    journal.append(state, sync=True)
+    journal.close()
+    assert recover(path).pressure_cycle_count == 7
+    assert recover(path).sequence == 5
+
+
+def test_restore_refuses_edited_profile():
+    """ Counts from a checkpoint only mean something against the profile they were recorded with """
+    workdir = tempfile.mkdtemp(prefix="checkpoint_")
+    profile_path = os.path.join(workdir, "profile.toml")
+    shutil.copy(os.path.join(profile_file_lib.PROFILE_DIR, "thermal_ramp_example.toml"), profile_path)
+    engine = engine_lib.TestEngine(journal_path=os.path.join(workdir, "checkpoint.journal"), log_dir=workdir)
+    engine.load_profile(profile_path)
+    engine.build_profile()
+    engine.write_checkpoint(sync=True)
+    state = engine.pending_checkpoint()
+    assert state.profile_hash == engine.test_profile.content_hash()
+
+    with open(profile_path) as file:
+        text = file.read()
+    with open(profile_path, "w") as file:
+        file.write(text.replace("{ step = 40, hours = 1 }", "{ step = 45, hours = 1 }"))
+    with pytest.raises(engine_lib.EngineError, match="edited"):
+        engine_lib.TestEngine(journal_path=os.path.join(workdir, "other.journal"), log_dir=workdir).restore_checkpoint(state)
+
+    os.remove(profile_path)
+    with pytest.raises(engine_lib.EngineError, match="no longer exists"):
+        engine_lib.TestEngine(journal_path=os.path.join(workdir, "other.journal"), log_dir=workdir).restore_checkpoint(state)
+    engine.shutdown()
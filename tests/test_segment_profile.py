@@ -0,0 +1,72 @@
+import os
+import sys
+import asyncio
+import tempfile
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import engine_lib
+import simulation_lib
+import profile_file_lib
+from sim_devices_lib import SimFlexLogger, SimCantroller, SimJulabo
+from async_runner_lib import AsyncTestRunner
+
+SEGMENT_PROFILE = os.path.join(profile_file_lib.PROFILE_DIR, "thermal_ramp_example.toml")
+
+
+def test_segment_profile_simulation():
+    """ The segment profile runs to the end with the timers on its own interval boundaries """
+    simulation = simulation_lib.TestSimulation(SEGMENT_PROFILE, num_cycles=30000)
+    result = simulation.run()
+    assert result.passed, result.report()
+
+    engine = simulation.engine
+    fluid = engine.fluid_profile
+    assert engine.fluid_cycle_count == 16  # 43.9 active hours pass the first 16 of 17 boundaries
+    assert simulation.julabo.setpoints == [fluid.interval_value(i) for i in range(16)]
+
+
+def test_segment_profile_full_length():
+    """ Pressure outlasting the temperature profile holds the last setpoint instead of repeating intervals """
+    simulation = simulation_lib.TestSimulation(SEGMENT_PROFILE, num_cycles=40000)
+    result = simulation.run(pause_at=20, downtime=1)
+    assert result.passed, result.report()
+    assert simulation.engine.fluid_cycle_count == simulation.engine.fluid_num_cycles == 17
+
+
+def test_segment_profile_async_runner():
+    """ The asyncio timers follow the same boundaries, compressed to fractions of a second """
+    async def run():
+        workdir = tempfile.mkdtemp(prefix="segment_profile_")
+        engine = engine_lib.TestEngine(journal_path=os.path.join(workdir, "checkpoint.journal"), log_dir=workdir)
+        engine._flex, engine._cantroller, engine._julabo = SimFlexLogger(6), SimCantroller(), SimJulabo()
+        engine.sensors = engine._flex.get_sensor_list()
+        engine.flexlogger_connected = engine.canbus_connected = engine.julabo_connected = True
+        engine.load_profile(SEGMENT_PROFILE)
+        engine.test_profile.data["fluid"]["segments"] = [{"step": 20, "seconds": 0.05},
+                                                          {"repeat": 3, "segments": [{"step": 40, "seconds": 0.1}, {"soak": True, "seconds": 0.05}]}]
+        engine.total_period = 1 / 3600
+        engine.pressure_on_time, engine.pressure_off_time, engine.pump_warmup_time = 0.01, 0.01, 0.01
+        engine.pressure_num_cycles = 60
+        engine.build_profile()
+
+        runner = AsyncTestRunner(engine)
+        runner.start()
+        await runner.wait()
+        await runner.close()
+        engine.shutdown()
+        return engine
+
+    engine = asyncio.run(run())
+    assert engine.fluid_num_cycles == 7
+    assert engine.fluid_cycle_count == 7
+    assert engine._julabo.setpoints == [engine.fluid_profile.interval_value(i) for i in range(7)]
+
+
+def test_fluid_ramp_rejected():
+    """ The Julabo gets one setpoint per interval, a fluid ramp would silently run as a step """
+    profile = profile_file_lib.load_test_profile(SEGMENT_PROFILE)
+    data = dict(profile.data, fluid={"segments": [{"step": 20, "hours": 1}, {"ramp": 40, "hours": 1}]})
+    with pytest.raises(profile_file_lib.TestProfileError, match="ramps are not supported"):
+        profile_file_lib.TestProfile(data)
@@ -0,0 +1,376 @@
+""" Model-predictive Julabo setpoint scheduling: get the fluid to each profile temperature sooner and keep count
+of how long it really was there.
+
+The bath is modelled as first order plus dead time (FOPDT): a setpoint change starts to act after
+dead_time, then the temperature closes on it with time constant tau. The model is refitted from the bath
+temperatures read during the test. At each fluid interval the scheduler commands a boost setpoint
+past the target (up to max_overshoot, within the fluid profile's temperature range unless limits say
+otherwise) and switches back to the target just early enough that the bath does not overshoot the band. With a required soak it also starts the next transition early,
+once the current interval's soak is covered.
+"""
+import math
+import threading
+from collections import deque
+import numpy as np
+from async_devices_lib import DeviceError
+
+
+class ThermalModel:
+    """ First order plus dead time bath response, tau and dead_time in seconds """
+    def __init__(self, tau=1800.0, dead_time=60.0):
+        self.tau = tau
+        self.dead_time = dead_time
+
+    def __repr__(self):
+        return f"ThermalModel(tau={self.tau / 60:.1f} min, dead_time={self.dead_time / 60:.1f} min)"
+
+    def trajectory(self, temp, previous_setpoint, commands, duration, dt=10.0):
+        """ Predicted bath temperatures every dt seconds for duration, starting at temp under previous_setpoint;
+        commands are [(seconds from now, setpoint)] in order """
+        steps = int(duration // dt) + 1
+        times = np.arange(steps) * dt
+        effective = np.full(steps, float(previous_setpoint))
+        for at, setpoint in commands:
+            effective[times >= at + self.dead_time] = setpoint
+        decay = math.exp(-dt / self.tau)
+        temps = np.empty(steps)
+        temps[0] = temp
+        for i in range(1, steps):
+            target = effective[i - 1]
+            temps[i] = target + (temps[i - 1] - target) * decay
+        return times, temps
+
+
+def fit_thermal_model(times, temps, setpoints, dead_times=None):
+    """ Least squares FOPDT fit of bath temperatures under commanded setpoints (step held between samples),
+    returns a ThermalModel or None if the data has no transition to fit """
+    times = np.asarray(times, dtype=np.float64)
+    temps = np.asarray(temps, dtype=np.float64)
+    setpoints = np.asarray(setpoints, dtype=np.float64)
+    if len(times) < 20:
+        return None
+    dt = np.diff(times)
+    valid = dt > 0
+    rate = np.diff(temps)[valid] / dt[valid]
+    start_times, start_temps = times[:-1][valid], temps[:-1][valid]
+    if dead_times is None:
+        dead_times = np.arange(0, 31) * 30.0  # 0 to 15 min
+    best = None
+    for dead_time in dead_times:
+        # setpoint acting on each interval: the one commanded dead_time before it started
+        index = np.searchsorted(times, start_times - dead_time, side="right") - 1
+        drive = np.where(index >= 0, setpoints[np.maximum(index, 0)], np.nan) - start_temps
+        usable = ~np.isnan(drive)
+        x, y = drive[usable], rate[usable]
+        energy = float(x @ x)
+        if energy <= 0 or np.ptp(x) < 1.0:
+            continue
+        gain = float(x @ y) / energy
+        if gain <= 0:
+            continue
+        residual = float(np.sum((y - gain * x) ** 2)) / len(x)
+        if best is None or residual < best[0]:
+            best = (residual, gain, dead_time)
+    if best is None:
+        return None
+    return ThermalModel(tau=1.0 / best[1], dead_time=float(best[2]))
+
+
+class TransitionPlan:
+    """ Setpoints for one move of the bath to target; times are clock seconds """
+    def __init__(self, target, boost, start, switch_at, settle_at, plain_settle_at):
+        self.target = target
+        self.boost = boost  # setpoint commanded first (== target without a boost)
+        self.start = start
+        self.switch_at = switch_at  # when to command target, None once sent or without a boost
+        self.settle_at = settle_at  # predicted time the bath is in band
+        self.plain_settle_at = plain_settle_at  # same when only target is commanded
+
+    def shift(self, seconds):
+        """ Move the pending times on by a pause of seconds """
+        self.start += seconds
+        self.settle_at += seconds
+        self.plain_settle_at += seconds
+        if self.switch_at is not None:
+            self.switch_at += seconds
+
+
+class IntervalRecord:
+    """ What the bath did in one fluid interval """
+    def __init__(self, index, target, start, plan):
+        self.index = index
+        self.target = target
+        self.start = start
+        self.end = None
+        self.active = 0.0  # seconds the test ran in this interval
+        self.time_to_band = None  # seconds of active time until the bath was first in band
+        self.at_temperature = 0.0  # seconds in band
+        self.predicted_settle = max(plan.settle_at - start, 0.0)  # model, with the scheduler's setpoints
+        self.plain_settle = plan.plain_settle_at - plan.start  # model, target only sent at the boundary
+        self.transition = plan.settle_at - plan.start  # model, from the first setpoint of the move (early ones included)
+
+    def __str__(self):
+        reached = "never" if self.time_to_band is None else f"{self.time_to_band / 60:.0f} min"
+        return (f"interval {self.index + 1:>3}: {self.target:6.1f} C, in band after {reached} "
+                f"(predicted {self.predicted_settle / 60:.0f}, unscheduled {self.plain_settle / 60:.0f}), "
+                f"at temperature {self.at_temperature / 3600:.2f} of {self.active / 3600:.2f} h")
+
+
+class SetpointScheduler:
+    """ Plans and sends the Julabo setpoints of the fluid profile from a fitted bath model.
+
+    TestEngine.fluid_setpoint calls start_interval at every fluid interval boundary and sends the
+    setpoint it returns; a thread reads the bath temperature every poll seconds, sends the planned
+    follow-up setpoints (back to target after a boost, early start of the next transition), books the
+    time in band and refits the model every refit samples. With control=False it only measures and
+    fits (the plain profile setpoints are sent), for a baseline. soak (seconds) is the time at
+    temperature each interval needs; without it transitions start at the interval boundaries. Boost
+    setpoints stay within limits (low, high), by default the fluid profile's own range; pass (None, None)
+    or a wider range to let them go past it.
+    """
+    def __init__(self, engine, model=None, band=0.5, soak=None, max_overshoot=10.0, limits=None,
+                 control=True, poll=30.0, refit=20, history=20000):
+        self.engine = engine
+        self.clock = engine.clock
+        self.model = model if model is not None else ThermalModel()
+        self.band = band
+        self.soak = soak
+        self.max_overshoot = max_overshoot
+        self.limits = limits
+        self.control = control
+        self.poll = poll
+        self.refit = refit
+        self.intervals = []
+        self.fits = 0
+        self.bath = None  # last bath temperature read
+        self.commanded = None  # last setpoint sent
+        self._samples = deque(maxlen=history)  # (time, bath, setpoint commanded)
+        self._plan = None
+        self._early = None  # next interval's transition, started before its boundary
+        self._lead_at = None
+        self._last_sample = None
+        self._paused_since = None
+        self._lock = threading.Lock()
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        self._thread = self.clock.thread(self._run, name="setpoint-scheduler")
+        self._thread.start()
+
+    def stop(self, wait=False):
+        self._stopped = True
+        if wait and self._thread is not None:
+            self.clock.join(self._thread)
+        with self._lock:
+            self._close_interval()
+
+    def _run(self):
+        while True:
+            self.clock.sleep(self.poll)
+            if self._stopped:
+                return
+            self.update()
+
+    # ----- Planning -----
+
+    def plan(self, temp, previous_setpoint, target, start, horizon):
+        """ TransitionPlan from temp (under previous_setpoint) to target, starting at clock time start,
+        over an interval of horizon seconds """
+        model = self.model
+        plain = self._settle_time(model.trajectory(temp, previous_setpoint, [(0, target)], horizon), target)
+        direction = 1.0 if target > temp else -1.0
+        boost = target + direction * self.max_overshoot
+        low, high = self.boost_limits()
+        boost = max(boost, low) if low is not None else boost
+        boost = min(boost, high) if high is not None else boost
+        if not self.control or abs(target - temp) <= self.band or (boost - target) * direction <= 0:
+            return TransitionPlan(target, target, start, None, start + plain, start + plain)
+
+        # Latest switch back to target that keeps the overshoot within half the band (it grows with the switch time)
+        times, temps = model.trajectory(temp, previous_setpoint, [(0, boost)], horizon)
+        crossed = np.flatnonzero((temps - target) * direction >= 0)
+        low_s, high_s = 0.0, float(times[crossed[0]]) if len(crossed) else horizon
+        for _ in range(20):
+            middle = (low_s + high_s) / 2
+            _, path = model.trajectory(temp, previous_setpoint, [(0, boost), (middle, target)], horizon)
+            if np.max((path - target) * direction) <= self.band / 2:
+                low_s = middle
+            else:
+                high_s = middle
+        switch = low_s
+        settle = self._settle_time(model.trajectory(temp, previous_setpoint, [(0, boost), (switch, target)], horizon), target)
+        if settle >= plain:  # the model sees no gain (slow dead time against the band), keep it simple
+            return TransitionPlan(target, target, start, None, start + plain, start + plain)
+        return TransitionPlan(target, boost, start, start + switch, start + settle, start + plain)
+
+    def boost_limits(self):
+        """ (low, high) setpoints a boost may reach: limits, or the range of the fluid profile """
+        if self.limits is not None:
+            return self.limits
+        profile = self.engine.fluid_profile
+        return (float(min(profile.start_values.min(), profile.end_values.min())),
+                float(max(profile.start_values.max(), profile.end_values.max())))
+
+    def _interval_seconds(self, index):
+        """ Length of fluid interval index, from the compiled profile's boundaries """
+        return self.engine.interval_length(self.engine.fluid_profile, index + 1)
+
+    def _settle_time(self, trajectory, target):
+        times, temps = trajectory
+        inside = np.abs(temps - target) <= self.band
+        outside = np.flatnonzero(~inside)
+        if not len(outside):
+            return 0.0
+        if outside[-1] == len(times) - 1:
+            return float(times[-1])  # not settled within the horizon
+        return float(times[outside[-1] + 1])
+
+    # ----- Engine hooks -----
+
+    def start_interval(self, index, target):
+        """ Fluid interval index (profile value target) begins now, returns the setpoint to send """
+        with self._lock:
+            now = self.clock.time()
+            self._close_interval()
+            if self._early is not None and self._early.target == target:
+                plan = self._early  # transition already under way
+            else:
+                temp = self.bath if self.bath is not None else self._read_bath()
+                if temp is None:
+                    temp = self._previous_target(index)
+                previous = self.commanded if self.commanded is not None else temp
+                plan = self.plan(temp, previous, target, now, self._interval_seconds(index))
+            self._early = None
+            self._plan = plan
+            self.intervals.append(IntervalRecord(index, target, now, plan))
+            self._lead_at = self._plan_lead(index, plan, now)
+            self.commanded = plan.boost if plan.switch_at is not None else target
+            return self.commanded
+
+    def _previous_target(self, index):
+        profile = self.engine.fluid_profile
+        return profile.interval_value(index - 1) if index > 0 else profile.interval_value(index)
+
+    def _read_bath(self):
+        try:
+            self.bath = self.engine.read_bath_temperature()
+        except (OSError, ValueError) as e:  # serial glitch or garbled reply, the watchdog deals with outages
+            print(f"Warning: bath temperature read failed: {e}")
+        return self.bath
+
+    def _plan_lead(self, index, plan, now):
+        """ Clock time to start the next transition, None to wait for the boundary """
+        profile = self.engine.fluid_profile
+        if not self.control or self.soak is None or index + 1 >= profile.num_cycles:
+            return None
+        end = now + self._interval_seconds(index)
+        following = self.plan(plan.target, plan.target, profile.interval_value(index + 1), end, self._interval_seconds(index + 1))
+        lead = min(following.settle_at - end, max(end - plan.settle_at - self.soak, 0.0))
+        return end - lead if lead > 0 else None
+
+    def _close_interval(self):
+        if self.intervals and self.intervals[-1].end is None:
+            self.intervals[-1].end = self.clock.time()
+
+    def update(self):
+        """ One poll: read the bath, book the time in band, send due setpoints, refit """
+        engine = self.engine
+        now = self.clock.time()
+        if not engine._test_active or not engine.julabo_connected:
+            if self._paused_since is None:
+                self._paused_since = now
+            self._last_sample = None
+            return
+        with self._lock:
+            if self._paused_since is not None:  # the interval was stopped as long as the test
+                paused, self._paused_since = now - self._paused_since, None
+                for plan in (self._plan, self._early):
+                    if plan is not None:
+                        plan.shift(paused)
+                if self._lead_at is not None:
+                    self._lead_at += paused
+        temp = self._read_bath()
+        if temp is None:
+            return
+
+        with self._lock:
+            self._samples.append((now, temp, self.commanded if self.commanded is not None else temp))
+            record = self.intervals[-1] if self.intervals and self.intervals[-1].end is None else None
+            if record is not None and self._last_sample is not None:
+                dt = now - self._last_sample
+                record.active += dt
+                if abs(temp - record.target) <= self.band:
+                    record.at_temperature += dt
+                    if record.time_to_band is None:
+                        record.time_to_band = record.active
+            self._last_sample = now
+
+            command = None
+            plan = self._early or self._plan
+            if plan is not None and plan.switch_at is not None and now >= plan.switch_at:
+                plan.switch_at = None
+                command = plan.target
+            if self._lead_at is not None and now >= self._lead_at:
+                self._lead_at = None
+                index = self.intervals[-1].index + 1 if self.intervals else 0
+                self._early = self.plan(temp, self.commanded, engine.fluid_profile.interval_value(index), now, self._interval_seconds(index))
+                command = self._early.boost if self._early.switch_at is not None else self._early.target
+            if command is not None:
+                self.commanded = command
+        if command is not None:
+            try:
+                engine.send_julabo_setpoint(command)
+            except (OSError, DeviceError) as e:  # the next poll or boundary sends a setpoint again
+                print(f"Warning: {e}, scheduled setpoint {command} not sent")
+            else:
+                print(f"Set julabo temp to {command} (scheduled)")
+
+        if self.refit and len(self._samples) >= 2 * self.refit and len(self._samples) % self.refit == 0:
+            self.fit()
+
+    def fit(self):
+        """ Refit the model on the logged samples, True if it changed """
+        with self._lock:
+            times, temps, setpoints = np.array(self._samples).T if self._samples else ([], [], [])
+        model = fit_thermal_model(times, temps, setpoints)
+        if model is None:
+            return False
+        self.model = model
+        self.fits += 1
+        return True
+
+    # ----- Report -----
+
+    def summary(self):
+        """ Achieved time at temperature per interval and in total """
+        lines = [f"Setpoint scheduler ({'control' if self.control else 'monitor only'}), band +-{self.band} C, {self.model}, {self.fits} fits"]
+        done = [record for record in self.intervals if record.active > 0]
+        lines += [str(record) for record in done[-10:]]
+        if done:
+            reached = [record.time_to_band for record in done if record.time_to_band is not None]
+            at_temperature = sum(record.at_temperature for record in done)
+            active = sum(record.active for record in done)
+            lines.append(f"{len(done)} intervals: at temperature {at_temperature / 3600:.1f} of {active / 3600:.1f} h "
+                         f"({100 * at_temperature / active:.1f} %), mean time to band "
+                         + (f"{sum(reached) / len(reached) / 60:.0f} min" if reached else "-"))
+            if self.soak is not None:
+                met = sum(record.at_temperature >= self.soak for record in done)
+                settle = max(record.transition for record in done)
+                lines.append(f"soak of {self.soak / 3600:.2f} h met in {met} of {len(done)} intervals, "
+                             f"a fluid period of {(settle + self.soak) / 3600:.2f} h would cover it")
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # Bath with a 40 min time constant and 3 min dead time, the model starts off wrong and is refitted.
+    # The profile swings between its extremes, so the boosts need setpoints past its range (opted in with limits)
+    from simulation_lib import TestSimulation
+
+    for control in (False, True):
+        simulation = TestSimulation(num_cycles=200000, bath=(40.0, 3.0),
+                                    setpoint_scheduler={"control": control, "soak": 10 * 3600, "limits": (None, None)})
+        outcome = simulation.run()
+        lines = simulation.scheduler.summary().splitlines()
+        print("\n".join([lines[0]] + lines[-2:]) if outcome.passed else outcome.report())
+        print()
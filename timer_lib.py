@@ -1,42 +1,66 @@
-import threading
-import time
+from clock_lib import SYSTEM_CLOCK
 
 class PausableTimer:
-    def __init__(self, interval, function):
-        self.interval = interval  # Total interval time (in seconds)
+    def __init__(self, interval, function, clock=None):
+        self.interval = interval  # Total interval time (in seconds), or a callable giving the next one (None when done)
         self.function = function
+        self.clock = clock if clock is not None else SYSTEM_CLOCK  # VirtualClock in simulations
         self.timer = None
         self.start_time = None
         self.paused = False
+        self.done = False
+
+    def next_interval(self):
+        """Seconds until the next call, None once the interval callable says there are no more."""
+        return self.interval() if callable(self.interval) else self.interval
 
     def start(self):
         """Start or resume the timer."""
         print("start")
+        if self.done:  # every interval has run
+            return
         if self.paused:  # If resuming
             self.paused = False
         else:  # If starting fresh
-            self.remaining_time = self.interval  
             print("function")
             self.function()
+            self.remaining_time = self.next_interval()
+            if self.remaining_time is None:
+                self._finish()
+                return
 
-        self.start_time = time.time()
-        self.timer = threading.Timer(self.remaining_time, self._execute)
-        self.timer.daemon = True
-        self.timer.start()
+        self._schedule()
         print(f"Remaining time: {self.remaining_time}")
 
+    def _schedule(self):
+        """Arm the underlying one-shot timer for remaining_time."""
+        self.start_time = self.clock.time()
+        self.timer = self.clock.timer(self.remaining_time, self._execute)
+        self.timer.start()
+
     def _execute(self):
         """Execute the function and restart the timer unless stopped."""
         if not self.paused and self.timer:  # Ensure the timer is still active
             self.function()
-            if self.timer:  # Check again before restarting
-                self.start()  # Restart the timer
+            if self.timer and not self.paused:  # Check again before restarting
+                # Next full interval; start() would call the function a second time
+                self.remaining_time = self.next_interval()
+                if self.remaining_time is None:
+                    self._finish()
+                else:
+                    self._schedule()
+
+    def _finish(self):
+        """No intervals left: stay idle until stop()."""
+        self.timer = None
+        self.remaining_time = 0.0
+        self.done = True
 
     def pause(self):
         """Pause the timer and store remaining time."""
-        if self.timer:
+        if self.timer and not self.paused:  # pausing twice must not subtract the elapsed time twice
             self.timer.cancel()
-            elapsed_time = time.time() - self.start_time
+            elapsed_time = self.clock.time() - self.start_time
             #print(f"elapsed time: {elapsed_time}")
             self.remaining_time -= elapsed_time
             self.paused = True
@@ -52,8 +76,9 @@ class PausableTimer:
         if self.timer:
             self.timer.cancel()
             self.timer = None  # Ensure the timer reference is removed
-        self.remaining_time = self.interval
+        self.remaining_time = 0.0 if callable(self.interval) else self.interval
         self.paused = False
+        self.done = False
         print("Test stopped")
 
 if __name__ == "__main__":
@@ -0,0 +1,113 @@
+import itertools
+import threading
+from collections import deque
+
+
+class UpdateBus:
+    """ Hand-off from worker threads to the GUI thread without locks or cross-thread Qt calls.
+
+    State (publish) is coalesced: only the newest value of each key is kept and the GUI asks for the
+    keys that changed since its last snapshot. Events (post) are queued and every one is delivered,
+    in order. Only events posted as droppable (sample frames) are bounded: past max_samples queued
+    the oldest of them is dropped and counted in dropped, alarms and state changes never are.
+    Relies on single dict stores, dict.copy(), count() and deque append/popleft being atomic under
+    the GIL, so publishers never block on the GUI; publishers only take a small lock among
+    themselves, so a key's version and value are stored together in version order.
+    """
+    def __init__(self, max_samples=100000):
+        self._state = {}
+        self._versions = itertools.count(1)
+        self._publish_lock = threading.Lock()  # "counts" comes from the pressure and timer threads
+        self._order = itertools.count()
+        self._events = deque()
+        self._samples = deque(maxlen=max_samples)
+        self.published = 0  # approximate, diagnostics only
+        self.dropped = 0  # droppable events lost to a full queue, approximate
+
+    def publish(self, key, value):
+        """ Set the latest value of key (any thread) """
+        with self._publish_lock:
+            self._state[key] = (next(self._versions), value)
+            self.published += 1
+
+    def post(self, event, data=None, droppable=False):
+        """ Queue an event that must not be coalesced away (any thread); droppable ones may be lost to a backlog """
+        item = (next(self._order), event, data)
+        if not droppable:
+            self._events.append(item)
+            return
+        if len(self._samples) == self._samples.maxlen:
+            self.dropped += 1
+        self._samples.append(item)
+
+    @property
+    def pending(self):
+        """ Events queued and not yet drained """
+        return len(self._events) + len(self._samples)
+
+    def snapshot(self, since=0):
+        """ (version, changed): values of the keys published after version since, for the next call pass version """
+        state = self._state.copy()
+        changed = {}
+        version = since
+        for key, (key_version, value) in state.items():
+            if key_version > since:
+                changed[key] = value
+                version = max(version, key_version)
+        return version, changed
+
+    def drain(self, limit=None):
+        """ Pop queued (event, data) oldest first, at most limit of them (default: those queued now) """
+        limit = self.pending if limit is None else limit
+        events = []
+        while (self._events or self._samples) and len(events) < limit:
+            # Oldest head of the two queues; only this thread pops, so a head seen here stays
+            if self._events and (not self._samples or self._events[0][0] < self._samples[0][0]):
+                queue = self._events
+            else:
+                queue = self._samples
+            try:
+                _, event, data = queue.popleft()
+            except IndexError:
+                break
+            events.append((event, data))
+        return events
+
+
+if __name__ == "__main__":
+    import threading
+    import time
+
+    # Four workers publishing as fast as they can, a 30 fps consumer
+    bus = UpdateBus(max_samples=3000)
+    stop = threading.Event()
+
+    def worker(n):
+        i = 0
+        while not stop.is_set():
+            bus.publish(f"counter{n}", i)
+            bus.post("sample", i, droppable=True)
+            i += 1
+            if i % 1000 == 0:
+                bus.post("milestone", (n, i))
+
+    threads = [threading.Thread(target=worker, args=(n,), daemon=True) for n in range(4)]
+    for thread in threads:
+        thread.start()
+
+    version = 0
+    frames = repaints = samples = milestones = 0
+    end = time.monotonic() + 2
+    while time.monotonic() < end:
+        version, changed = bus.snapshot(version)
+        repaints += len(changed)
+        for event, _ in bus.drain():
+            if event == "sample":
+                samples += 1
+            else:
+                milestones += 1
+        frames += 1
+        time.sleep(1 / 30)
+    stop.set()
+    print(f"{bus.published} publishes coalesced into {repaints} repaints over {frames} frames")
+    print(f"{samples} samples delivered, {bus.dropped} dropped, {milestones} milestones (none dropped)")
@@ -0,0 +1,206 @@
+import time
+from clock_lib import SYSTEM_CLOCK
+from engine_lib import EngineError
+
+UP = "up"
+DOWN = "down"
+
+
+class DeviceHealth:
+    """ Heartbeat statistics and outage state of one device """
+    def __init__(self, name):
+        self.name = name
+        self.state = UP
+        self.probes = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.latency_ms = None  # last probe
+        self.mean_latency_ms = None  # exponential average over roughly the last 20 probes
+        self.max_latency_ms = 0.0
+        self.last_error = ""
+        self.outages = 0
+        self.down_since = None
+        self.downtime = 0.0  # seconds, finished outages
+        self.attempts = 0  # reconnect attempts in the current outage
+        self.next_attempt = None
+
+    @property
+    def error_rate(self):
+        return self.errors / self.probes if self.probes else 0.0
+
+    def record(self, latency_ms, error=None):
+        self.probes += 1
+        self.latency_ms = latency_ms
+        self.mean_latency_ms = latency_ms if self.mean_latency_ms is None else 0.95 * self.mean_latency_ms + 0.05 * latency_ms
+        self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+        if error is None:
+            self.consecutive_failures = 0
+        else:
+            self.errors += 1
+            self.consecutive_failures += 1
+            self.last_error = error
+
+    def __str__(self):
+        latency = "-" if self.mean_latency_ms is None else f"{self.mean_latency_ms:.1f} ms (max {self.max_latency_ms:.1f})"
+        text = (f"{self.name:<10} {self.state.upper():<4} latency {latency}, errors {self.errors}/{self.probes}, "
+                f"outages {self.outages}, down {self.downtime / 60:.1f} min")
+        if self.state == DOWN:
+            text += f", reconnect attempt {self.attempts + 1} pending ({self.last_error})"
+        return text
+
+
+class Watchdog:
+    """ Heartbeats every connected device on a cheap probe and rides out outages without an operator.
+
+    A device that fails failures probes in a row is marked down (its engine *_connected flag cleared,
+    so nothing else talks to it), the test is paused and the device is reconnected in the background,
+    reusing its handle where possible, with the wait doubling from backoff up to max_backoff. Once
+    every device is back the test is resumed from where it stopped. New FlexLogger read errors count
+    as a failed heartbeat. pause/resume default to the engine's; the asyncio runner passes its own.
+    """
+    def __init__(self, engine, interval=10.0, failures=3, backoff=5.0, max_backoff=600.0, pause=None, resume=None, clock=None):
+        self.engine = engine
+        self.interval = interval
+        self.failures = failures
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pause_test = pause if pause is not None else engine.pause
+        self.resume_test = resume if resume is not None else engine.start
+        self.clock = clock if clock is not None else SYSTEM_CLOCK
+        self.health = {}
+        self.holding = False  # the watchdog paused the test and will resume it
+        self._read_errors = engine.read_errors
+        self._stopped = False
+        self._thread = None
+        self._devices = {"flexlogger": (self._probe_flexlogger, engine.reconnect_flexlogger, "flexlogger_connected"),
+                         "canbus": (self._probe_canbus, engine.reconnect_canbus, "canbus_connected"),
+                         "julabo": (self._probe_julabo, engine.reconnect_julabo, "julabo_connected")}
+
+    def start(self):
+        self._thread = self.clock.thread(self._run, name="device-watchdog")
+        self._thread.start()
+
+    def stop(self, wait=False):
+        self._stopped = True
+        if wait and self._thread is not None:
+            self.clock.join(self._thread)
+
+    def cancel_resume(self):
+        """ The operator paused the test during an outage, leave it paused when the devices come back """
+        self.holding = False
+
+    def _run(self):
+        while True:
+            self.clock.sleep(self.interval)
+            if self._stopped:
+                return
+            self.check()
+
+    # ----- Probes (raise or return False on failure) -----
+
+    def _probe_flexlogger(self):
+        errors, self._read_errors = self.engine.read_errors - self._read_errors, self.engine.read_errors
+        if errors:
+            raise ConnectionError(f"{errors} sensor reads failed")
+        return self.engine._flex.check_active_project()
+
+    def _probe_canbus(self):
+        healthy = getattr(self.engine._cantroller, "healthy", None)
+        return healthy is None or healthy()
+
+    def _probe_julabo(self):
+        return bool(self.engine._julabo.get_version())
+
+    # ----- Checks -----
+
+    def check(self):
+        """ One round: probe the devices that are up, retry the ones whose backoff ran out, resume when all are up """
+        engine = self.engine
+        for name, (probe, reconnect, flag) in self._devices.items():
+            health = self.health.get(name)
+            if health is None:
+                if not getattr(engine, flag):
+                    continue  # never connected, nothing to watch yet
+                health = self.health[name] = DeviceHealth(name)
+            if health.state == UP:
+                if getattr(engine, flag):
+                    self._probe(health, probe)
+                    if health.consecutive_failures >= self.failures:
+                        self._lost(health, flag)
+            elif self.clock.time() >= health.next_attempt:
+                self._reconnect(health, reconnect)
+
+        if self.holding and all(health.state == UP for health in self.health.values()):
+            self._resume()
+
+    def _probe(self, health, probe):
+        start = time.perf_counter()
+        try:
+            error = None if probe() else "no reply"
+        except Exception as e:  # any device library error (gRPC, serial, CAN) is a failed heartbeat
+            error = str(e) or type(e).__name__
+        health.record((time.perf_counter() - start) * 1000, error)
+        if error is not None:
+            print(f"Warning: {health.name} heartbeat failed ({error}), {health.consecutive_failures}/{self.failures}")
+
+    def _lost(self, health, flag):
+        engine = self.engine
+        health.state = DOWN
+        health.outages += 1
+        health.down_since = self.clock.time()
+        health.attempts = 0
+        health.next_attempt = health.down_since + self.backoff
+        setattr(engine, flag, False)  # stops polling and keeps the pause from commanding a dead device
+        print(f"Error: {health.name} lost ({health.last_error}), reconnecting in the background")
+        engine._notify("device", name=health.name, state=DOWN, error=health.last_error)
+        if engine._test_active and not self.holding:
+            self.holding = True
+            print("Pausing test until the devices are back")
+            self.pause_test()
+
+    def _reconnect(self, health, reconnect):
+        health.attempts += 1
+        try:
+            connected = reconnect()
+        except Exception as e:
+            print(f"Warning: {health.name} reconnect failed: {e}")
+            connected = False
+        now = self.clock.time()
+        if connected:
+            health.state = UP
+            health.consecutive_failures = 0
+            health.downtime += now - health.down_since
+            print(f"{health.name} back after {(now - health.down_since) / 60:.1f} min ({health.attempts} attempts)")
+            self.engine._notify("device", name=health.name, state=UP, error="")
+            if health.name == "flexlogger":
+                self._read_errors = self.engine.read_errors
+        else:
+            delay = min(self.backoff * 2 ** health.attempts, self.max_backoff)
+            health.next_attempt = now + delay
+            print(f"{health.name} still down, next attempt in {delay:.0f} s")
+
+    def _resume(self):
+        engine = self.engine
+        if not engine._test_active and engine.profile_generated:
+            print("Devices back, resuming test")
+            try:
+                self.resume_test()
+            except EngineError as e:
+                print(f"Error: could not resume test: {e}")
+        self.holding = False
+
+    def summary(self):
+        """ One line per watched device, for the diagnostics panel and console """
+        if not self.health:
+            return "Watchdog: no devices connected"
+        return "\n".join(["Watchdog:" + (" holding the test" if self.holding else "")] +
+                         [str(health) for health in self.health.values()])
+
+
+if __name__ == "__main__":
+    # A FlexLogger outage of 25 virtual minutes half way through a short simulated test
+    from simulation_lib import TestSimulation
+    simulation = TestSimulation(num_cycles=3000, watchdog_interval=10.0, outages=[("flexlogger", 2.0, 25.0)])
+    outcome = simulation.run()
+    print(outcome.report())
+    print(simulation.watchdog.summary())